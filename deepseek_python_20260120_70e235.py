@@ -4,25 +4,109 @@ Aipin - DeepSeek जैसी AI वेबसाइट
 """
 
 import os
+import gc
+import copy
+import queue
+import atexit
+import re
+import sys
+import hmac
+import math
+import bisect
+import gzip
 import json
+import hashlib
+import mimetypes
 import uuid
+import zlib
+import mmap
+from array import array
+import time
+import random
+import signal
+import socket
+import argparse
+import tempfile
+import itertools
 import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from flask import Flask, request, jsonify, render_template, send_from_directory, stream_with_context, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.serving import BaseWSGIServer
 import sqlite3
-from functools import wraps
+import threading
+from functools import lru_cache, wraps
+from collections import OrderedDict, deque
 import requests
 
-# लॉगिंग सेटअप
-logging.basicConfig(level=logging.INFO)
+try:
+    import brotli  # वैकल्पिक: .br वेरिएंट के लिए
+except ImportError:
+    brotli = None
+
+try:
+    import orjson  # वैकल्पिक: तेज़ JSON एन्कोडर
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np  # वैकल्पिक: सिमेंटिक (TF-IDF) खोज
+except ImportError:
+    np = None
+
+try:
+    from flask_sock import Sock  # वैकल्पिक: WebSocket चैट चैनल
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
+
+# लॉगिंग (हैंडलर setup_logging में)
 logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('aipin.slow')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson इंस्टॉल हो तो उससे, वरना stdlib json से; देवनागरी \\uXXXX में escape नहीं होती"""
+
+    ensure_ascii = False
+    sort_keys = False
 
-# Flask ऐप बनाएं
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return self._orjson_dumps(obj).decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)
+        try:
+            body = self._orjson_dumps(obj)
+        except TypeError:
+            # orjson जो न संभाल सके (जैसे 64 बिट से बड़े int) वह stdlib से, पहले जैसा ही
+            return super().response(obj)
+        # bytes सीधे रिस्पॉन्स में, str में decode/encode किए बिना
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj):
+        # datetime को Flask के डिफ़ॉल्ट फॉर्मेट में ही रखें; int/enum keys stdlib की तरह string में
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+# Flask ऐप बनाएं (/static नीचे दिए static_files रूट से सर्व होता है)
 app = Flask(__name__, 
-            static_folder='static',
+            static_folder=None,
             template_folder='templates')
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # कॉन्फ़िगरेशन
@@ -35,25 +119,2454 @@ app.config['ALLOWED_EXTENSIONS'] = {
     'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx',
     'mp3', 'mp4', 'wav'
 }
+app.config['APP_VERSION'] = '1.0.0'
+app.config['STATIC_FOLDER'] = 'static'
+app.config['FINGERPRINTED_ASSETS'] = ['style.css', 'script.js']
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600  # हैश वाले नाम कभी नहीं बदलते
+app.config['COMPRESS_MIN_SIZE'] = 500  # इससे छोटे रिस्पॉन्स कंप्रेस नहीं होते
+app.config['COMPRESS_MIMETYPES'] = {
+    'application/json', 'text/html', 'text/plain', 'text/css', 'text/javascript'
+}
+app.config['COMPRESS_GZIP_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_QUALITY'] = 4  # डायनामिक रिस्पॉन्स के लिए तेज़ सेटिंग
+# रेट लिमिट: रूट -> (टोकन प्रति सेकंड, बर्स्ट)
+app.config['RATE_LIMITS'] = {
+    'chat': (2.0, 10),
+    'search': (1.0, 5),
+}
+# प्रति IP (प्रॉक्सी/NAT के पीछे कई यूजर्स एक ही IP साझा करते हैं, इसलिए यूजर सीमा से काफी बड़ी)
+app.config['RATE_LIMITS_IP'] = {
+    'chat': (20.0, 100),
+    'search': (10.0, 50),
+}
+app.config['RATE_LIMIT_STORE'] = os.environ.get('AIPIN_RATE_LIMIT_STORE', 'memory')  # memory | sqlite
+app.config['RATE_LIMIT_DB'] = 'data/ratelimit.db'
+# यूजर बकेट: X-User-Id हेडर या ?user_id; दोनों न हों तो इतनी बड़ी JSON बॉडी तक उसका user_id (IP बकेट पास होने के बाद)
+app.config['RATE_LIMIT_BODY_MAX'] = 64 * 1024
+# प्रति प्रोसेस, इतने रेट-लिमिटेड अनुरोध चल रहे हों तो 503; None = SERVER_THREADS का 3/4 (बाकी सस्ते रूट्स के लिए)
+app.config['SHED_MAX_INFLIGHT'] = None
+app.config['SHED_MAX_QUEUE'] = 256  # थ्रेड पूल की कतार इससे लंबी हो तो सॉकेट पर ही 503
+app.config['WS_MAX_INFLIGHT'] = 4  # प्रति कनेक्शन; भरने पर सर्वर आगे के फ्रेम पढ़ना रोक देता है
+app.config['WS_MAX_CONNECTIONS'] = None  # प्रति प्रोसेस; None = SERVER_THREADS का आधा
+app.config['WS_THREADS'] = 16  # प्रति प्रोसेस, सभी कनेक्शंस के उत्तर बनाने वाले थ्रेड
+app.config['WS_CHUNK_CHARS'] = 80
+app.config['SOCK_SERVER_OPTIONS'] = {'ping_interval': 25, 'max_message_size': 64 * 1024}
+app.config['METRICS_DIR'] = None  # प्रीफोर्क मोड में data/metrics (प्रति वर्कर एक फाइल)
+app.config['METRICS_FLUSH_INTERVAL'] = 5  # सेकंड
+app.config['ADMIN_TOKEN'] = os.environ.get('AIPIN_ADMIN_TOKEN')  # बिना टोकन के एडमिन API बंद
+app.config['SLOW_REQUEST_MS'] = 500
+app.config['LOG_LEVEL'] = os.environ.get('AIPIN_LOG_LEVEL', 'INFO')
+app.config['LOG_FILE'] = os.environ.get('AIPIN_LOG_FILE')  # न हो तो stderr
+app.config['LOG_QUEUE_SIZE'] = 10000  # भरने पर नए रिकॉर्ड ड्रॉप होते हैं (aipin_log_dropped_total)
+app.config['LOG_DEDUP_WINDOW'] = 10  # सेकंड; एक जैसी त्रुटि इतने समय में एक बार लिखी जाती है
+app.config['ADMIN_STREAM_SECONDS'] = 300  # SSE कनेक्शन इतने बाद बंद, ब्राउज़र दोबारा जुड़ता है
+app.config['PROFILE_DIR'] = 'data/profiles'
+app.config['PROFILE_INTERVAL_MS'] = 5
+app.config['PROFILE_MAX_SECONDS'] = 120
+app.config['USER_QUOTA_BYTES'] = 200 * 1024 * 1024  # प्रति यूजर 200MB
+app.config['USAGE_RECONCILE_INTERVAL'] = 3600  # सेकंड
+app.config['WEB_SEARCH_URL'] = os.environ.get('AIPIN_WEB_SEARCH_URL', 'https://api.duckduckgo.com/')
+# वेब खोज का अलग पूल (प्रति प्रोसेस); थ्रेड + कतार SERVER_THREADS से कम रखें ताकि तेज़ उत्तरों के लिए थ्रेड बचें
+app.config['WEB_SEARCH_THREADS'] = 2
+app.config['WEB_SEARCH_QUEUE'] = 2
+app.config['WEB_SEARCH_TIMEOUT'] = 6  # सेकंड, कतार + requests का 5s timeout
+
+# कैश: local = प्रति प्रोसेस, shared = होस्ट के सभी वर्कर्स में साझा SQLite, auto = एक से ज़्यादा वर्कर हों तो shared
+app.config['CACHE_BACKEND'] = os.environ.get('AIPIN_CACHE_BACKEND', 'auto')
+# None = डिप्लॉयमेंट के DATABASE के पूरे पथ से निकला नाम (default_cache_path), ताकि एक होस्ट पर दो चेकआउट कैश साझा न करें
+app.config['CACHE_PATH'] = os.environ.get('AIPIN_CACHE_PATH')
+app.config['CACHE_MAX_BYTES'] = 64 * 1024 * 1024
+app.config['CACHE_TTL'] = {'web_search': 600, 'knowledge_base': 3600}  # सेकंड
+
+# वार्मअप: हर नया वर्कर query_stats के टॉप प्रश्नों से कैश भरता है (0 = बंद)
+app.config['WARMUP_QUERIES'] = int(os.environ.get('AIPIN_WARMUP_QUERIES', 200))
+app.config['WARMUP_RATE'] = 20  # प्रश्न/सेकंड
+app.config['WARMUP_WEB_SEARCHES'] = 20  # सबसे ज़्यादा इतनी वेब खोज: प्रति डिप्लॉयमेंट एक वर्कर, web_search_pool खाली हो तभी
+app.config['WARMUP_IO_BYTES_PER_SEC'] = 32 * 1024 * 1024  # mmap पेज पढ़ने की गति
+app.config['WARMUP_IO_CHUNK'] = 1024 * 1024
+app.config['QUERY_STATS_MAX_CHARS'] = 200  # इससे लंबे प्रश्न रोलअप में नहीं गिने जाते
+app.config['HISTORY_MAX_LIMIT'] = 100  # /api/history का एक पेज (cursor से आगे/पीछे)
+
+# मल्टी-टेनेंट: data/tenants/<नाम>.json में प्रति ब्रांड ज्ञान आधार ओवरले
+app.config['TENANT_DIR'] = 'data/tenants'
+
+# मॉडल उत्तर: INFERENCE_BACKENDS में से एक (खाली = बंद, ज्ञान आधार न मिले तो डिफ़ॉल्ट उत्तर)
+app.config['INFERENCE_BACKEND'] = os.environ.get('AIPIN_INFERENCE_BACKEND', '')
+app.config['INFERENCE_MAX_BATCH'] = 8
+app.config['INFERENCE_MAX_WAIT_MS'] = 10  # पहले अनुरोध के बाद बैच भरने का अधिकतम इंतज़ार
+app.config['INFERENCE_MAX_TOKENS'] = 64
+app.config['INFERENCE_TIMEOUT'] = 30  # सेकंड, प्रति अनुरोध
+app.config['STANDIN_STEP_MS'] = 4  # stand-in: प्रति डिकोड स्टेप स्थिर लागत
+app.config['STANDIN_SEQUENCE_MS'] = 0.5  # stand-in: प्रति स्टेप प्रति अनुक्रम लागत
+
+# टाइपो-सहिष्णु मिलान (0 = बंद); इससे छोटे विषयों पर फ़ज़ी मिलान नहीं
+app.config['FUZZY_MAX_EDIT_DISTANCE'] = 1
+app.config['FUZZY_MIN_LENGTH'] = 5
+# रोमन हिंदी ('namaste' -> 'नमस्ते'); इससे छोटी ध्वन्यात्मक कुंजियों पर मिलान नहीं
+app.config['TRANSLITERATION'] = True
+app.config['TRANSLIT_MIN_LENGTH'] = 4
+app.config['KNOWLEDGE_FILE'] = 'data/knowledge_base.json'
+# कंपाइल की गई बाइनरी स्नैपशॉट (स्ट्रिंग टेबल + मैचर टेबल), JSON स्रोत का हैश बदलते ही दोबारा बनती है
+app.config['KB_SNAPSHOT'] = True
+app.config['KB_SNAPSHOT_DIR'] = 'data/snapshots'
+# सिमेंटिक खोज (numpy हो तो): hashed char n-gram TF-IDF, cosine इससे कम हो तो मेल नहीं
+app.config['SEMANTIC_SEARCH'] = True
+app.config['SEMANTIC_DIR'] = 'data/semantic'
+app.config['SEMANTIC_DIM'] = 1024
+app.config['SEMANTIC_QUERY_TERMS'] = 24  # प्रश्न के सबसे भारी आयाम; लागत = इतनी पंक्तियां x विषय
+app.config['SEMANTIC_MIN_SCORE'] = 0.35
+# दूसरे सबसे करीब विषय से कम से कम इतना आगे हो, वरना मेल पक्का नहीं (वेब खोज/डिफ़ॉल्ट पर जाएं)
+app.config['SEMANTIC_MIN_MARGIN'] = 0.1
+# एक शब्द वाले प्रश्न सटीक/फ़ज़ी/ध्वन्यात्मक मिलान के लिए; अर्थ-खोज केवल वाक्यांशों पर
+app.config['SEMANTIC_MIN_WORDS'] = 2
+app.config['SEMANTIC_TOP_K'] = 3
+
+# बातचीत का संदर्भ (प्रति यूजर पिछले टर्न, मेमोरी में)
+app.config['CONVERSATION_TURNS'] = 6
+app.config['CONVERSATION_IDLE_SECONDS'] = 1800
+app.config['CONVERSATION_MAX_BYTES'] = 32 * 1024 * 1024
+app.config['CONVERSATION_CHECK_LATEST'] = None  # None = एक से ज़्यादा वर्कर हों तो हर टर्न पर DB से मिलान
+app.config['CONVERSATION_FOLLOWUP_WORDS'] = 4  # इतने शब्दों तक के प्रश्न पिछले विषय से जोड़े जाते हैं
+
+# बेंचमार्क / लोड टेस्ट
+app.config['BENCH_DIR'] = 'data/bench'
+app.config['BENCH_REGRESSION_THRESHOLD'] = 0.25  # p95 या throughput में 25% से ज़्यादा गिरावट (माइक्रो-सेकंड वाले ऑप्स में शोर ज़्यादा)
+app.config['LOADTEST_MIX'] = {'chat': 50, 'search': 15, 'history': 25, 'upload': 10}  # प्रतिशत
+
+# ट्रैफ़िक कैप्चर: /api/* अनुरोधों का सैंपल replay के लिए (0 = बंद)
+app.config['CAPTURE_SAMPLE_RATE'] = float(os.environ.get('AIPIN_CAPTURE_SAMPLE_RATE', 0))
+app.config['CAPTURE_DIR'] = 'data/capture'
+# यूजर id का HMAC key; न हो तो SECRET_KEY (हर रीस्टार्ट पर नया, यानी रीस्टार्ट के पार यूजर नहीं जुड़ते)
+app.config['CAPTURE_SECRET'] = os.environ.get('AIPIN_CAPTURE_SECRET')
+app.config['CAPTURE_MAX_BYTES'] = 16 * 1024 * 1024  # इतने पर फाइल बंद, gzip और नई फाइल
+app.config['CAPTURE_KEEP_FILES'] = 20
+app.config['CAPTURE_MAX_BODY'] = 8192  # इससे बड़ी JSON बॉडी नहीं रखी जाती, केवल साइज़
+app.config['CAPTURE_QUEUE_SIZE'] = 10000  # भरने पर रिकॉर्ड ड्रॉप (aipin_capture_records_total{result="dropped"})
+
+# प्रोडक्शन सर्वर कॉन्फ़िगरेशन
+app.config['SERVER_HOST'] = os.environ.get('AIPIN_HOST', '0.0.0.0')
+app.config['SERVER_PORT'] = int(os.environ.get('AIPIN_PORT', 5000))
+app.config['SERVER_WORKERS'] = int(os.environ.get('AIPIN_WORKERS', os.cpu_count() or 1))
+app.config['SERVER_THREADS'] = int(os.environ.get('AIPIN_THREADS', 8))
+app.config['SERVER_MAX_REQUESTS'] = int(os.environ.get('AIPIN_MAX_REQUESTS', 1000))  # 0 = कभी रीसायकल नहीं
+app.config['SERVER_GRACEFUL_TIMEOUT'] = 30  # सेकंड
+
+
+class StartupReport:
+    """स्टार्टअप के हर चरण का समय और फाइल I/O रिकॉर्ड करें"""
+
+    def __init__(self):
+        self.phases = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, name):
+        """एक चरण को मापें"""
+        stats = {'phase': name, 'ms': 0.0, 'files_written': 0, 'files_skipped': 0, 'bytes_written': 0}
+        previous = getattr(self._local, 'stats', None)
+        self._local.stats = stats
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats['ms'] = round((time.perf_counter() - start) * 1000, 2)
+            self._local.stats = previous
+            with self._lock:
+                self.phases.append(stats)
+
+    def record_file(self, written, nbytes=0):
+        """मौजूदा चरण में फाइल लिखना/छोड़ना दर्ज करें"""
+        stats = getattr(self._local, 'stats', None)
+        if stats is None:
+            return
+        if written:
+            stats['files_written'] += 1
+            stats['bytes_written'] += nbytes
+        else:
+            stats['files_skipped'] += 1
+
+    def reset(self):
+        """पिछले रिकॉर्ड साफ करें (रीलोड से पहले)"""
+        with self._lock:
+            self.phases = []
+
+    def summary(self):
+        """लॉग के लिए एक लाइन का सारांश"""
+        with self._lock:
+            phases = list(self.phases)
+        parts = [
+            f"{p['phase']}={p['ms']}ms" + (f" (+{p['files_written']} files, {p['bytes_written']}B)" if p['files_written'] else '')
+            for p in phases
+        ]
+        written = sum(p['files_written'] for p in phases)
+        skipped = sum(p['files_skipped'] for p in phases)
+        return f"Startup: {', '.join(parts)} | files written={written}, unchanged={skipped}"
+
+startup_report = StartupReport()
+
+_folders_ready = False
+
+def ensure_folders():
+    """ज़रूरी फोल्डर बनाएं (एक बार)"""
+    global _folders_ready
+    if _folders_ready:
+        return
+    with startup_report.phase('folders'):
+        for folder in [app.config['STATIC_FOLDER'], 'templates', app.config['UPLOAD_FOLDER'], 'data']:
+            os.makedirs(folder, exist_ok=True)
+    _folders_ready = True
+
+def write_if_changed(path, content):
+    """डिस्क पर फाइल का कंटेंट हैश अलग हो तभी लिखें; लिखा गया तो True लौटाएं"""
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    try:
+        with open(path, 'rb') as f:
+            unchanged = hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest()
+    except FileNotFoundError:
+        unchanged = False
+
+    if unchanged:
+        startup_report.record_file(False)
+        return False
+
+    # आधी लिखी फाइल कभी सर्व न हो इसलिए temp फाइल से atomic replace
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    startup_report.record_file(True, len(data))
+    return True
+
+class LazyInstance:
+    """पहली बार उपयोग होने पर ऑब्जेक्ट बनाने वाला प्रॉक्सी"""
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """असली ऑब्जेक्ट लौटाएं (ज़रूरत हो तो अभी बनाएं)"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    ensure_folders()
+                    with startup_report.phase(self._name):
+                        self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    @property
+    def initialized(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+class MetricsRegistry:
+    """Prometheus-स्टाइल मेट्रिक्स: हर थ्रेड अपने shard में बिना लॉक लिखता है, स्क्रेप पर जोड़ा जाता है"""
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.definitions = {}  # name -> (type, help)
+        self.gauge_functions = {}  # name -> callable
+        self._local = threading.local()
+        self._shards = []  # (thread, shard)
+        self._retired = self._new_shard()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self.extensions = {}  # name -> callable, JSON snapshot जो पिड फाइल में साथ लिखा जाता है
+
+    @staticmethod
+    def _new_shard():
+        return {'counter': {}, 'gauge': {}, 'histogram': {}}
+
+    def define(self, name, kind, help_text):
+        self.definitions[name] = (kind, help_text)
+
+    def gauge_function(self, name, help_text, fn):
+        """स्क्रेप के समय पढ़ा जाने वाला gauge"""
+        self.define(name, 'gauge', help_text)
+        self.gauge_functions[name] = fn
+
+    def extension(self, name, fn):
+        """अतिरिक्त JSON snapshot (जैसे डैशबोर्ड रोलअप) जो हर flush में साथ लिखा जाए"""
+        self.extensions[name] = fn
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._new_shard()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard()['counter']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def gauge_add(self, name, delta, labels=()):
+        """ऊपर-नीचे होने वाला gauge (जैसे इन-फ्लाइट); थ्रेड्स के delta जोड़े जाते हैं"""
+        gauges = self._shard()['gauge']
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0) + delta
+
+    def observe(self, name, seconds, labels=()):
+        histograms = self._shard()['histogram']
+        key = (name, labels)
+        hist = histograms.get(key)
+        if hist is None:
+            hist = histograms[key] = [[0] * (len(self.BUCKETS) + 1), 0.0, 0]
+        hist[0][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        hist[1] += seconds
+        hist[2] += 1
+
+    @contextmanager
+    def stage(self, name):
+        """किसी चरण का समय aipin_stage_duration_seconds में दर्ज करें"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('aipin_stage_duration_seconds', elapsed, (('stage', name),))
+            trace = getattr(self._local, 'trace', None)
+            if trace is not None:
+                trace.append((name, elapsed))
+
+    def begin_trace(self):
+        """इस थ्रेड में चल रहे अनुरोध के चरणों को रिकॉर्ड करना शुरू करें"""
+        self._local.trace = []
+
+    def current_trace(self):
+        """इस थ्रेड में अब तक पूरे हुए चरण (लॉग संदर्भ के लिए)"""
+        return list(getattr(self._local, 'trace', None) or ())
+
+    def end_trace(self):
+        """रिकॉर्ड किए गए (चरण, सेकंड) लौटाएं और ट्रेसिंग बंद करें"""
+        trace = getattr(self._local, 'trace', None)
+        self._local.trace = None
+        return trace or []
+
+    @staticmethod
+    def _merge_into(target, shard):
+        for key, value in shard['counter'].copy().items():
+            target['counter'][key] = target['counter'].get(key, 0) + value
+        for key, value in shard['gauge'].copy().items():
+            target['gauge'][key] = target['gauge'].get(key, 0) + value
+        for key, (buckets, total, count) in shard['histogram'].copy().items():
+            hist = target['histogram'].get(key)
+            if hist is None:
+                target['histogram'][key] = [list(buckets), total, count]
+            else:
+                hist[0] = [a + b for a, b in zip(hist[0], buckets)]
+                hist[1] += total
+                hist[2] += count
+
+    def collect(self):
+        """इस प्रोसेस के सभी थ्रेड shards जोड़कर एक snapshot बनाएं"""
+        merged = self._new_shard()
+        with self._lock:
+            # खत्म हो चुके थ्रेड्स के shard retired में मिला दें
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge_into(self._retired, shard)
+            self._shards = alive
+            shards = [shard for _, shard in alive]
+            self._merge_into(merged, self._retired)
+        for shard in shards:
+            self._merge_into(merged, shard)
+        return merged
+
+    # --- मल्टी-प्रोसेस: हर वर्कर METRICS_DIR/<pid>.json में snapshot लिखता है ---
+
+    def reset_after_fork(self):
+        """वर्कर में मास्टर से विरासत में मिले आंकड़े हटाएं, वरना हर वर्कर उन्हें दोबारा गिनेगा"""
+        self._local = threading.local()
+        self._shards = []
+        self._retired = self._new_shard()
+        self._lock = threading.Lock()
+
+    def _directory(self):
+        return app.config.get('METRICS_DIR')
+
+    @staticmethod
+    def _to_json(snapshot):
+        return {
+            kind: [[name, [list(pair) for pair in labels], value] for (name, labels), value in values.items()]
+            for kind, values in snapshot.items()
+        }
+
+    @staticmethod
+    def _from_json(data):
+        snapshot = MetricsRegistry._new_shard()
+        for kind in snapshot:
+            for name, labels, value in data.get(kind, []):
+                snapshot[kind][(name, tuple(tuple(pair) for pair in labels))] = value
+        return snapshot
+
+    def flush(self):
+        """इस प्रोसेस का snapshot फाइल में लिखें"""
+        directory = self._directory()
+        if not directory:
+            return
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = path + '.tmp'
+        data = self._to_json(self.collect())
+        data['ext'] = {name: fn() for name, fn in self.extensions.items()}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def start_flusher(self):
+        """वर्कर में समय-समय पर snapshot लिखने वाला थ्रेड"""
+        if not self._directory():
+            return
+
+        def run():
+            while True:
+                time.sleep(app.config['METRICS_FLUSH_INTERVAL'])
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Metrics flush error: {e}")
+
+        self._flusher = threading.Thread(target=run, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def reset_directory(self):
+        """मास्टर शुरू होने पर पिछले रन की फाइलें हटाएं"""
+        directory = self._directory()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+
+    def archive_process(self, pid):
+        """मास्टर: खत्म हुए वर्कर के counters/histograms archive.json में जोड़ें (gauges नहीं)"""
+        directory = self._directory()
+        if not directory:
+            return
+        path = os.path.join(directory, f"{pid}.json")
+        archive_path = os.path.join(directory, 'archive.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                dead = self._from_json(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return
+        try:
+            with open(archive_path, 'r', encoding='utf-8') as f:
+                archive = self._from_json(json.load(f))
+        except (FileNotFoundError, ValueError):
+            archive = self._new_shard()
+        dead['gauge'] = {}
+        self._merge_into(archive, dead)
+        with open(archive_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self._to_json(archive), f)
+        os.replace(archive_path + '.tmp', archive_path)
+        os.remove(path)
+
+    def _worker_files(self):
+        """बाकी वर्कर्स (और archive) की फाइलें पढ़कर दें; अधूरी/गायब फाइलें छोड़ दें"""
+        directory = self._directory()
+        if not directory or not os.path.isdir(directory):
+            return
+        own = f"{os.getpid()}.json"
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == own:
+                continue
+            try:
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            yield data
+
+    def collect_all(self):
+        """सभी वर्कर्स (फाइलों से) और इस प्रोसेस (लाइव) का जोड़"""
+        return self.collect_with_extension(None)[0]
+
+    def collect_extension(self, name):
+        """इस प्रोसेस (लाइव) और बाकी वर्कर्स (फाइलों से) के extension snapshots की सूची"""
+        snapshots = [self.extensions[name]()]
+        snapshots.extend(data['ext'][name] for data in self._worker_files() if name in data.get('ext', {}))
+        return snapshots
+
+    def collect_with_extension(self, name):
+        """collect_all और collect_extension दोनों, वर्कर फाइलें एक ही बार पढ़कर"""
+        merged = self.collect()
+        snapshots = [self.extensions[name]()] if name is not None else []
+        for data in self._worker_files():
+            self._merge_into(merged, self._from_json(data))
+            if name is not None and name in data.get('ext', {}):
+                snapshots.append(data['ext'][name])
+        return merged, snapshots
+
+    def render(self):
+        """Prometheus text exposition format"""
+        snapshot = self.collect_all()
+        for name, fn in self.gauge_functions.items():
+            try:
+                snapshot['gauge'][(name, ())] = fn()
+            except Exception:
+                pass
+
+        by_name = {}
+        for kind in ('counter', 'gauge', 'histogram'):
+            for (name, labels), value in snapshot[kind].items():
+                by_name.setdefault(name, []).append((labels, value))
+
+        def fmt_labels(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text = self.definitions.get(name, ('untyped', name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                if kind != 'histogram':
+                    lines.append(f"{name}{fmt_labels(labels)} {value}")
+                    continue
+                buckets, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(self.BUCKETS + (float('inf'),), buckets):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{fmt_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{fmt_labels(labels)} {total}")
+                lines.append(f"{name}_count{fmt_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.define('aipin_requests_total', 'counter', 'HTTP अनुरोध (route, method, status)')
+metrics.define('aipin_request_duration_seconds', 'histogram', 'प्रति रूट अनुरोध लेटेंसी')
+metrics.define('aipin_stage_duration_seconds', 'histogram', 'प्रति चरण लेटेंसी')
+metrics.define('aipin_inflight_requests', 'gauge', 'इस समय चल रहे अनुरोध')
+metrics.define('aipin_db_connections', 'gauge', 'खुले SQLite कनेक्शन')
+metrics.define('aipin_db_connections_total', 'counter', 'खोले गए SQLite कनेक्शन')
+metrics.define('aipin_db_writes_inflight', 'gauge', 'चल रहे (या लॉक की प्रतीक्षा में) DB writes')
+metrics.define('aipin_ws_connections', 'gauge', 'खुले WebSocket कनेक्शन')
+metrics.define('aipin_ws_messages_total', 'counter', 'WebSocket पर आए चैट संदेश')
+metrics.define('aipin_log_dropped_total', 'counter', 'लॉग कतार भरी होने से ड्रॉप हुए रिकॉर्ड')
+metrics.define('aipin_log_suppressed_total', 'counter', 'dedup से दबाए गए दोहराए लॉग')
+metrics.define('aipin_conversation_sessions', 'gauge', 'मेमोरी में रखे बातचीत सेशन')
+metrics.define('aipin_conversation_bytes', 'gauge', 'बातचीत सेशन का अनुमानित मेमोरी उपयोग')
+metrics.define('aipin_bulkhead_active', 'gauge', 'पूल में चल रहे काम (pool)')
+metrics.define('aipin_bulkhead_queued', 'gauge', 'पूल की कतार में काम (pool)')
+metrics.define('aipin_bulkhead_rejected_total', 'counter', 'पूल भरा होने से तुरंत लौटाए गए काम (pool)')
+metrics.define('aipin_bulkhead_timeouts_total', 'counter', 'समय सीमा में पूरे न हुए काम (pool)')
+metrics.define('aipin_warmup_queries_total', 'counter', 'वार्मअप में कैश किए गए प्रश्न (kind)')
+metrics.define('aipin_warmup_bytes_total', 'counter', 'वार्मअप में पहले से पढ़े गए mmap बाइट्स')
+metrics.define('aipin_inference_queue_depth', 'gauge', 'बैच में जाने की प्रतीक्षा में मॉडल अनुरोध')
+metrics.define('aipin_inference_batches_total', 'counter', 'मॉडल को भेजे गए बैच')
+metrics.define('aipin_inference_batched_requests_total', 'counter', 'बैचों में भेजे गए अनुरोध (औसत बैच = इसे batches से भाग दें)')
+metrics.define('aipin_inference_requests_total', 'counter', 'मॉडल अनुरोध (outcome: ok, cancelled, timeout, error)')
+metrics.define('aipin_capture_records_total', 'counter', 'ट्रैफ़िक कैप्चर रिकॉर्ड (result: written, dropped)')
+
+class TrackedConnection(sqlite3.Connection):
+    """खुले कनेक्शन गिनने वाला SQLite कनेक्शन"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracked_open = True
+        metrics.inc('aipin_db_connections_total')
+        metrics.gauge_add('aipin_db_connections', 1)
+
+    def close(self):
+        if self._tracked_open:
+            self._tracked_open = False
+            metrics.gauge_add('aipin_db_connections', -1)
+        super().close()
+
+def timed_stage(name):
+    """मेथड का समय stage मेट्रिक और स्लो-रिक्वेस्ट ट्रेस में दर्ज करने वाला डेकोरेटर"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class JSONLogFormatter(logging.Formatter):
+    """हर रिकॉर्ड एक JSON लाइन: समय, लेवल, logger, pid, संदेश + अनुरोध संदर्भ"""
+
+    CONTEXT_FIELDS = ('request_id', 'route', 'stages_ms', 'repeated')
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage(),
+        }
+        for field in self.CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DedupFilter(logging.Filter):
+    """एक जैसी WARNING+ लाइनें window में एक बार; बाकी गिनी जाती हैं और अगली लाइन में 'repeated' बनती हैं"""
+
+    MAX_KEYS = 1000
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self._seen = {}  # (logger, level, संदेश) -> [पहली बार, दबाए गए]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or not self.window:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                metrics.inc('aipin_log_suppressed_total')
+                return False
+            if entry is not None and entry[1]:
+                record.repeated = entry[1]
+            if len(self._seen) >= self.MAX_KEYS:
+                # सबसे पुरानी एंट्री हटाएं (dict में insertion order)
+                self._seen.pop(next(iter(self._seen)))
+            self._seen.pop(key, None)
+            self._seen[key] = [now, 0]
+        return True
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """अनुरोध थ्रेड केवल सीमित कतार में डालता है; लिखना बैकग्राउंड listener करता है, कतार भरी हो तो ड्रॉप"""
+
+    def __init__(self, maxsize, target):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # फोर्क के समय किसी थ्रेड ने लॉक पकड़ा हो तो वर्कर में वह कभी नहीं छूटेगा
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        # फोर्क के बाद वर्कर में पिछला listener थ्रेड नहीं होता, इसलिए नई कतार और नया थ्रेड
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """कतार में बचे रिकॉर्ड लिखकर listener बंद करें"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+    def prepare(self, record):
+        # संदेश और traceback यहीं बनाएं (args/exc_info थ्रेड के बाहर सुरक्षित नहीं), JSON listener में
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            record.request_id = request.environ.get('aipin.request_id')
+            record.route = request.url_rule.rule if request.url_rule else request.path
+            stages = metrics.current_trace()
+            if stages:
+                record.stages_ms = {name: round(seconds * 1000, 3) for name, seconds in stages}
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc('aipin_log_dropped_total')
+
+def setup_logging():
+    """root logger पर कतार वाला JSON पाइपलाइन (logging.basicConfig की जगह)"""
+    if app.config['LOG_FILE']:
+        target = logging.FileHandler(app.config['LOG_FILE'], encoding='utf-8')
+    else:
+        target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(JSONLogFormatter())
+
+    handler = BoundedQueueHandler(app.config['LOG_QUEUE_SIZE'], target)
+    handler.addFilter(DedupFilter(app.config['LOG_DEDUP_WINDOW']))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config['LOG_LEVEL'])
+    atexit.register(handler.stop)
+    return handler
+
+log_handler = setup_logging()
+
+class SamplingProfiler:
+    """कम ओवरहेड वाला सैंपलिंग प्रोफाइलर: हर interval पर सभी थ्रेड्स के स्टैक, collapsed फॉर्मेट में"""
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_trigger_check = 0.0
+        self._last_trigger_seen = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def trigger_path(self):
+        return os.path.join(app.config['PROFILE_DIR'], 'trigger.json')
+
+    def _read_trigger(self):
+        try:
+            with open(self.trigger_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def request(self, seconds, interval_ms):
+        """इस प्रोसेस में शुरू करें और बाकी वर्कर्स के लिए trigger फाइल लिखें; कहीं भी चल रहा हो तो None"""
+        now = time.time()
+        trigger = self._read_trigger()
+        # पहले जांच, फिर trigger: 409 वाला अनुरोध बाकी वर्कर्स में नया प्रोफाइल शुरू न करे
+        if self.running or (trigger is not None and trigger.get('until', 0) > now):
+            return None
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        until = now + seconds
+        trigger = {'until': until, 'interval_ms': interval_ms}
+        with open(self.trigger_path() + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(trigger, f)
+        os.replace(self.trigger_path() + '.tmp', self.trigger_path())
+        self._last_trigger_seen = until
+        return self.start(seconds, interval_ms)
+
+    def maybe_start(self):
+        """अनुरोध के रास्ते पर सस्ती जांच: सेकंड में अधिकतम एक बार trigger फाइल देखें"""
+        now = time.time()
+        if now - self._last_trigger_check < 1.0:
+            return
+        self._last_trigger_check = now
+        trigger = self._read_trigger()
+        if trigger is None:
+            return
+        until = trigger.get('until', 0)
+        if until > now and until != self._last_trigger_seen:
+            self._last_trigger_seen = until
+            self.start(until - now, trigger.get('interval_ms', app.config['PROFILE_INTERVAL_MS']))
+
+    def start(self, seconds, interval_ms):
+        with self._lock:
+            if self.running:
+                return None
+            filename = f"profile-{os.getpid()}-{int(time.time())}.collapsed"
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds, interval_ms / 1000.0, filename),
+                name='sampling-profiler', daemon=True
+            )
+            self._thread.start()
+            return filename
+
+    def _run(self, seconds, interval, filename):
+        own_id = threading.get_ident()
+        stacks = {}
+        samples = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack = ';'.join(reversed(parts))
+                stacks[stack] = stacks.get(stack, 0) + 1
+            samples += 1
+            time.sleep(interval)
+
+        path = os.path.join(app.config['PROFILE_DIR'], filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Profile written: {path} ({samples} samples)")
+
+profiler = SamplingProfiler()
+
+def admin_required(view):
+    """X-Admin-Token हेडर (या ?token=) ADMIN_TOKEN से मेल खाए तभी अनुमति"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = app.config['ADMIN_TOKEN']
+        given = request.headers.get('X-Admin-Token') or request.args.get('token') or ''
+        if not expected or not hmac.compare_digest(given.encode('utf-8'), expected.encode('utf-8')):
+            return jsonify({'error': 'अनुमति नहीं'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def log_slow_request(response, elapsed, stages):
+    """थ्रेशोल्ड से धीमे अनुरोध का चरण-वार ब्रेकडाउन लॉग करें"""
+    breakdown = {}
+    for name, seconds in stages:
+        breakdown[name] = round(breakdown.get(name, 0.0) + seconds * 1000, 3)
+    total_ms = round(elapsed * 1000, 3)
+    slow_logger.warning(f"Slow request: {request.method} {request.path} {total_ms}ms", extra={'fields': {
+        'method': request.method,
+        'status': response.status_code,
+        'total_ms': total_ms,
+        'stages_ms': breakdown
+    }})
+
+class TrafficCapture:
+    """/api/* अनुरोधों का सैंपल append-only JSONL में; अनुरोध थ्रेड केवल कतार में डालता है, लिखना बैकग्राउंड थ्रेड"""
+
+    def __init__(self):
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._start_lock = threading.Lock()
+
+    def anonymize(self, user_id):
+        """HMAC-SHA256 से स्थिर छद्म id: replay में वही यूजर वही id, पर असली id वापस नहीं निकलता"""
+        key = (app.config['CAPTURE_SECRET'] or app.config['SECRET_KEY']).encode('utf-8')
+        digest = hmac.new(key, str(user_id).encode('utf-8'), hashlib.sha256).digest()
+        return int.from_bytes(digest[:6], 'big')
+
+    def _scrub(self, fields):
+        if 'user_id' in fields:
+            fields['user_id'] = self.anonymize(fields['user_id'])
+        return fields
+
+    def record(self, response):
+        """after_request से: सैंपल में आए अनुरोध का रिकॉर्ड कतार में (बिना सैंपल वाले पर एक random() ही)"""
+        rate = app.config['CAPTURE_SAMPLE_RATE']
+        if not rate or not request.path.startswith('/api/') or random.random() >= rate:
+            return
+        start = request.environ.get('aipin.start')
+        elapsed = time.perf_counter() - start if start is not None else 0.0
+        entry = {
+            # अनुरोध आने का समय (replay इसी से अंतराल बनाता है)
+            'ts': round(time.time() - elapsed, 3),
+            'method': request.method,
+            'path': request.path,
+            'route': request.url_rule.rule if request.url_rule else 'unmatched',
+            'args': self._scrub(request.args.to_dict()),
+            'status': response.status_code,
+            'ms': round(elapsed * 1000, 2),
+            'bytes': response.content_length,
+        }
+        if request.headers.get('X-Tenant'):
+            entry['tenant'] = request.headers['X-Tenant']
+        if request.is_json:
+            if (request.content_length or 0) <= app.config['CAPTURE_MAX_BODY']:
+                body = request.get_json(silent=True)
+                if isinstance(body, dict):
+                    entry['json'] = self._scrub(dict(body))
+            else:
+                entry['json_bytes'] = request.content_length
+        elif request.content_length:
+            # अपलोड की सामग्री नहीं, केवल साइज़ (replay उतनी ही बड़ी फाइल बनाता है)
+            entry['upload_bytes'] = request.content_length
+            if response.is_json:
+                # replay में बाद के /api/files/<id> अनुरोध नए id पर भेजे जाते हैं
+                file_id = (response.get_json(silent=True) or {}).get('file_id')
+                if file_id is not None:
+                    entry['file_id'] = file_id
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            metrics.inc('aipin_capture_records_total', (('result', 'dropped'),))
+
+    def _ensure_writer(self):
+        # फोर्क के बाद हर वर्कर की अपनी कतार, थ्रेड और फाइल
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(app.config['CAPTURE_QUEUE_SIZE'])
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='traffic-capture', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, entries):
+        directory = app.config['CAPTURE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        f = None
+        size = 0
+        sequence = itertools.count()
+        stopping = False
+        while not stopping:
+            batch = [entries.get()]
+            # कतार में जो है सब एक write में
+            while True:
+                try:
+                    batch.append(entries.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [entry for entry in batch if entry is not None]
+            if not batch:
+                continue
+            try:
+                data = b''.join(
+                    (orjson.dumps(entry) if orjson is not None
+                     else json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')) + b'\n'
+                    for entry in batch
+                )
+                if f is not None and size + len(data) > app.config['CAPTURE_MAX_BYTES']:
+                    # पहले f छोड़ें: रोटेशन फेल हो तब भी अगला बैच नई फाइल में जाए
+                    path = f.name
+                    f.close()
+                    f = None
+                    self._rotate(path)
+                if f is None:
+                    # क्रम संख्या: एक ही सेकंड में रोटेशन हो तो पिछली फाइल/उसकी .gz न बदले
+                    name = f"capture-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(sequence):04d}.jsonl"
+                    f = open(os.path.join(directory, name), 'ab')
+                    size = 0
+                f.write(data)
+                f.flush()
+                size += len(data)
+                metrics.inc('aipin_capture_records_total', (('result', 'written'),), len(batch))
+            except Exception as e:
+                logger.error(f"Traffic capture write error: {e}")
+                metrics.inc('aipin_capture_records_total', (('result', 'dropped'),), len(batch))
+        if f is not None:
+            f.close()
+
+    def _rotate(self, path):
+        """बंद फाइल gzip करें और CAPTURE_KEEP_FILES से पुरानी फाइलें हटाएं; त्रुटि लिखने को नहीं रोकती"""
+        try:
+            with open(path, 'rb') as source, gzip.open(path + '.gz', 'wb') as target:
+                while True:
+                    chunk = source.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+            os.remove(path)
+        except OSError as e:
+            # अधूरी .gz हटाएं; बिना कंप्रेस .jsonl बची रहती है (replay दोनों पढ़ता है)
+            logger.error(f"Traffic capture rotate error: {e}")
+            try:
+                os.remove(path + '.gz')
+            except OSError:
+                pass
+        try:
+            directory = os.path.dirname(path)
+            # केवल बंद फाइलें: रोटेट हुई .gz, या इसी प्रोसेस की (gzip फेल होने से बची) .jsonl।
+            # दूसरे वर्कर्स की खुली .jsonl हटाने पर वे हटे हुए inode में लिखते रहते और रिकॉर्ड खो जाते।
+            # नाम में समय पहले है, इसलिए नाम से क्रम = समय से क्रम
+            pid = str(os.getpid())
+            names = sorted(name for name in os.listdir(directory) if name.startswith('capture-') and (
+                name.endswith('.jsonl.gz') or (name.endswith('.jsonl') and name.rsplit('-', 2)[1] == pid)))
+        except OSError as e:
+            logger.error(f"Traffic capture prune error: {e}")
+            return
+        for name in names[:-app.config['CAPTURE_KEEP_FILES']]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def stop(self, timeout=5):
+        """कतार में बचे रिकॉर्ड लिखकर writer बंद करें"""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._pid = None
+
+traffic_capture = TrafficCapture()
+atexit.register(traffic_capture.stop)
+
+def load_capture(paths):
+    """कैप्चर फाइलें/फोल्डर पढ़ें (.jsonl और रोटेट हुई .jsonl.gz), समय के क्रम में; अधूरी पंक्तियां छोड़ दें"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.startswith('capture-') and name.endswith(('.jsonl', '.jsonl.gz')))
+        else:
+            files.append(path)
+    records = []
+    for path in files:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    records.sort(key=lambda entry: entry['ts'])
+    return records, files
+
+class StatsStore:
+    """एडमिन डैशबोर्ड के लिए रोलअप: हर अपडेट O(1), डैशबोर्ड कभी chat_history स्कैन नहीं करता"""
+
+    WINDOW = 60  # सेकंड
+    TOP_K = 50
+    LATENCY_BUCKETS = MetricsRegistry.BUCKETS
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # हर स्लॉट: [सेकंड, अनुरोध, त्रुटियां, लेटेंसी बकेट्स]
+        self._ring = [[0, 0, 0, [0] * (len(self.LATENCY_BUCKETS) + 1)] for _ in range(self.WINDOW)]
+        self._caches = {}  # नाम -> [hits, misses]
+        self._web = {'ok': 0, 'failed': 0, 'last_ok': 0.0, 'last_failure': 0.0, 'latency_ewma_ms': 0.0}
+        self._top = {}  # Space-Saving: query -> [count, error]
+
+    def reset_after_fork(self):
+        self.__init__()
+
+    def _slot(self, now):
+        second = int(now)
+        slot = self._ring[second % self.WINDOW]
+        if slot[0] != second:
+            slot[0] = second
+            slot[1] = 0
+            slot[2] = 0
+            slot[3] = [0] * (len(self.LATENCY_BUCKETS) + 1)
+        return slot
+
+    def record_request(self, seconds, status):
+        bucket = bisect.bisect_left(self.LATENCY_BUCKETS, seconds)
+        with self._lock:
+            slot = self._slot(time.time())
+            slot[1] += 1
+            if status >= 500:
+                slot[2] += 1
+            slot[3][bucket] += 1
+
+    def record_cache(self, name, hit):
+        with self._lock:
+            counts = self._caches.get(name)
+            if counts is None:
+                counts = self._caches[name] = [0, 0]
+            counts[0 if hit else 1] += 1
+
+    def record_web_search(self, ok, seconds):
+        with self._lock:
+            now = time.time()
+            if ok:
+                self._web['ok'] += 1
+                self._web['last_ok'] = now
+            else:
+                self._web['failed'] += 1
+                self._web['last_failure'] = now
+            ewma = self._web['latency_ewma_ms']
+            self._web['latency_ewma_ms'] = seconds * 1000 if ewma == 0 else ewma * 0.8 + seconds * 200
+
+    def record_query(self, query):
+        """Space-Saving हेवी-हिटर्स: K काउंटर, नया आइटम सबसे छोटे को बदलता है"""
+        key = ' '.join(query.lower().split())[:100]
+        with self._lock:
+            entry = self._top.get(key)
+            if entry is not None:
+                entry[0] += 1
+            elif len(self._top) < self.TOP_K:
+                self._top[key] = [1, 0]
+            else:
+                victim = min(self._top, key=lambda k: self._top[k][0])
+                floor = self._top.pop(victim)[0]
+                self._top[key] = [floor + 1, floor]
+
+    def snapshot(self):
+        """वर्कर्स के बीच जोड़ने लायक JSON snapshot"""
+        now = int(time.time())
+        with self._lock:
+            window = [
+                [slot[0], slot[1], slot[2], list(slot[3])]
+                for slot in self._ring if now - slot[0] < self.WINDOW
+            ]
+            return {
+                'window': window,
+                'caches': {name: list(counts) for name, counts in self._caches.items()},
+                'web': dict(self._web),
+                'top': {query: list(entry) for query, entry in self._top.items()},
+            }
+
+    @classmethod
+    def summarize(cls, snapshots):
+        """कई snapshots से डैशबोर्ड के आंकड़े (percentiles, RPS, hit rates)"""
+        now = int(time.time())
+        requests_total = errors = 0
+        buckets = [0] * (len(cls.LATENCY_BUCKETS) + 1)
+        per_second = {}
+        caches = {}
+        web = {'ok': 0, 'failed': 0, 'last_ok': 0.0, 'last_failure': 0.0, 'latency_ewma_ms': 0.0}
+        top = {}
+        for snap in snapshots:
+            for second, count, failed, slot_buckets in snap.get('window', []):
+                if now - second >= cls.WINDOW:
+                    continue
+                requests_total += count
+                errors += failed
+                per_second[second] = per_second.get(second, 0) + count
+                buckets = [a + b for a, b in zip(buckets, slot_buckets)]
+            for name, (hits, misses) in snap.get('caches', {}).items():
+                counts = caches.setdefault(name, [0, 0])
+                counts[0] += hits
+                counts[1] += misses
+            snap_web = snap.get('web', {})
+            web['ok'] += snap_web.get('ok', 0)
+            web['failed'] += snap_web.get('failed', 0)
+            web['last_ok'] = max(web['last_ok'], snap_web.get('last_ok', 0.0))
+            web['last_failure'] = max(web['last_failure'], snap_web.get('last_failure', 0.0))
+            web['latency_ewma_ms'] = max(web['latency_ewma_ms'], snap_web.get('latency_ewma_ms', 0.0))
+            for query, (count, _) in snap.get('top', {}).items():
+                top[query] = top.get(query, 0) + count
+
+        def percentile(p):
+            if not requests_total:
+                return None
+            target = requests_total * p
+            cumulative = 0
+            for bound, count in zip(cls.LATENCY_BUCKETS + (float('inf'),), buckets):
+                cumulative += count
+                if cumulative >= target:
+                    return None if bound == float('inf') else round(bound * 1000, 2)
+            return None
+
+        # पिछले 10 पूरे सेकंड का औसत
+        recent = sum(count for second, count in per_second.items() if 0 < now - second <= 10)
+        if web['last_failure'] > web['last_ok']:
+            web_status = 'degraded'
+        elif web['ok']:
+            web_status = 'healthy'
+        else:
+            web_status = 'unknown'
+        return {
+            'rps': round(recent / 10, 2),
+            'requests_60s': requests_total,
+            'errors_60s': errors,
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+            'cache_hit_rate': {
+                name: round(hits / (hits + misses), 3) if hits + misses else None
+                for name, (hits, misses) in caches.items()
+            },
+            'web_search': dict(web, status=web_status),
+            'top_queries': sorted(top.items(), key=lambda item: -item[1])[:10],
+        }
+
+stats_store = StatsStore()
+metrics.extension('stats', stats_store.snapshot)
+
+def db_write(func):
+    """चल रहे DB writes गिनें (डैशबोर्ड पर write queue depth)"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics.gauge_add('aipin_db_writes_inflight', 1)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.gauge_add('aipin_db_writes_inflight', -1)
+    return wrapper
+
+def collect_dashboard_stats():
+    """सभी वर्कर्स से जुड़े हुए लाइव आंकड़े"""
+    # हर SSE क्लाइंट पर हर सेकंड चलता है: वर्कर फाइलें एक ही बार पढ़ें
+    snapshot, worker_stats = metrics.collect_with_extension('stats')
+    summary = StatsStore.summarize(worker_stats)
+
+    def gauge(name):
+        return sum(value for (key, _), value in snapshot['gauge'].items() if key == name)
+
+    def by_pool(kind, name):
+        values = {}
+        for (key, labels), value in snapshot[kind].items():
+            if key == name:
+                pool = dict(labels).get('pool')
+                values[pool] = values.get(pool, 0) + value
+        return values
+
+    # हर पूल की भराई; तेज़ पूल = अनुरोध थ्रेड जो धीमे पूल के इंतज़ार में नहीं हैं
+    workers = max(1, len(worker_stats))
+    active, queued = by_pool('gauge', 'aipin_bulkhead_active'), by_pool('gauge', 'aipin_bulkhead_queued')
+    rejected, timeouts = by_pool('counter', 'aipin_bulkhead_rejected_total'), by_pool('counter', 'aipin_bulkhead_timeouts_total')
+    slow_busy = sum(active.values()) + sum(queued.values())
+    pools = {'fast': {'active': max(0, gauge('aipin_inflight_requests') - slow_busy), 'queued': 0,
+                      'capacity': app.config['SERVER_THREADS'] * workers, 'rejected': 0, 'timeouts': 0}}
+    for pool in (web_search_pool,):
+        pools[pool.name] = {'active': active.get(pool.name, 0), 'queued': queued.get(pool.name, 0),
+                            'capacity': (pool.threads + pool.max_queue) * workers,
+                            'rejected': rejected.get(pool.name, 0), 'timeouts': timeouts.get(pool.name, 0)}
+    for stats in pools.values():
+        stats['saturation'] = round((stats['active'] + stats['queued']) / stats['capacity'], 3) if stats['capacity'] else None
+
+    db_path = app.config['DATABASE']
+    db_size = sum(os.path.getsize(path) for path in (db_path, db_path + '-wal') if os.path.exists(path))
+    try:
+        conn = db.connect()
+        conn.execute('SELECT 1')
+        conn.close()
+        db_status = 'connected'
+    except Exception:
+        db_status = 'error'
+
+    summary.update({
+        'ai_status': 'active' if ai_engine.initialized else 'idle',
+        'search_enabled': ai_engine.search_engine_enabled if ai_engine.initialized else None,
+        'db_status': db_status,
+        'db_size_bytes': db_size,
+        'db_write_queue': gauge('aipin_db_writes_inflight'),
+        'inflight_requests': gauge('aipin_inflight_requests'),
+        'pools': pools,
+        'cache': response_cache.stats() if response_cache.initialized else None,
+        'conversations': conversations.stats(),
+        'pid': os.getpid(),
+        'timestamp': time.time(),
+    })
+    return summary
+
+class LocalCache:
+    """इस प्रोसेस की LRU कैश (OrderedDict): TTL और बाइट बजट के साथ"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires, size, payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, namespace, key):
+        """कैश किया मान या None"""
+        full_key = f"{namespace}:{key}"
+        with self._lock:
+            entry = self._data.get(full_key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(full_key)
+                return None
+            self._data.move_to_end(full_key)
+            payload = entry[2]
+        return json.loads(payload)
+
+    def store(self, namespace, key, value, ttl):
+        full_key = f"{namespace}:{key}"
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(full_key.encode('utf-8')) + len(payload.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(full_key)
+            self._data[full_key] = (time.time() + ttl, size, payload)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def add(self, namespace, key, value, ttl):
+        """key न हो (या expire हो चुकी हो) तभी रखें; रखा तो True"""
+        with self._lock:
+            entry = self._data.get(f"{namespace}:{key}")
+            if entry is not None and entry[0] >= time.time():
+                return False
+        self.store(namespace, key, value, ttl)
+        return True
+
+    def _remove(self, full_key):
+        entry = self._data.pop(full_key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def invalidate(self):
+        """सब कुछ हटाएं (जैसे ज्ञान आधार बदलने पर)"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {'backend': 'local', 'entries': len(self._data), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+class SharedCache:
+    """होस्ट के सभी वर्कर्स की साझा कैश: SQLite (WAL + mmap), संभव हो तो /dev/shm में"""
+
+    # accessed इससे पुराना हो तभी अपडेट: अनुमानित LRU, हर lookup पर write नहीं
+    TOUCH_INTERVAL = 10  # सेकंड
+    EVICT_BATCH = 64
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._connection().executescript('''
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed);
+            CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires);
+
+            -- कुल बाइट्स triggers से, ताकि बजट जांच के लिए SUM() न चलाना पड़े
+            CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('bytes', 0);
+            CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+                UPDATE cache_meta SET value = value + NEW.size WHERE name = 'bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+                UPDATE cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+                UPDATE cache_meta SET value = value - OLD.size WHERE name = 'bytes';
+            END;
+        ''')
+
+    def _connection(self):
+        # SQLite कनेक्शन फोर्क के पार इस्तेमाल नहीं हो सकता, इसलिए प्रति (प्रोसेस, थ्रेड)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=1.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(f'PRAGMA mmap_size={self.max_bytes * 2}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def lookup(self, namespace, key):
+        """कैश किया मान या None"""
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute('SELECT value, expires, accessed FROM cache WHERE key = ?', (full_key,)).fetchone()
+            if row is None or row[1] < now:
+                return None
+            if now - row[2] > self.TOUCH_INTERVAL:
+                conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, full_key))
+        except sqlite3.OperationalError as e:
+            # व्यस्त/लॉक्ड DB पर कैश मिस मानें, अनुरोध फेल न हो
+            logger.warning(f"Cache lookup error: {e}")
+            return None
+        return json.loads(row[0])
+
+    def store(self, namespace, key, value, ttl):
+        full_key = f"{namespace}:{key}"
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(full_key.encode('utf-8')) + len(payload.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                INSERT INTO cache (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value, size = excluded.size,
+                    expires = excluded.expires, accessed = excluded.accessed
+            ''', (full_key, payload, size, now + ttl, now))
+            total = conn.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, now)
+            conn.execute('COMMIT')
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            logger.warning(f"Cache store error: {e}")
+
+    def add(self, namespace, key, value, ttl):
+        """key न हो (या expire हो चुकी हो) तभी रखें; एक ही UPSERT, इसलिए सभी वर्कर्स में केवल एक को True"""
+        full_key = f"{namespace}:{key}"
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(full_key.encode('utf-8')) + len(payload.encode('utf-8'))
+        now = time.time()
+        try:
+            cursor = self._connection().execute('''
+                INSERT INTO cache (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value, size = excluded.size,
+                    expires = excluded.expires, accessed = excluded.accessed
+                WHERE cache.expires < excluded.accessed
+            ''', (full_key, payload, size, now + ttl, now))
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Cache add error: {e}")
+            return False
+        return cursor.rowcount == 1
+
+    def _evict(self, conn, now):
+        """पहले expired, फिर सबसे कम हाल में पढ़े गए, जब तक बजट के 90% तक न आ जाएं"""
+        conn.execute('DELETE FROM cache WHERE expires < ?', (now,))
+        target = self.max_bytes * 0.9
+        while conn.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0] > target:
+            deleted = conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (self.EVICT_BATCH,)
+            ).rowcount
+            if not deleted:
+                break
+
+    def invalidate(self):
+        """सब कुछ हटाएं; सभी वर्कर्स को तुरंत दिखता है"""
+        self._connection().execute('DELETE FROM cache')
+
+    def stats(self):
+        conn = self._connection()
+        entries = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        size = conn.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+        return {'backend': 'shared', 'path': self.path, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+def default_cache_path():
+    """/dev/shm (या data/) में इस डिप्लॉयमेंट की अपनी कैश फाइल: DATABASE के absolute पथ का हैश"""
+    digest = hashlib.sha1(os.path.abspath(app.config['DATABASE']).encode('utf-8')).hexdigest()[:12]
+    if os.path.isdir('/dev/shm'):
+        return f"/dev/shm/aipin-cache-{digest}.db"
+    return os.path.join('data', 'cache.db')
+
+def create_cache():
+    """CACHE_BACKEND के अनुसार कैश: shared (सभी वर्कर्स में साझा) या local (प्रति प्रोसेस)"""
+    if app.config['CACHE_BACKEND'] == 'shared':
+        return SharedCache(app.config['CACHE_PATH'] or default_cache_path(), app.config['CACHE_MAX_BYTES'])
+    return LocalCache(app.config['CACHE_MAX_BYTES'])
+
+response_cache = LazyInstance('cache', create_cache)
+
+def cached_call(namespace, key, compute, ttl=None):
+    """कैश से मान लौटाएं, न हो तो compute() -> (मान, कैश करें?) चलाएं; None भी कैश हो सकता है"""
+    entry = response_cache.lookup(namespace, key)
+    stats_store.record_cache(namespace, entry is not None)
+    if entry is not None:
+        return entry[0]
+    value, cacheable = compute()
+    if cacheable:
+        response_cache.store(namespace, key, [value], ttl or app.config['CACHE_TTL'][namespace])
+    return value
+
+class BulkheadFull(Exception):
+    """पूल और उसकी कतार भरी है"""
+
+class Bulkhead:
+    """धीमे काम के लिए अलग सीमित पूल: threads + max_queue से ज़्यादा हों तो तुरंत BulkheadFull, इंतज़ार timeout तक"""
+
+    def __init__(self, name, threads, max_queue, timeout):
+        self.name = name
+        self.threads = threads
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.labels = (('pool', name),)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # फोर्क के बाद वर्कर में पूल के थ्रेड नहीं होते; प्रति प्रोसेस नया पूल और नई गिनती
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix=f'aipin-{self.name}')
+                    self._slots = threading.BoundedSemaphore(self.threads + self.max_queue)
+                    self.active = 0
+                    self.queued = 0
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _count(self, field, delta):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+        metrics.gauge_add(f'aipin_bulkhead_{field}', delta, self.labels)
+
+    def call(self, fn, *args):
+        """fn(*args) पूल में चलाकर नतीजा; भरा हो तो BulkheadFull, timeout पर FutureTimeout"""
+        pool = self._executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            metrics.inc('aipin_bulkhead_rejected_total', self.labels)
+            raise BulkheadFull(f"{self.name} पूल भरा है")
+        self._count('queued', 1)
+
+        def run():
+            self._count('queued', -1)
+            self._count('active', 1)
+            try:
+                return fn(*args)
+            finally:
+                self._count('active', -1)
+                slots.release()
+
+        future = pool.submit(run)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # कतार में ही था तो कभी नहीं चलेगा; चल रहा हो तो स्लॉट काम पूरा होने पर छूटेगा
+            if future.cancel():
+                self._count('queued', -1)
+                slots.release()
+            metrics.inc('aipin_bulkhead_timeouts_total', self.labels)
+            raise
+
+    def stats(self):
+        self._executor()
+        return {'active': self.active, 'queued': self.queued, 'threads': self.threads, 'max_queue': self.max_queue}
+
+# तेज़ उत्तर (KB, विशेष प्रश्न) अनुरोध थ्रेड में ही; धीमी वेब खोज इस अलग पूल में
+web_search_pool = Bulkhead('web_search', app.config['WEB_SEARCH_THREADS'], app.config['WEB_SEARCH_QUEUE'],
+                           app.config['WEB_SEARCH_TIMEOUT'])
+
+class InferenceTimeout(Exception):
+    """अनुरोध अपनी समय सीमा में पूरा नहीं हुआ"""
+
+class StandInModel:
+    """नेटवर्क के बिना नियतात्मक मॉडल: प्रॉम्प्ट के हैश से टोकन, हर डिकोड स्टेप की लागत बैच आकार से"""
+    VOCABULARY = ('यह ', 'एक ', 'उत्तर ', 'है ', 'और ', 'Aipin ', 'मॉडल ', 'से ', 'के ', 'लिए ', 'जानकारी ',
+                  'प्रश्न ', 'का ', 'में ', 'सरल ', 'उदाहरण ')
+
+    def __init__(self, step_ms=None, sequence_ms=None):
+        self.step_ms = app.config['STANDIN_STEP_MS'] if step_ms is None else step_ms
+        self.sequence_ms = app.config['STANDIN_SEQUENCE_MS'] if sequence_ms is None else sequence_ms
+
+    def plan(self, prompt, max_tokens):
+        """प्रॉम्प्ट के टोकन (हर बार वही)"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        length = min(max_tokens, 8 + digest[0] % 24)
+        return [self.VOCABULARY[digest[i % len(digest)] % len(self.VOCABULARY)] for i in range(1, length + 1)]
+
+    def generate_batch(self, prompts, max_tokens):
+        """हर डिकोड स्टेप पर प्रति प्रॉम्प्ट एक टोकन (खत्म हो चुके के लिए None)"""
+        plans = [self.plan(prompt, max_tokens) for prompt in prompts]
+        for step in range(max(len(plan) for plan in plans)):
+            # स्टेप की लागत: स्थिर ओवरहेड + प्रति सक्रिय अनुक्रम थोड़ा; बैचिंग इसी से सस्ती पड़ती है
+            active = sum(1 for plan in plans if step < len(plan))
+            time.sleep((self.step_ms + self.sequence_ms * active) / 1000)
+            yield [plan[step] if step < len(plan) else None for plan in plans]
+
+# INFERENCE_BACKEND नाम -> फैक्टरी; असली मॉडल यहां अपना generate_batch(prompts, max_tokens) वाला क्लास जोड़े
+INFERENCE_BACKENDS = {'standin': StandInModel}
+
+class InferenceRequest:
+    """शेड्यूलर में एक प्रॉम्प्ट: टोकन कतार से स्ट्रीम, cancel() और समय सीमा"""
+    __slots__ = ('prompt', 'deadline', 'tokens', 'cancelled', 'finished')
+    DONE = object()
+
+    def __init__(self, prompt, timeout):
+        self.prompt = prompt
+        self.deadline = time.monotonic() + timeout
+        self.tokens = queue.SimpleQueue()
+        self.cancelled = False
+        self.finished = False
+
+    def cancel(self):
+        """शेड्यूलर अगले स्टेप से इस अनुरोध के टोकन बनाना/भेजना बंद करे"""
+        self.cancelled = True
+
+    def finish(self, error=None):
+        if not self.finished:
+            self.finished = True
+            self.tokens.put(self.DONE if error is None else error)
+
+    def stream(self):
+        """टोकन आते ही yield; समय सीमा निकलने पर InferenceTimeout"""
+        while True:
+            try:
+                item = self.tokens.get(timeout=max(0, self.deadline - time.monotonic()))
+            except queue.Empty:
+                self.cancel()
+                raise InferenceTimeout(f"{app.config['INFERENCE_TIMEOUT']}s में उत्तर नहीं मिला")
+            if item is self.DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+class MicroBatchScheduler:
+    """समवर्ती अनुरोधों को max_batch या max_wait तक इकट्ठा करके backend को एक बैच में भेजें"""
+
+    def __init__(self, backend, max_batch, max_wait, max_tokens):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_tokens = max_tokens
+        self._queue = queue.Queue()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, prompt, timeout=None):
+        """अनुरोध कतार में डालें; लौटे InferenceRequest से stream() या cancel()"""
+        self._ensure_worker()
+        job = InferenceRequest(prompt, app.config['INFERENCE_TIMEOUT'] if timeout is None else timeout)
+        metrics.gauge_add('aipin_inference_queue_depth', 1)
+        self._queue.put(job)
+        return job
+
+    def _ensure_worker(self):
+        # फोर्क के बाद वर्कर में बैच थ्रेड नहीं होता, इसलिए प्रति प्रोसेस नया
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, args=(self._queue,), name='aipin-inference', daemon=True).start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """बैच थ्रेड बंद करें (बेंचमार्क के बाद)"""
+        if self._pid == os.getpid():
+            self._queue.put(None)
+            self._pid = None
+
+    def _collect(self, jobs):
+        """पहला अनुरोध आने तक रुकें, फिर max_wait या max_batch तक और जोड़ें"""
+        first = jobs.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = jobs.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                jobs.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self, jobs):
+        while True:
+            batch = self._collect(jobs)
+            if batch is None:
+                return
+            metrics.gauge_add('aipin_inference_queue_depth', -len(batch))
+            now = time.monotonic()
+            live = []
+            for job in batch:
+                if now > job.deadline:
+                    self._done(job, 'timeout')
+                elif job.cancelled:
+                    self._done(job, 'cancelled')
+                else:
+                    live.append(job)
+            if live:
+                self._generate(live)
+
+    def _generate(self, live):
+        metrics.inc('aipin_inference_batches_total')
+        metrics.inc('aipin_inference_batched_requests_total', value=len(live))
+        steps = self.backend.generate_batch([job.prompt for job in live], self.max_tokens)
+        try:
+            for tokens in steps:
+                now = time.monotonic()
+                for job, token in zip(live, tokens):
+                    if job.finished:
+                        continue
+                    if now > job.deadline:
+                        self._done(job, 'timeout')
+                    elif job.cancelled:
+                        self._done(job, 'cancelled')
+                    elif token is None:
+                        self._done(job, 'ok')
+                    else:
+                        job.tokens.put(token)
+                if all(job.finished for job in live):
+                    break  # सब रद्द/पूरे: बाकी स्टेप न चलाएं
+            for job in live:
+                self._done(job, 'ok')
+        except Exception as e:
+            logger.error(f"Inference batch error: {e}")
+            for job in live:
+                self._done(job, 'error', e)
+        finally:
+            steps.close()
+
+    @staticmethod
+    def _done(job, outcome, error=None):
+        if outcome == 'timeout':
+            error = InferenceTimeout(f"{app.config['INFERENCE_TIMEOUT']}s में उत्तर नहीं मिला")
+        if not job.finished:
+            metrics.inc('aipin_inference_requests_total', (('outcome', outcome),))
+            job.finish(error)
+
+def create_inference_scheduler():
+    """INFERENCE_BACKEND के अनुसार backend और उसके आगे बैच शेड्यूलर"""
+    backend = INFERENCE_BACKENDS[app.config['INFERENCE_BACKEND']]()
+    return MicroBatchScheduler(backend, app.config['INFERENCE_MAX_BATCH'],
+                               app.config['INFERENCE_MAX_WAIT_MS'] / 1000, app.config['INFERENCE_MAX_TOKENS'])
+
+inference = LazyInstance('inference', create_inference_scheduler)
+
+def contains_topic(query_lower, topic):
+    """topic query में है? रोमन विषय शब्द की शुरुआत में ही ('ai' को 'hai' में नहीं, पर 'html' को 'html5' में हां)"""
+    position = query_lower.find(topic)
+    if position < 0 or not topic.isascii():
+        return position >= 0
+    while position >= 0:
+        if position == 0 or not query_lower[position - 1].isalnum():
+            return True
+        position = query_lower.find(topic, position + 1)
+    return False
+
+def edit_distance(a, b, limit):
+    """Damerau (OSA) दूरी; limit से ज़्यादा हो तो limit + 1 (जल्दी रुक जाता है)"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # साझा prefix/suffix हटाकर DP सिर्फ अलग हिस्से पर
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), limit + 1)
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+class SymSpellIndex:
+    """symmetric-delete इंडेक्स: हर विषय के max_distance तक के deletion वेरिएंट -> विषय"""
+    STRIP = '?!.,;:।"\'()'
+
+    def __init__(self, topics, max_distance, min_length):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.deletes = {}  # वेरिएंट -> विषय (एक हो तो str, कई हों तो tuple)
+        self._find = self.deletes.get
+        self.word_counts = set()
+        self.lengths = set()  # max_distance के भीतर किसी विषय की लंबाई वाले वाक्यांश ही जांचें
+        for topic in topics:
+            if len(topic) < min_length:
+                continue
+            topic = sys.intern(topic)
+            self.word_counts.add(topic.count(' ') + 1)
+            self.lengths.update(range(len(topic) - max_distance, len(topic) + max_distance + 1))
+            for variant in self._variants(topic):
+                existing = self.deletes.get(variant)
+                if existing is None:
+                    self.deletes[sys.intern(variant)] = topic
+                elif isinstance(existing, str):
+                    if existing != topic:
+                        self.deletes[variant] = (existing, topic)
+                elif topic not in existing:
+                    self.deletes[variant] = existing + (topic,)
+
+    def __len__(self):
+        return len(self.deletes)
+
+    def _variants(self, term):
+        variants = {term}
+        frontier = {term}
+        for _ in range(self.max_distance):
+            frontier = {word[:i] + word[i + 1:] for word in frontier if len(word) > 1 for i in range(len(word))}
+            variants |= frontier
+        return variants
+
+    def lookup(self, text):
+        """text के शब्द-समूहों में सबसे नज़दीकी विषय (कम दूरी, फिर लंबा विषय), या None"""
+        if not len(self):
+            return None
+        find = self._find
+        words = [word for word in (word.strip(self.STRIP) for word in text.split()) if word]
+        best = None
+        best_key = None
+        for count in self.word_counts:
+            for start in range(len(words) - count + 1):
+                phrase = ' '.join(words[start:start + count]) if count > 1 else words[start]
+                if len(phrase) not in self.lengths:
+                    continue
+                if self.max_distance == 1:
+                    # सामान्य स्थिति: set बनाए बिना सीधे वेरिएंट
+                    variants = [phrase[:i] + phrase[i + 1:] for i in range(len(phrase))]
+                    variants.append(phrase)
+                else:
+                    variants = self._variants(phrase)
+                checked = set()
+                for variant in variants:
+                    found = find(variant)
+                    if found is None:
+                        continue
+                    for topic in ((found,) if isinstance(found, str) else found):
+                        if topic in checked:
+                            continue
+                        checked.add(topic)
+                        key = (edit_distance(phrase, topic, self.max_distance), -len(topic))
+                        if key[0] <= self.max_distance and (best_key is None or key < best_key):
+                            best, best_key = topic, key
+        return best
+
+# रोमन हिंदी (Hinglish) के लिए लिपि-स्वतंत्र ध्वन्यात्मक कुंजियां
+DEVANAGARI_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n', 'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh', 'ञ': 'n',
+    'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n', 'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm', 'य': 'y', 'र': 'r', 'ल': 'l', 'ळ': 'l', 'व': 'v',
+    'श': 'sh', 'ष': 'sh', 'स': 's', 'ह': 'h', 'क़': 'q', 'ख़': 'kh', 'ग़': 'g', 'ज़': 'z', 'ड़': 'r', 'ढ़': 'rh',
+    'फ़': 'f', 'य़': 'y',
+}
+DEVANAGARI_VOWELS = {
+    'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ee', 'उ': 'u', 'ऊ': 'oo', 'ऋ': 'ri', 'ए': 'e', 'ऐ': 'ai', 'ओ': 'o',
+    'औ': 'au', 'ऑ': 'o', 'ऍ': 'e',
+}
+DEVANAGARI_MATRAS = {
+    'ा': 'aa', 'ि': 'i', 'ी': 'ee', 'ु': 'u', 'ू': 'oo', 'ृ': 'ri', 'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au',
+    'ॉ': 'o', 'ॅ': 'e',
+}
+DEVANAGARI_SIGNS = {'ं': 'n', 'ँ': 'n', 'ः': 'h'}
+DEVANAGARI_HALANT = '्'
+DEVANAGARI_NUKTA = '़'
+# रोमन वर्तनी के अंतर (aa/a, ee/i, dh/d, w/v...) एक रूप में; लंबे पैटर्न पहले
+LATIN_FOLD = {
+    'aa': 'a', 'ee': 'i', 'ii': 'i', 'oo': 'u', 'uu': 'u', 'kh': 'k', 'gh': 'g', 'chh': 'c', 'ch': 'c',
+    'jh': 'j', 'th': 't', 'dh': 'd', 'ph': 'f', 'bh': 'b', 'sh': 's', 'w': 'v', 'q': 'k', 'z': 'j', 'c': 'k',
+    'x': 'ks',
+}
+LATIN_FOLD_RE = re.compile('|'.join(sorted(map(re.escape, LATIN_FOLD), key=len, reverse=True)))
+REPEATED_RE = re.compile(r'(.)\1+')
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+
+def transliterate_devanagari(word):
+    """देवनागरी शब्द -> रोमन (अंतिम और VC_CV वाले बीच के 'अ' हटाकर, जैसे अलविदा -> alvidaa)"""
+    syllables = []  # [व्यंजन या '', स्वर, अंतर्निहित 'अ'?]
+    i = 0
+    while i < len(word):
+        char = word[i]
+        if word.startswith('ज्ञ', i):
+            char, i = 'ज्ञ', i + 2
+        consonant = 'gy' if char == 'ज्ञ' else DEVANAGARI_CONSONANTS.get(char)
+        i += 1
+        if consonant is not None:
+            if i < len(word) and word[i] == DEVANAGARI_NUKTA:
+                i += 1
+            following = word[i] if i < len(word) else ''
+            if following in DEVANAGARI_MATRAS:
+                syllables.append([consonant, DEVANAGARI_MATRAS[following], False])
+                i += 1
+            elif following == DEVANAGARI_HALANT:
+                syllables.append([consonant, '', False])
+                i += 1
+            else:
+                syllables.append([consonant, 'a', True])
+        elif char in DEVANAGARI_VOWELS:
+            syllables.append(['', DEVANAGARI_VOWELS[char], False])
+        elif char in DEVANAGARI_SIGNS and syllables:
+            syllables[-1][1] += DEVANAGARI_SIGNS[char]
+        elif char.isascii() and char.isalnum():
+            syllables.append(['', char, False])
+        elif '०' <= char <= '९':
+            syllables.append(['', str(ord(char) - ord('०')), False])
+
+    # schwa deletion, दाएं से बाएं (समझ -> samajh, कमल -> kamal)
+    for k in range(len(syllables) - 1, -1, -1):
+        syllable = syllables[k]
+        if not syllable[2] or len(syllables) == 1:
+            continue
+        if k == len(syllables) - 1:
+            syllable[1] = ''
+        elif k > 0 and syllables[k - 1][1] and syllables[k + 1][0] and syllables[k + 1][1]:
+            syllable[1] = ''
+    return ''.join(consonant + vowel for consonant, vowel, _ in syllables)
 
-# फोल्डर बनाएं
-for folder in ['static', 'templates', 'uploads', 'data']:
-    os.makedirs(folder, exist_ok=True)
+@lru_cache(maxsize=8192)
+def phonetic_key(word):
+    """शब्द की लिपि-स्वतंत्र कुंजी: 'नमस्ते', 'namaste', 'Namastey' लगभग एक जैसी"""
+    latin = transliterate_devanagari(word) if not word.isascii() else word.lower()
+    latin = LATIN_FOLD_RE.sub(lambda m: LATIN_FOLD[m.group()], NON_ALNUM_RE.sub('', latin))
+    return REPEATED_RE.sub(r'\1', latin)
+
+class PhoneticIndex:
+    """ध्वन्यात्मक कुंजी -> विषय; प्रश्न के शब्द-समूहों की कुंजियां एक dict lookup में मिलती हैं"""
+    STRIP = SymSpellIndex.STRIP
+
+    def __init__(self, topics, min_length):
+        self.keys = {}
+        self._find = self.keys.get
+        self.word_counts = set()
+        for topic in topics:
+            key = ' '.join(phonetic_key(word) for word in topic.split())
+            if len(key) < min_length:
+                continue
+            self.keys.setdefault(sys.intern(key), sys.intern(topic))
+            self.word_counts.add(topic.count(' ') + 1)
+        self.word_counts = sorted(self.word_counts, reverse=True)  # लंबे वाक्यांश पहले
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, text):
+        if not len(self):
+            return None
+        find = self._find
+        keys = [phonetic_key(word) for word in (word.strip(self.STRIP) for word in text.split()) if word]
+        for count in self.word_counts:
+            for start in range(len(keys) - count + 1):
+                topic = find(' '.join(keys[start:start + count]) if count > 1 else keys[start])
+                if topic is not None:
+                    return topic
+        return None
+
+def build_topic_indexes(topics):
+    """फ़ज़ी (टाइपो) और ध्वन्यात्मक (रोमन हिंदी) इंडेक्स; कॉन्फ़िग में बंद हों तो None"""
+    topics = list(topics)
+    fuzzy = None
+    if app.config['FUZZY_MAX_EDIT_DISTANCE']:
+        fuzzy = SymSpellIndex(topics, app.config['FUZZY_MAX_EDIT_DISTANCE'], app.config['FUZZY_MIN_LENGTH'])
+    phonetic = PhoneticIndex(topics, app.config['TRANSLIT_MIN_LENGTH']) if app.config['TRANSLITERATION'] else None
+    return fuzzy, phonetic
+
+def snapshot_hash(text):
+    """स्नैपशॉट टेबल की 32-bit कुंजी (crc32; सभी प्रोसेस में एक जैसी)"""
+    return zlib.crc32(text.encode('utf-8'))
+
+def hash_slots(entries, width):
+    """[(हैश, id...)] -> open addressing टेबल (कुंजियां, मान): 2 की घात आकार, आधी खाली; मान id + 1, 0 = खाली स्लॉट"""
+    size = 1 << max(3, (2 * len(entries)).bit_length())
+    mask = size - 1
+    keys = array('I', bytes(4 * size))
+    values = array('I', bytes(4 * size * width))
+    for key, *ids in entries:
+        slot = key & mask
+        while values[slot * width]:
+            slot = (slot + 1) & mask
+        keys[slot] = key
+        for offset, value in enumerate(ids):
+            values[slot * width + offset] = value + 1
+    return keys, values
+
+class SnapshotSymSpellIndex(SymSpellIndex):
+    """SymSpellIndex का lookup, पर वेरिएंट टेबल स्नैपशॉट के mmap में (open addressing, वेरिएंट का crc32)"""
+
+    def __init__(self, keys, values, count, strings, max_distance, min_length, word_counts, lengths):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.word_counts = set(word_counts)
+        self.lengths = set(lengths)
+        self._keys = keys
+        self._values = values
+        self._mask = len(keys) - 1
+        self._count = count
+        self._strings = strings
+        self._find = self._find_hashed
+
+    def __len__(self):
+        return self._count
+
+    def _find_hashed(self, variant):
+        # हैश टकराव से आए अतिरिक्त विषय lookup में edit_distance से छंट जाते हैं
+        keys, values, mask = self._keys, self._values, self._mask
+        key = snapshot_hash(variant)
+        slot = key & mask
+        topics = []
+        while values[slot]:
+            if keys[slot] == key:
+                topics.append(self._strings[values[slot] - 1])
+            slot = (slot + 1) & mask
+        if not topics:
+            return None
+        return topics[0] if len(topics) == 1 else tuple(topics)
+
+class SnapshotPhoneticIndex(PhoneticIndex):
+    """PhoneticIndex का lookup, कुंजी -> विषय टेबल स्नैपशॉट के mmap में (हर स्लॉट: कुंजी id, विषय id)"""
+
+    def __init__(self, keys, values, count, strings, word_counts):
+        self.word_counts = list(word_counts)
+        self._keys = keys
+        self._values = values
+        self._mask = len(keys) - 1
+        self._count = count
+        self._strings = strings
+        self._find = self._find_hashed
+
+    def __len__(self):
+        return self._count
+
+    def _find_hashed(self, key):
+        keys, values, mask = self._keys, self._values, self._mask
+        hashed = snapshot_hash(key)
+        slot = hashed & mask
+        while values[2 * slot]:
+            if keys[slot] == hashed and self._strings[values[2 * slot] - 1] == key:
+                return self._strings[values[2 * slot + 1] - 1]
+            slot = (slot + 1) & mask
+        return None
+
+class KnowledgeSnapshot:
+    """ज्ञान आधार की बाइनरी स्नैपशॉट: स्ट्रिंग टेबल, (श्रेणी, विषय, उत्तर) id और पहले से बने मैचर टेबल; mmap से खुलती है"""
+    MAGIC = b'AIPINKB1'
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = self.buffer = memoryview(self._mmap)
+        if view[:8] != self.MAGIC:
+            raise ValueError(f"{path}: स्नैपशॉट नहीं")
+        header_length = int.from_bytes(view[8:16], 'little')
+        header = json.loads(bytes(view[16:16 + header_length]))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path}: byteorder अलग")
+        base = 16 + header_length
+
+        def section(name, typecode=None):
+            offset, length = header['sections'][name]
+            data = view[base + offset:base + offset + length]
+            return data.cast(typecode) if typecode else data
+
+        # पूरी टेबल एक बार decode, फिर हर स्ट्रिंग उसका slice (कोई JSON पार्सिंग नहीं)
+        text = str(section('strings'), 'utf-8')
+        offsets = section('offsets', 'Q').tolist()
+        strings = [text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        knowledge_base = {strings[category]: {} for category in section('categories', 'I').tolist()}
+        entries = iter(section('entries', 'I').tolist())
+        for category, topic, answer in zip(entries, entries, entries):
+            knowledge_base[strings[category]][strings[topic]] = strings[answer]
+
+        self.path = path
+        self.version = header['version']
+        self.knowledge_base = knowledge_base
+        self.fuzzy = self.phonetic = None
+        if header['fuzzy'] is not None:
+            fuzzy = header['fuzzy']
+            self.fuzzy = SnapshotSymSpellIndex(section('fuzzy_keys', 'I'), section('fuzzy_values', 'I'), fuzzy['count'],
+                                               strings, fuzzy['max_distance'], fuzzy['min_length'],
+                                               fuzzy['word_counts'], fuzzy['lengths'])
+        if header['phonetic'] is not None:
+            phonetic = header['phonetic']
+            self.phonetic = SnapshotPhoneticIndex(section('phonetic_keys', 'I'), section('phonetic_values', 'I'),
+                                                  phonetic['count'], strings, phonetic['word_counts'])
+
+    @classmethod
+    def write(cls, path, knowledge_base, version, fuzzy, phonetic):
+        """स्नैपशॉट atomic लिखें; उत्तर स्ट्रिंग न हों (या श्रेणी dict न हो) तो ValueError"""
+        strings = []
+        ids = {}
+
+        def string_id(value):
+            if not isinstance(value, str):
+                raise ValueError(f"स्नैपशॉट में केवल स्ट्रिंग: {type(value).__name__}")
+            if value not in ids:
+                ids[value] = len(strings)
+                strings.append(value)
+            return ids[value]
+
+        categories = array('I')
+        entries = array('I')
+        for category, topics in knowledge_base.items():
+            if not isinstance(topics, dict):
+                raise ValueError(f"श्रेणी {category} dict नहीं")
+            categories.append(string_id(category))
+            for topic, answer in topics.items():
+                entries.extend((string_id(category), string_id(topic), string_id(answer)))
+
+        sections = {'categories': categories, 'entries': entries}
+        header = {'version': version, 'byteorder': sys.byteorder, 'fuzzy': None, 'phonetic': None}
+        if fuzzy is not None:
+            pairs = [(snapshot_hash(variant), string_id(topic)) for variant, found in fuzzy.deletes.items()
+                     for topic in ((found,) if isinstance(found, str) else found)]
+            sections['fuzzy_keys'], sections['fuzzy_values'] = hash_slots(pairs, 1)
+            header['fuzzy'] = {'count': len(fuzzy), 'max_distance': fuzzy.max_distance, 'min_length': fuzzy.min_length,
+                               'word_counts': sorted(fuzzy.word_counts), 'lengths': sorted(fuzzy.lengths)}
+        if phonetic is not None:
+            triples = [(snapshot_hash(key), string_id(key), string_id(topic)) for key, topic in phonetic.keys.items()]
+            sections['phonetic_keys'], sections['phonetic_values'] = hash_slots(triples, 2)
+            header['phonetic'] = {'count': len(phonetic), 'word_counts': list(phonetic.word_counts)}
+
+        offsets = array('Q', [0])
+        for value in strings:
+            offsets.append(offsets[-1] + len(value))
+        blobs = [('strings', ''.join(strings).encode('utf-8')), ('offsets', offsets.tobytes())]
+        blobs += [(name, data.tobytes()) for name, data in sections.items()]
+
+        # हर सेक्शन 8-byte aligned, ताकि cast सीधे mmap पर हो सके
+        position = 0
+        header['sections'] = {}
+        for name, data in blobs:
+            header['sections'][name] = [position, len(data)]
+            position += len(data) + (-len(data)) % 8
+        encoded = json.dumps(header).encode('utf-8')
+        encoded += b' ' * ((-len(encoded)) % 8)
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(cls.MAGIC + len(encoded).to_bytes(8, 'little') + encoded)
+            for _, data in blobs:
+                f.write(data + b'\0' * ((-len(data)) % 8))
+        os.replace(temp_path, path)
+
+def knowledge_version(knowledge_base):
+    """ज्ञान आधार का छोटा कंटेंट हैश (सभी वर्कर्स में एक जैसा)"""
+    serialized = json.dumps(knowledge_base, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:16]
+
+def load_knowledge_from_json(source_path):
+    """स्नैपशॉट के बिना का रास्ता: JSON पार्स, वर्ज़न हैश और मैचर इंडेक्स (बेंचमार्क की तुलना के लिए)"""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        knowledge_base = json.load(f)
+    knowledge_version(knowledge_base)
+    build_topic_indexes(topic for topics in knowledge_base.values() for topic in topics)
+    return knowledge_base
+
+def load_kb_snapshot(source_path):
+    """JSON स्रोत के हैश वाली स्नैपशॉट mmap करें; न हो (या स्रोत बदला हो) तो कंपाइल करके; बंद/असमर्थ हो तो None"""
+    if not app.config['KB_SNAPSHOT']:
+        return None
+    with open(source_path, 'rb') as f:
+        source = f.read()
+    # फॉर्मेट और मैचर टेबल के कॉन्फ़िग पर भी निर्भर
+    settings = (KnowledgeSnapshot.MAGIC, app.config['FUZZY_MAX_EDIT_DISTANCE'], app.config['FUZZY_MIN_LENGTH'],
+                app.config['TRANSLITERATION'], app.config['TRANSLIT_MIN_LENGTH'])
+    digest = hashlib.sha256(source + repr(settings).encode('utf-8')).hexdigest()[:16]
+    directory = app.config['KB_SNAPSHOT_DIR']
+    # नाम में स्रोत पथ का हैश: एक ही डायरेक्टरी में दूसरे स्रोतों की स्नैपशॉट न हटें
+    prefix = f"kb-{hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:8]}-"
+    name = f"{prefix}{digest}.bin"
+    path = os.path.join(directory, name)
+    try:
+        return KnowledgeSnapshot(path)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    knowledge_base = json.loads(source)
+    try:
+        fuzzy, phonetic = build_topic_indexes(topic for topics in knowledge_base.values() for topic in topics)
+        os.makedirs(directory, exist_ok=True)
+        KnowledgeSnapshot.write(path, knowledge_base, knowledge_version(knowledge_base), fuzzy, phonetic)
+        # इसी स्रोत की पुरानी स्नैपशॉट हटाएं; जिन वर्कर्स ने उन्हें mmap किया है उनकी मैपिंग बनी रहती है
+        for filename in os.listdir(directory):
+            if filename.startswith(prefix) and filename != name:
+                os.remove(os.path.join(directory, filename))
+        return KnowledgeSnapshot(path)
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"KB snapshot error: {e}")
+        return None
+
+@lru_cache(maxsize=65536)
+def ngram_slot(gram, dim):
+    """n-gram का स्थिर हैश आयाम (crc32; Python का hash() हर प्रोसेस में अलग होता है)"""
+    return zlib.crc32(gram.encode('utf-8')) % dim
+
+class SemanticIndex:
+    """hashed char n-gram TF-IDF: (आयाम x विषय) float32 मैट्रिक्स, डिस्क पर .npy और वर्कर्स में mmap से साझा"""
+    NGRAMS = (2, 3)
+    STRIP = SymSpellIndex.STRIP
+
+    def __init__(self, matrix, idf, entries, query_terms):
+        self.matrix = matrix  # हर आयाम की पंक्ति contiguous: प्रश्न केवल अपने आयामों की पंक्तियां पढ़ता है
+        self.idf = idf
+        self.entries = entries  # कॉलम -> (श्रेणी, विषय)
+        self.query_terms = query_terms
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def counts(cls, text, dim):
+        """शब्दों (' शब्द ' पैड के साथ) के char n-grams -> {आयाम: गिनती}"""
+        counts = {}
+        for word in text.lower().split():
+            word = word.strip(cls.STRIP)
+            if not word:
+                continue
+            padded = f" {word} "
+            for n in cls.NGRAMS:
+                for i in range(len(padded) - n + 1):
+                    slot = ngram_slot(padded[i:i + n], dim)
+                    counts[slot] = counts.get(slot, 0) + 1
+        return counts
+
+    @classmethod
+    def build(cls, documents, dim, query_terms):
+        """documents: [((श्रेणी, विषय), टेक्स्ट)]; कॉलम L2-normalized, ताकि स्कोर = cosine"""
+        entries = []
+        slots, columns, counts = [], [], []
+        for column, (entry, text) in enumerate(documents):
+            entries.append(entry)
+            for slot, count in cls.counts(text, dim).items():
+                slots.append(slot)
+                columns.append(column)
+                counts.append(count)
+        slots = np.array(slots, dtype=np.intp)
+        columns = np.array(columns, dtype=np.intp)
+        idf = (np.log((len(entries) + 1) / (np.bincount(slots, minlength=dim) + 1)) + 1).astype(np.float32)
+        matrix = np.zeros((dim, len(entries)), dtype=np.float32)
+        matrix[slots, columns] = (1 + np.log(np.array(counts, dtype=np.float32))) * idf[slots]
+        norms = np.linalg.norm(matrix, axis=0)
+        norms[norms == 0] = 1
+        matrix /= norms
+        return cls(matrix, idf, entries, query_terms)
+
+    def save(self, prefix):
+        """<prefix>.npy (मैट्रिक्स), <prefix>.idf.npy, <prefix>.json (विषय); हर फाइल atomic"""
+        for suffix, values in (('.npy', self.matrix), ('.idf.npy', self.idf)):
+            temp_path = f"{prefix}{suffix}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                np.save(f, values)
+            os.replace(temp_path, prefix + suffix)
+        write_if_changed(prefix + '.json', json.dumps(self.entries, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, prefix, query_terms):
+        """मैट्रिक्स mmap से: पेज कैश में एक ही कॉपी, सभी वर्कर्स उसे पढ़ते हैं"""
+        with open(prefix + '.json', 'r', encoding='utf-8') as f:
+            entries = [tuple(entry) for entry in json.load(f)]
+        matrix = np.asarray(np.load(prefix + '.npy', mmap_mode='r'))  # memmap subclass के ओवरहेड के बिना view
+        return cls(matrix, np.load(prefix + '.idf.npy'), entries, query_terms)
+
+    def query_vector(self, text):
+        """(आयाम, भार) — सबसे भारी query_terms आयाम ही, ताकि लागत विषयों x कुछ पंक्तियां रहे"""
+        counts = self.counts(text, self.matrix.shape[0])
+        if not counts:
+            return None, None
+        slots = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[slots]
+        weights /= np.linalg.norm(weights)
+        if len(slots) > self.query_terms:
+            keep = np.sort(np.argpartition(weights, -self.query_terms)[-self.query_terms:])
+            slots, weights = slots[keep], weights[keep]
+        order = np.argsort(slots)
+        return slots[order], weights[order]
+
+    def _top(self, scores, k):
+        """छोटे k के लिए बार-बार argmax (एक जैसे स्कोर बहुत हों तो argpartition धीमा पड़ता है)"""
+        top = []
+        if k <= 8:
+            for _ in range(min(k, len(scores))):
+                best = int(scores.argmax())
+                top.append((float(scores[best]), self.entries[best]))
+                scores[best] = -np.inf
+            return top
+        order = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+        order = order[np.argsort(-scores[order])]
+        return [(float(scores[i]), self.entries[i]) for i in order]
+
+    def search(self, text, k=1):
+        """[(cosine, (श्रेणी, विषय))], सबसे अच्छा पहले"""
+        slots, weights = self.query_vector(text)
+        if slots is None or not self.entries:
+            return []
+        return self._top(weights @ self.matrix[slots], k)
+
+    def search_batch(self, texts, k=1):
+        """कई प्रश्न एक साथ: (प्रश्न x आयाम) @ (आयाम x विषय), एक BLAS matmul"""
+        if not self.entries:
+            return [[] for _ in texts]
+        queries = np.zeros((len(texts), self.matrix.shape[0]), dtype=np.float32)
+        for row, text in enumerate(texts):
+            slots, weights = self.query_vector(text)
+            if slots is not None:
+                queries[row, slots] = weights
+        # केवल किसी प्रश्न में आए आयामों की पंक्तियां
+        used = np.flatnonzero(queries.any(axis=0))
+        scores = queries[:, used] @ self.matrix[used]
+        return [self._top(scores[row], k) if queries[row].any() else [] for row in range(len(texts))]
+
+def load_semantic_index(knowledge_base, version):
+    """SEMANTIC_DIR/kb-<version> से mmap; न हो तो बनाकर सेव करें (numpy न हो या बंद हो तो None)"""
+    if np is None or not app.config['SEMANTIC_SEARCH']:
+        return None
+    directory = app.config['SEMANTIC_DIR']
+    name = f"kb-{version}-{app.config['SEMANTIC_DIM']}"
+    prefix = os.path.join(directory, name)
+    try:
+        return SemanticIndex.load(prefix, app.config['SEMANTIC_QUERY_TERMS'])
+    except (OSError, ValueError):
+        pass
+
+    documents = [((category, topic), f"{topic} {topic} {response}")
+                 for category, topics in knowledge_base.items() for topic, response in topics.items()]
+    index = SemanticIndex.build(documents, app.config['SEMANTIC_DIM'], app.config['SEMANTIC_QUERY_TERMS'])
+    try:
+        os.makedirs(directory, exist_ok=True)
+        index.save(prefix)
+        # पुराने वर्ज़न हटाएं; जिन वर्कर्स ने उन्हें mmap किया है उनकी मैपिंग बनी रहती है
+        for filename in os.listdir(directory):
+            if filename.startswith('kb-') and not filename.startswith(name + '.'):
+                os.remove(os.path.join(directory, filename))
+        return SemanticIndex.load(prefix, app.config['SEMANTIC_QUERY_TERMS'])
+    except OSError as e:
+        logger.error(f"Semantic index save error: {e}")
+        return index
+
+class TenantKnowledgeBase:
+    """एक टेनेंट (ब्रांड) का ओवरले: केवल जोड़ी/बदली/छिपाई (null) गई प्रविष्टियां; बाकी साझा बेस से"""
+    __slots__ = ('name', 'overlay', 'version', 'indexes', 'responses')
+
+    def __init__(self, name, overlay):
+        self.name = name
+        self.overlay = overlay  # श्रेणी -> {विषय: उत्तर या None}
+        serialized = json.dumps(overlay, ensure_ascii=False, sort_keys=True)
+        self.version = hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:16]
+        # फ़ज़ी/ध्वन्यात्मक इंडेक्स केवल ओवरले के विषयों पर, ताकि मेमोरी ओवरले के साथ ही बढ़े
+        self.responses = {}
+        for topics in overlay.values():
+            for topic, response in topics.items():
+                if response is not None:
+                    self.responses.setdefault(topic, response)
+        self.indexes = [index for index in build_topic_indexes(self.responses) if index is not None]
+
+    def match(self, query_lower):
+        """ओवरले में पहला मेल; None उत्तर वाले (छिपाए गए) विषय छोड़ें"""
+        for topics in self.overlay.values():
+            for topic, response in topics.items():
+                if response is not None and topic in query_lower and contains_topic(query_lower, topic):
+                    return response
+        return None
+
+    def match_fuzzy(self, query_lower):
+        for index in self.indexes:
+            topic = index.lookup(query_lower)
+            if topic is not None:
+                return self.responses[topic]
+        return None
+
+    def shadows(self, category, topic):
+        """क्या ओवरले इस बेस विषय को बदलता/छिपाता है"""
+        topics = self.overlay.get(category)
+        return topics is not None and topic in topics
 
 class AipinAI:
     """AI मॉडल क्लास"""
+    TENANT_NAME = re.compile(r'^[a-z0-9_-]{1,64}$')
     
     def __init__(self):
+        self.snapshot = None
         self.knowledge_base = self.load_knowledge_base()
+        self.kb_version = self.compute_kb_version()
+        self.tenants = self.load_tenants()
+        self._indexes = (None, None, None)
+        self._semantic = (None, None)
+        self.topic_indexes()
+        self.semantic_index()
         self.search_engine_enabled = True
         self.model_name = "Aipin-DeepMind"
-        
+
+    def reload(self):
+        """ज्ञान आधार और टेनेंट ओवरले डिस्क से दोबारा लोड करें"""
+        self.knowledge_base = self.load_knowledge_base()
+        self.tenants = self.load_tenants()
+        self._knowledge_changed()
+
+    def update_knowledge(self, data):
+        """ज्ञान आधार में श्रेणियां जोड़ें/बदलें (नई dict; साझा बेस को जगह पर नहीं बदलते)"""
+        if all(self.knowledge_base.get(category) == topics for category, topics in data.items()):
+            return  # कोई बदलाव नहीं: स्नैपशॉट वाले इंडेक्स बने रहें
+        self.knowledge_base = dict(self.knowledge_base, **data)
+        self._knowledge_changed()
+
+    def load_tenants(self):
+        """TENANT_DIR की हर <नाम>.json फाइल एक टेनेंट ओवरले"""
+        tenants = {}
+        directory = app.config['TENANT_DIR']
+        if not os.path.isdir(directory):
+            return tenants
+        for filename in sorted(os.listdir(directory)):
+            name, ext = os.path.splitext(filename)
+            if ext != '.json' or not self.TENANT_NAME.match(name):
+                continue
+            try:
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                    overlay = json.load(f)
+                tenants[name] = TenantKnowledgeBase(name, {
+                    category: dict(topics) for category, topics in overlay.items() if isinstance(topics, dict)
+                })
+            except (OSError, ValueError, AttributeError) as e:
+                logger.error(f"Tenant load error ({filename}): {e}")
+        return tenants
+
+    def _knowledge_changed(self):
+        """kb_version दोबारा गिनें; बदला हो तो कैश किए उत्तर हटाएं"""
+        previous = self.kb_version
+        self.kb_version = self.compute_kb_version()
+        self.topic_indexes()
+        self.semantic_index()
+        if self.kb_version != previous:
+            response_cache.invalidate()
+
+    def topic_indexes(self):
+        """साझा बेस के (फ़ज़ी, ध्वन्यात्मक) इंडेक्स; knowledge_base बदली (नई dict) हो तो दोबारा बनाएं"""
+        source, fuzzy, phonetic = self._indexes
+        if source is not self.knowledge_base:
+            snapshot = self.snapshot
+            if snapshot is not None and snapshot.knowledge_base is self.knowledge_base:
+                fuzzy, phonetic = snapshot.fuzzy, snapshot.phonetic
+            else:
+                fuzzy, phonetic = build_topic_indexes(topic for topics in self.knowledge_base.values() for topic in topics)
+            self._indexes = (self.knowledge_base, fuzzy, phonetic)
+        return fuzzy, phonetic
+
+    def fuzzy_index(self):
+        return self.topic_indexes()[0]
+
+    def semantic_index(self):
+        """साझा बेस का TF-IDF इंडेक्स (डिस्क से mmap); knowledge_base बदली हो तो उसके कंटेंट हैश वाली फाइल"""
+        source, index = self._semantic
+        if source is not self.knowledge_base:
+            index = load_semantic_index(self.knowledge_base, self.compute_kb_version())
+            self._semantic = (self.knowledge_base, index)
+        return index
+
+    def compute_kb_version(self):
+        """ज्ञान आधार का छोटा कंटेंट हैश (सभी वर्कर्स में एक जैसा; स्नैपशॉट में पहले से गिना हुआ)"""
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.knowledge_base is self.knowledge_base:
+            return snapshot.version
+        return knowledge_version(self.knowledge_base)
+
     def load_knowledge_base(self):
-        """ज्ञान आधार लोड करें"""
-        knowledge_file = 'data/knowledge_base.json'
+        """ज्ञान आधार लोड करें (बाइनरी स्नैपशॉट से, वह न हो तो JSON से)"""
+        knowledge_file = app.config['KNOWLEDGE_FILE']
         if os.path.exists(knowledge_file):
+            self.snapshot = load_kb_snapshot(knowledge_file)
+            if self.snapshot is not None:
+                return self.snapshot.knowledge_base
             with open(knowledge_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
+        self.snapshot = None
         return {
             "general": {
                 "नमस्ते": "नमस्ते! मैं Aipin AI हूं। आपकी कैसे मदद कर सकता हूं?",
@@ -72,12 +2585,25 @@ class AipinAI:
             }
         }
     
+    @timed_stage('web_search')
     def web_search(self, query):
-        """वेब खोज करें"""
+        """वेब खोज करें (सफल नतीजे कैश में); कैश में न हो तो web_search_pool में, भरा हो तो BulkheadFull"""
+        try:
+            return cached_call('web_search', ' '.join(query.lower().split()),
+                               lambda: web_search_pool.call(self._fetch_web_search, query))
+        except FutureTimeout:
+            stats_store.record_web_search(False, web_search_pool.timeout)
+            return "वेब खोज अस्थायी रूप से अनुपलब्ध है।"
+
+    def _fetch_web_search(self, query):
+        """DuckDuckGo से खोज; (परिणाम, कैश करने लायक?) लौटाएं"""
+        start = time.perf_counter()
         try:
             # DuckDuckGo Instant Answer API
-            url = f"https://api.duckduckgo.com/?q={query}&format=json&pretty=1"
-            response = requests.get(url, timeout=5)
+            response = requests.get(app.config['WEB_SEARCH_URL'], params={
+                'q': query, 'format': 'json', 'pretty': 1
+            }, timeout=5)
+            stats_store.record_web_search(response.status_code == 200, time.perf_counter() - start)
             if response.status_code == 200:
                 data = response.json()
                 result = ""
@@ -91,14 +2617,25 @@ class AipinAI:
                     for topic in topics:
                         if isinstance(topic, dict) and topic.get('Text'):
                             result += f"- {topic['Text'][:100]}...\n"
-                return result if result else "वेब खोज से कोई परिणाम नहीं मिला।"
-        except:
-            pass
-        return "वेब खोज अस्थायी रूप से अनुपलब्ध है।"
+                return (result if result else "वेब खोज से कोई परिणाम नहीं मिला।"), True
+        except Exception:
+            stats_store.record_web_search(False, time.perf_counter() - start)
+        return "वेब खोज अस्थायी रूप से अनुपलब्ध है।", False
     
-    def generate_response(self, query, use_web_search=False):
-        """प्रश्न का उत्तर जनरेट करें"""
+    def lookup_knowledge(self, normalized, tenant=None):
+        """ज्ञान आधार मिलान, नतीजा कैश में (KB या ओवरले बदलते ही version बदलता है)"""
+        if tenant is None:
+            return cached_call('knowledge_base', f"{self.kb_version}:{normalized}",
+                               lambda: (self.match_knowledge(normalized), True))
+        return cached_call('knowledge_base', f"{self.kb_version}:{tenant.name}@{tenant.version}:{normalized}",
+                           lambda: (self.match_knowledge(normalized, tenant), True))
+
+    @timed_stage('generate_response')
+    def generate_response(self, query, use_web_search=False, context=None, tenant=None, on_token=None):
+        """प्रश्न का उत्तर जनरेट करें (context: पिछले (query, response) टर्न, पुराने पहले; tenant: ओवरले का नाम;
+        on_token: मॉडल उत्तर के टोकन आते ही, False लौटाए तो अनुरोध रद्द)"""
         query_lower = query.lower()
+        tenant = self.tenants.get(tenant) if tenant else None
         
         # विशेष प्रश्नों के लिए
         special_responses = {
@@ -114,21 +2651,36 @@ class AipinAI:
             "तारीख बताओ": f"आज की तारीख: {datetime.now().strftime('%d/%m/%Y')}"
         }
         
-        for key, response in special_responses.items():
-            if key in query_lower:
-                return response
-        
-        # ज्ञान आधार में खोजें
-        for category, topics in self.knowledge_base.items():
-            for topic, response in topics.items():
-                if topic in query_lower:
+        with metrics.stage('special_responses'):
+            for key, response in special_responses.items():
+                if key in query_lower:
                     return response
-        
+
+        # ज्ञान आधार में खोजें (नतीजा कैश में; KB बदलते ही kb_version बदलता है)
+        with metrics.stage('knowledge_base'):
+            normalized = ' '.join(query_lower.split())
+            answer = self.lookup_knowledge(normalized, tenant)
+            if answer is None and context and len(normalized.split()) <= app.config['CONVERSATION_FOLLOWUP_WORDS']:
+                # "और बताओ" जैसे छोटे फॉलो-अप: पिछले प्रश्न के विषय के साथ मिलाएं
+                previous = ' '.join(context[-1][0].lower().split())
+                answer = self.lookup_knowledge(f"{previous} {normalized}", tenant)
+        if answer is not None:
+            return answer
+
         # वेब खोज
         if use_web_search and self.search_engine_enabled:
-            web_result = self.web_search(query)
+            try:
+                web_result = self.web_search(query)
+            except BulkheadFull:
+                return "वेब खोज अभी व्यस्त है, कृपया कुछ सेकंड बाद दोबारा पूछें।"
             if web_result:
                 return f"वेब खोज परिणाम:\n\n{web_result}\n\n---\n*Aipin AI द्वारा प्रदान किया गया*"
+
+        # मॉडल उत्तर (बैच शेड्यूलर से)
+        if app.config['INFERENCE_BACKEND']:
+            answer = self.model_answer(query, context, on_token)
+            if answer:
+                return answer
         
         # डिफ़ॉल्ट उत्तर
         default_responses = [
@@ -138,18 +2690,74 @@ class AipinAI:
             f"Aipin AI उत्तर: मैं '{query}' के बारे में अभी सीख रहा हूं। कृपया थोड़ी देर बाद पूछें।"
         ]
         
-        import random
         return random.choice(default_responses)
 
+    def model_answer(self, query, context=None, on_token=None):
+        """पिछले टर्न + प्रश्न का प्रॉम्प्ट मॉडल को; समय सीमा पर अब तक का उत्तर (या None)"""
+        prompt = ''.join(f"उपयोगकर्ता: {q}\nAipin: {r}\n" for q, r in context or ()) + f"उपयोगकर्ता: {query}\nAipin:"
+        pending = inference.submit(prompt)
+        parts = []
+        try:
+            for token in pending.stream():
+                parts.append(token)
+                if on_token is not None and on_token(token) is False:
+                    pending.cancel()
+                    break
+        except InferenceTimeout as e:
+            logger.warning(f"Inference timeout: {e}")
+        except Exception as e:
+            logger.error(f"Inference error: {e}")
+        return ''.join(parts).strip() or None
+
+    def match_knowledge(self, query_lower, tenant=None):
+        """ज्ञान आधार में पहला मेल खाता उत्तर, या None (टेनेंट हो तो पहले उसका ओवरले)"""
+        if tenant is not None:
+            answer = tenant.match(query_lower)
+            if answer is not None:
+                return answer
+        for category, topics in self.knowledge_base.items():
+            for topic, response in topics.items():
+                if topic in query_lower and contains_topic(query_lower, topic) and (
+                        tenant is None or not tenant.shadows(category, topic)):
+                    return response
+
+        # सटीक मेल नहीं: टाइपो/मात्रा का अंतर या रोमन लिपि (पहले ओवरले, फिर बेस)
+        if tenant is not None:
+            answer = tenant.match_fuzzy(query_lower)
+            if answer is not None:
+                return answer
+        for index in self.topic_indexes():
+            topic = index.lookup(query_lower) if index is not None else None
+            if topic is None:
+                continue
+            for category, topics in self.knowledge_base.items():
+                if topic in topics and (tenant is None or not tenant.shadows(category, topic)):
+                    return topics[topic]
+
+        # शब्द मेल नहीं: अर्थ में सबसे करीब विषय (paraphrase), केवल साफ़ विजेता हो तो
+        index = self.semantic_index()
+        if index is not None and len(query_lower.split()) >= app.config['SEMANTIC_MIN_WORDS']:
+            hits = [(score, entry) for score, entry in index.search(query_lower, app.config['SEMANTIC_TOP_K'])
+                    if tenant is None or not tenant.shadows(*entry)]
+            if hits and hits[0][0] >= app.config['SEMANTIC_MIN_SCORE'] and (
+                    len(hits) < 2 or hits[0][0] - hits[1][0] >= app.config['SEMANTIC_MIN_MARGIN']):
+                category, topic = hits[0][1]
+                return self.knowledge_base[category][topic]
+        return None
+
 class Database:
     """डेटाबेस क्लास"""
     
     def __init__(self):
         self.init_database()
+
+    def connect(self, **kwargs):
+        """कनेक्शन खोलें (खुले कनेक्शन मेट्रिक्स में गिने जाते हैं)"""
+        return sqlite3.connect(app.config['DATABASE'], factory=TrackedConnection, **kwargs)
     
     def init_database(self):
         """डेटाबेस इनिशियलाइज़ करें"""
-        conn = sqlite3.connect(app.config['DATABASE'])
+        conn = self.connect()
         cursor = conn.cursor()
         
         # यूजर्स टेबल
@@ -175,6 +2783,34 @@ class Database:
             )
         ''')
         
+        # user_id के हिसाब से हिस्ट्री और उसका ETag (MAX(id)) इंडेक्स से
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_chat_history_user
+            ON chat_history (user_id, id)
+        ''')
+
+        # प्रश्न रोलअप (सामान्यीकृत प्रश्न -> गिनती), save_chat के साथ एक ही ट्रांजैक्शन में; वार्मअप इससे पढ़ता है
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS query_stats (
+                normalized TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0,
+                web_searches INTEGER NOT NULL DEFAULT 0,
+                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_query_stats_count
+            ON query_stats (count)
+        ''')
+        if cursor.execute('SELECT 1 FROM query_stats LIMIT 1').fetchone() is None:
+            # पुराने डेटाबेस: रोलअप एक बार मौजूदा हिस्ट्री से भरें
+            counts = {}
+            for (query,) in cursor.execute('SELECT query FROM chat_history').fetchall():
+                normalized = self.normalize_query(query or '')
+                if normalized:
+                    counts[normalized] = counts.get(normalized, 0) + 1
+            cursor.executemany('INSERT INTO query_stats (normalized, count) VALUES (?, ?)', counts.items())
+
         # फाइल्स टेबल
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS files (
@@ -188,42 +2824,346 @@ class Database:
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
-        
+
+        # यूजर स्टोरेज काउंटर टेबल (files के साथ एक ही ट्रांजैक्शन में अपडेट)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_usage (
+                user_id INTEGER PRIMARY KEY,
+                bytes_used INTEGER NOT NULL DEFAULT 0,
+                file_count INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+
         conn.commit()
         conn.close()
+
+    @timed_stage('get_usage')
+    def get_usage(self, user_id):
+        """यूजर का स्टोरेज उपयोग प्राप्त करें (bytes_used, file_count)"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT bytes_used, file_count FROM user_usage WHERE user_id = ?',
+            (user_id,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        return row if row else (0, 0)
+
+    @db_write
+    @timed_stage('add_file')
+    def add_file(self, user_id, filename, filepath, filetype, size, quota):
+        """फाइल रिकॉर्ड जोड़ें और काउंटर बढ़ाएं; कोटा पार होने पर None लौटाएं"""
+        conn = self.connect(isolation_level=None)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(
+                'INSERT OR IGNORE INTO user_usage (user_id) VALUES (?)',
+                (user_id,)
+            )
+            # कोटा जांच और रिज़र्वेशन एक ही स्टेटमेंट में, ताकि समानांतर अपलोड रेस न करें
+            cursor.execute(
+                'UPDATE user_usage SET bytes_used = bytes_used + ?, file_count = file_count + 1 '
+                'WHERE user_id = ? AND bytes_used + ? <= ?',
+                (size, user_id, size, quota)
+            )
+            if cursor.rowcount == 0:
+                cursor.execute('ROLLBACK')
+                return None
+            cursor.execute(
+                'INSERT INTO files (user_id, filename, filepath, filetype, size) VALUES (?, ?, ?, ?, ?)',
+                (user_id, filename, filepath, filetype, size)
+            )
+            file_id = cursor.lastrowid
+            cursor.execute('COMMIT')
+            return file_id
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    @db_write
+    @timed_stage('delete_file')
+    def delete_file(self, user_id, file_id):
+        """फाइल रिकॉर्ड हटाएं और काउंटर घटाएं; हटाई गई फाइल का path लौटाएं"""
+        conn = self.connect(isolation_level=None)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(
+                'SELECT filepath, size FROM files WHERE id = ? AND user_id = ?',
+                (file_id, user_id)
+            )
+            row = cursor.fetchone()
+            if not row:
+                cursor.execute('ROLLBACK')
+                return None
+            filepath, size = row
+            cursor.execute('DELETE FROM files WHERE id = ?', (file_id,))
+            cursor.execute(
+                'UPDATE user_usage SET bytes_used = MAX(bytes_used - ?, 0), '
+                'file_count = MAX(file_count - 1, 0) WHERE user_id = ?',
+                (size or 0, user_id)
+            )
+            cursor.execute('COMMIT')
+            return filepath
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    @db_write
+    def reconcile_usage(self):
+        """files टेबल से काउंटर दोबारा गिनें और ड्रिफ्ट ठीक करें; ठीक की गई पंक्तियों की संख्या लौटाएं"""
+        conn = self.connect(isolation_level=None)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT t.user_id, t.bytes_used, t.file_count
+                FROM (
+                    SELECT user_id, COALESCE(SUM(size), 0) AS bytes_used, COUNT(*) AS file_count
+                    FROM files GROUP BY user_id
+                ) AS t
+                LEFT JOIN user_usage u ON u.user_id = t.user_id
+                WHERE u.user_id IS NULL OR u.bytes_used != t.bytes_used OR u.file_count != t.file_count
+            ''')
+            drifted = cursor.fetchall()
+            cursor.executemany(
+                'INSERT INTO user_usage (user_id, bytes_used, file_count) VALUES (?, ?, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET bytes_used = excluded.bytes_used, '
+                'file_count = excluded.file_count',
+                drifted
+            )
+            # जिन यूजर्स की कोई फाइल नहीं बची उनके काउंटर शून्य करें
+            cursor.execute('''
+                UPDATE user_usage SET bytes_used = 0, file_count = 0
+                WHERE (bytes_used != 0 OR file_count != 0)
+                  AND user_id NOT IN (SELECT DISTINCT user_id FROM files WHERE user_id IS NOT NULL)
+            ''')
+            fixed = len(drifted) + cursor.rowcount
+            cursor.execute('COMMIT')
+            return fixed
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
     
-    def save_chat(self, user_id, query, response):
-        """चैट सेव करें"""
-        conn = sqlite3.connect(app.config['DATABASE'])
+    @db_write
+    @timed_stage('save_chat')
+    def save_chat(self, user_id, query, response, web_search=False):
+        """चैट सेव करें (query_stats रोलअप भी उसी ट्रांजैक्शन में)"""
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute(
             'INSERT INTO chat_history (user_id, query, response) VALUES (?, ?, ?)',
             (user_id, query, response)
         )
+        chat_id = cursor.lastrowid
+        normalized = self.normalize_query(query)
+        if normalized:
+            cursor.execute('''
+                INSERT INTO query_stats (normalized, count, web_searches) VALUES (?, 1, ?)
+                ON CONFLICT(normalized) DO UPDATE SET
+                    count = count + 1,
+                    web_searches = web_searches + excluded.web_searches,
+                    last_seen = CURRENT_TIMESTAMP
+            ''', (normalized, int(bool(web_search))))
         conn.commit()
         conn.close()
+        return chat_id
+
+    @staticmethod
+    def normalize_query(query):
+        """रोलअप की कुंजी (कैश कुंजी जैसी); बहुत लंबे प्रश्न के लिए खाली"""
+        normalized = ' '.join(query.lower().split())
+        return normalized if len(normalized) <= app.config['QUERY_STATS_MAX_CHARS'] else ''
+
+    @timed_stage('top_queries')
+    def top_queries(self, limit):
+        """सबसे ज़्यादा पूछे गए (सामान्यीकृत प्रश्न, वेब खोज गिनती), count इंडेक्स से"""
+        conn = self.connect()
+        rows = conn.execute(
+            'SELECT normalized, web_searches FROM query_stats ORDER BY count DESC LIMIT ?', (limit,)
+        ).fetchall()
+        conn.close()
+        return rows
     
-    def get_chat_history(self, user_id, limit=50):
-        """चैट हिस्ट्री प्राप्त करें"""
-        conn = sqlite3.connect(app.config['DATABASE'])
+    @timed_stage('get_chat_history')
+    def get_chat_history(self, user_id, limit=50, before=None, after=None):
+        """चैट हिस्ट्री (id, query, response, timestamp), सबसे नए पहले; before/after id cursor हैं"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        # idx_chat_history_user (user_id, id) पर रेंज स्कैन, OFFSET नहीं
+        if after is not None:
+            cursor.execute(
+                'SELECT id, query, response, timestamp FROM chat_history '
+                'WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?',
+                (user_id, after, limit)
+            )
+            history = cursor.fetchall()[::-1]
+        else:
+            cursor.execute(
+                'SELECT id, query, response, timestamp FROM chat_history '
+                'WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+                (user_id, before if before is not None else sys.maxsize, limit)
+            )
+            history = cursor.fetchall()
+        conn.close()
+        return history
+
+    @timed_stage('get_latest_chat_id')
+    def get_latest_chat_id(self, user_id):
+        """यूजर की सबसे नई चैट का id (इंडेक्स से, पूरा स्कैन नहीं)"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(id) FROM chat_history WHERE user_id = ?', (user_id,))
+        latest = cursor.fetchone()[0]
+        conn.close()
+        return latest or 0
+
+    @timed_stage('get_recent_turns')
+    def get_recent_turns(self, user_id, limit):
+        """बातचीत संदर्भ के लिए पिछले टर्न, सबसे नए पहले (idx_chat_history_user से)"""
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute(
-            'SELECT query, response, timestamp FROM chat_history WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?',
+            'SELECT id, query, response FROM chat_history WHERE user_id = ? ORDER BY id DESC LIMIT ?',
             (user_id, limit)
         )
-        history = cursor.fetchall()
+        turns = cursor.fetchall()
         conn.close()
-        return history
+        return turns
+
+# AI इंस्टेंस (पहले उपयोग पर बनते हैं, import पर नहीं)
+ai_engine = LazyInstance('ai_engine', AipinAI)
+db = LazyInstance('database', Database)
+
+class ConversationSession:
+    """एक यूजर के पिछले टर्न: (query, response) tuples की सीमित deque"""
+    __slots__ = ('turns', 'last_id', 'last_seen', 'size')
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.last_id = 0
+        self.last_seen = time.monotonic()
+        self.size = 0
+
+    @staticmethod
+    def turn_size(turn):
+        return sys.getsizeof(turn) + sys.getsizeof(turn[0]) + sys.getsizeof(turn[1])
+
+    def push(self, turn, chat_id):
+        """टर्न जोड़ें; deque भरी हो तो सबसे पुराना गिरता है। बाइट्स का बदलाव लौटाएं"""
+        delta = self.turn_size(turn)
+        if len(self.turns) == self.turns.maxlen:
+            delta -= self.turn_size(self.turns[0])
+        self.turns.append(turn)
+        self.last_id = chat_id
+        self.size += delta
+        return delta
+
+class ConversationStore:
+    """मल्टी-टर्न संदर्भ: प्रति यूजर पिछले N टर्न, idle expiry और कुल मेमोरी सीमा (LRU eviction)"""
+    SESSION_OVERHEAD = 256  # ConversationSession + deque + OrderedDict एंट्री का मोटा अनुमान
+
+    def __init__(self):
+        self._sessions = OrderedDict()  # user_id -> ConversationSession, सबसे पुराना पहले
+        self._bytes = 0
+        self._lock = threading.Lock()
 
-# AI इंस्टेंस बनाएं
-ai_engine = AipinAI()
-db = Database()
+    def __len__(self):
+        return len(self._sessions)
+
+    def context(self, user_id):
+        """पिछले टर्न (पुराने पहले); मेमोरी में न हों तो DB से एक इंडेक्स्ड क्वेरी में दोबारा बनाएं"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and now - session.last_seen > app.config['CONVERSATION_IDLE_SECONDS']:
+                self._drop(user_id)
+                session = None
+            if session is not None:
+                self._sessions.move_to_end(user_id)
+                session.last_seen = now
+
+        if session is not None and app.config['CONVERSATION_CHECK_LATEST']:
+            # दूसरे वर्कर ने इस यूजर के टर्न सेव किए हों तो यह कॉपी पुरानी है
+            if db.get_latest_chat_id(user_id) != session.last_id:
+                with self._lock:
+                    if self._sessions.get(user_id) is session:
+                        self._drop(user_id)
+                session = None
+
+        if session is not None:
+            stats_store.record_cache('conversation', True)
+            return list(session.turns)
+
+        stats_store.record_cache('conversation', False)
+        session = ConversationSession(app.config['CONVERSATION_TURNS'])
+        for chat_id, query, response in reversed(db.get_recent_turns(user_id, app.config['CONVERSATION_TURNS'])):
+            session.push((query, response), chat_id)
+        with self._lock:
+            if user_id not in self._sessions:
+                self._insert(user_id, session)
+        return list(session.turns)
+
+    def append(self, user_id, query, response, chat_id):
+        """सेव हुआ टर्न जोड़ें; सेशन मेमोरी में नहीं है तो अगला context() DB से बना लेगा"""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return
+            delta = session.push((query, response), chat_id)
+            session.last_seen = time.monotonic()
+            self._sessions.move_to_end(user_id)
+            self._bytes += delta
+            metrics.gauge_add('aipin_conversation_bytes', delta)
+            self._evict()
+
+    def _insert(self, user_id, session):
+        self._sessions[user_id] = session
+        size = session.size + self.SESSION_OVERHEAD
+        self._bytes += size
+        metrics.gauge_add('aipin_conversation_sessions', 1)
+        metrics.gauge_add('aipin_conversation_bytes', size)
+        self._evict()
+
+    def _drop(self, user_id):
+        session = self._sessions.pop(user_id)
+        size = session.size + self.SESSION_OVERHEAD
+        self._bytes -= size
+        metrics.gauge_add('aipin_conversation_sessions', -1)
+        metrics.gauge_add('aipin_conversation_bytes', -size)
+
+    def _evict(self):
+        """पहले idle सेशन हटाएं, फिर मेमोरी सीमा तक सबसे कम हाल में उपयोग हुए (सबसे नया बचा रहे)"""
+        deadline = time.monotonic() - app.config['CONVERSATION_IDLE_SECONDS']
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= deadline and (
+                    self._bytes <= app.config['CONVERSATION_MAX_BYTES'] or len(self._sessions) == 1):
+                break
+            self._drop(user_id)
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'bytes': self._bytes,
+                    'max_bytes': app.config['CONVERSATION_MAX_BYTES']}
+
+conversations = ConversationStore()
 
 # हेल्पर फंक्शंस
 def allowed_file(filename):
     """फाइल एक्सटेंशन चेक करें"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+@timed_stage('analyze_file')
 def analyze_file(filepath):
     """फाइल का विश्लेषण करें"""
     try:
@@ -249,6 +3189,514 @@ def analyze_file(filepath):
     except Exception as e:
         return {'error': str(e)}
 
+def reconcile_usage_once():
+    """स्टोरेज काउंटर्स का एक बार मिलान करें (गलतियां लॉग करें, उठाएं नहीं)"""
+    try:
+        fixed = db.reconcile_usage()
+        if fixed:
+            logger.warning(f"Usage reconcile: {fixed} यूजर काउंटर ठीक किए गए")
+    except Exception as e:
+        logger.error(f"Usage reconcile error: {e}")
+
+def start_usage_reconciler(interval=None):
+    """बैकग्राउंड में स्टोरेज काउंटर्स का समय-समय पर मिलान करें"""
+    interval = interval or app.config['USAGE_RECONCILE_INTERVAL']
+
+    def run():
+        while True:
+            reconcile_usage_once()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='usage-reconciler', daemon=True)
+    thread.start()
+    return thread
+
+class CacheWarmer:
+    """वर्कर शुरू होने (और रीलोड के बाद नए वर्कर) पर बैकग्राउंड में mmap पेज और टॉप प्रश्नों के कैश गर्म करें"""
+
+    def __init__(self):
+        self._pid = None
+        self._buckets = None
+        self.last = None
+
+    def start(self):
+        """इस प्रोसेस में एक बार वार्मअप थ्रेड शुरू करें; स्टार्टअप इसका इंतज़ार नहीं करता"""
+        if self._pid == os.getpid() or not app.config['WARMUP_QUERIES']:
+            return None
+        self._pid = os.getpid()
+        self._buckets = MemoryBucketStore()
+        thread = threading.Thread(target=self.run, name='cache-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def _wait(self, key, rate):
+        """टोकन बकेट (burst 1) से गति सीमित; सभी अनुरोध थ्रेड व्यस्त हों तो तब तक रुकें"""
+        while rate_limiter.inflight >= app.config['SERVER_THREADS']:
+            time.sleep(0.05)
+        while True:
+            allowed, retry_after = self._buckets.take(key, rate, 1, time.time())
+            if allowed:
+                return
+            time.sleep(retry_after)
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            touched = self.touch_pages()
+            warmed, searched = self.warm_queries()
+        except Exception as e:
+            logger.error(f"Cache warmup error: {e}")
+            return
+        self.last = {'queries': warmed, 'web_searches': searched, 'bytes': touched,
+                     'seconds': round(time.perf_counter() - start, 3)}
+        logger.info(f"Cache warmup: {warmed} प्रश्न, {searched} वेब खोज, {touched / 1e6:.1f}MB पेज, "
+                    f"{self.last['seconds']}s")
+
+    def touch_pages(self):
+        """KB स्नैपशॉट और semantic इंडेक्स की mmap फाइलों का हर पेज एक बार पढ़ें (WARMUP_IO_BYTES_PER_SEC तक)"""
+        buffers = []
+        if ai_engine.snapshot is not None:
+            buffers.append(ai_engine.snapshot.buffer)
+        index = ai_engine.semantic_index()
+        if index is not None:
+            buffers += [memoryview(values.reshape(-1)).cast('B') for values in (index.matrix, index.idf)]
+        chunk = app.config['WARMUP_IO_CHUNK']
+        rate = app.config['WARMUP_IO_BYTES_PER_SEC'] / chunk
+        touched = 0
+        for buffer in buffers:
+            for offset in range(0, len(buffer), chunk):
+                self._wait('io', rate)
+                buffer[offset:offset + chunk:mmap.PAGESIZE].tobytes()
+                touched += min(chunk, len(buffer) - offset)
+        metrics.inc('aipin_warmup_bytes_total', (), touched)
+        return touched
+
+    def claim_web_step(self):
+        """वेब खोज वार्मअप प्रति डिप्लॉयमेंट एक बार: साझा कैश में पहला दावा करने वाला वर्कर ही
+        (नतीजे साझा कैश से सबको मिलते हैं); प्रति प्रोसेस कैश और कई वर्कर हों तो बिल्कुल नहीं"""
+        if not app.config['WARMUP_WEB_SEARCHES'] or not ai_engine.search_engine_enabled:
+            return False
+        cache = response_cache.get()
+        if isinstance(cache, LocalCache) and app.config['SERVER_WORKERS'] > 1:
+            return False
+        return cache.add('warmup', 'web_search', [os.getpid()], app.config['CACHE_TTL']['web_search'])
+
+    def warm_queries(self):
+        """query_stats के टॉप प्रश्नों के ज्ञान आधार उत्तर, और जिनके लिए वेब खोज हुई थी उनके वेब नतीजे कैश में"""
+        warmed = searched = 0
+        web_step = None
+        for normalized, web_searches in db.top_queries(app.config['WARMUP_QUERIES']):
+            self._wait('queries', app.config['WARMUP_RATE'])
+            answer = ai_engine.lookup_knowledge(normalized)
+            warmed += 1
+            metrics.inc('aipin_warmup_queries_total', (('kind', 'knowledge_base'),))
+            if answer is None and web_searches and searched < app.config['WARMUP_WEB_SEARCHES']:
+                if web_step is None:
+                    web_step = self.claim_web_step()
+                if not web_step:
+                    continue
+                # लाइव अनुरोधों के स्लॉट न लें: पूल में कुछ भी चल/रुका हो तो यह प्रश्न छोड़ें (वार्मअप एक बार में एक ही स्लॉट)
+                pool = web_search_pool.stats()
+                if pool['active'] or pool['queued']:
+                    continue
+                try:
+                    ai_engine.web_search(normalized)
+                except BulkheadFull:
+                    continue
+                searched += 1
+                metrics.inc('aipin_warmup_queries_total', (('kind', 'web_search'),))
+        return warmed, searched
+
+cache_warmer = CacheWarmer()
+
+class AssetManifest:
+    """मूल नाम -> कंटेंट-हैश वाले नाम की मैपिंग (static/manifest.json)"""
+
+    def __init__(self):
+        self.assets = {}
+        self.fingerprinted = set()
+        self._loaded = False
+
+    def path(self):
+        return os.path.join(app.config['STATIC_FOLDER'], 'manifest.json')
+
+    def update(self, assets):
+        self.assets = dict(assets)
+        self.fingerprinted = set(assets.values())
+        self._loaded = True
+
+    def load(self):
+        """डिस्क से मैनिफेस्ट पढ़ें (वर्कर्स में पहली बार ज़रूरत पर)"""
+        try:
+            with open(self.path(), 'r', encoding='utf-8') as f:
+                self.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            self._loaded = True
+
+    def url(self, name):
+        if not self._loaded:
+            self.load()
+        return f"/static/{self.assets.get(name, name)}"
+
+    def is_fingerprinted(self, filename):
+        if not self._loaded:
+            self.load()
+        return filename in self.fingerprinted
+
+asset_manifest = AssetManifest()
+
+def build_static_assets():
+    """हैश वाले नाम और पहले से कंप्रेस्ड .gz/.br वेरिएंट बनाएं"""
+    static_folder = app.config['STATIC_FOLDER']
+    assets = {}
+    for name in app.config['FINGERPRINTED_ASSETS']:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        hashed_name = f"{stem}.{digest}{ext}"
+        hashed_path = os.path.join(static_folder, hashed_name)
+
+        # नाम में हैश है, इसलिए फाइल मौजूद है तो कंटेंट भी वही है
+        variants = [
+            (hashed_path, lambda: data),
+            (hashed_path + '.gz', lambda: gzip.compress(data, 9, mtime=0))
+        ]
+        if brotli is not None:
+            variants.append((hashed_path + '.br', lambda: brotli.compress(data, quality=11)))
+        for path, make in variants:
+            if os.path.exists(path):
+                startup_report.record_file(False)
+            else:
+                write_if_changed(path, make())
+        assets[name] = hashed_name
+
+    write_if_changed(asset_manifest.path(), json.dumps(assets, indent=2, sort_keys=True))
+    asset_manifest.update(assets)
+    return assets
+
+def negotiate_encoding(accept_encoding, available):
+    """Accept-Encoding (q-values सहित) से सबसे अच्छा उपलब्ध एन्कोडिंग चुनें"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+def measure_page_bytes(accept_encoding='br, gzip'):
+    """होमपेज और उसके स्टेटिक एसेट्स के लिए भेजे गए बाइट्स मापें"""
+    client = app.test_client()
+    headers = {'Accept-Encoding': accept_encoding}
+    page = client.get('/', headers=headers)
+    result = {'html': len(page.data), 'assets': {}, 'repeat_visit_requests': 0}
+    for url in re.findall(r'(?:href|src)="(/static/[^"]+)"', page.get_data(as_text=True)):
+        response = client.get(url, headers=headers)
+        result['assets'][url] = len(response.data)
+        # immutable न हो तो अगली विज़िट पर ब्राउज़र फिर से वैलिडेट करेगा
+        if 'immutable' not in response.headers.get('Cache-Control', ''):
+            result['repeat_visit_requests'] += 1
+    result['first_visit_total'] = result['html'] + sum(result['assets'].values())
+    return result
+
+def conditional_json(etag, cache_control, build):
+    """If-None-Match मेल खाए तो बिना बॉडी बनाए 304, वरना build() का JSON"""
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+class MemoryBucketStore:
+    """इन-प्रोसेस टोकन बकेट स्टोर"""
+
+    def __init__(self, max_keys=100000):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def take(self, key, rate, burst, now):
+        """एक टोकन लें; (अनुमति, कितने सेकंड बाद दोबारा) लौटाएं"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            # तीसरा मान: इतने सेकंड बाद बकेट पूरा भर जाएगा (हर रूट की अपनी दर से)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now, burst / rate)
+                return True, 0.0
+            self._buckets[key] = (tokens, now, burst / rate)
+            return False, (1 - tokens) / rate
+
+    def _prune(self, now):
+        # जो बकेट अब तक पूरे भर चुके होंगे उन्हें रखने की ज़रूरत नहीं
+        for key in [k for k, (_, last, full_after) in self._buckets.items() if now - last >= full_after]:
+            del self._buckets[key]
+
+class SQLiteBucketStore:
+    """SQLite फाइल में साझा टोकन बकेट, ताकि सभी वर्कर्स पर एक ही लिमिट लगे"""
+    PRUNE_INTERVAL = 60  # सेकंड, प्रति प्रोसेस
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = 0
+        conn = self._connection()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(rate_buckets)')]
+        if columns and 'full_after' not in columns:
+            # पुराना स्कीमा; बकेट अस्थायी हैं, इसलिए दोबारा बनाना ही काफी
+            conn.execute('DROP TABLE IF EXISTS rate_buckets')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                allowed INTEGER NOT NULL,
+                full_after REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=1.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, now):
+        """एक ही UPSERT स्टेटमेंट में रिफिल और टोकन लेना (atomic)"""
+        if now >= self._next_prune:
+            self._next_prune = now + self.PRUNE_INTERVAL
+            self._prune(now)
+        row = self._connection().execute('''
+            INSERT INTO rate_buckets (key, tokens, updated, allowed, full_after) VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                tokens = CASE WHEN MIN(?, tokens + (excluded.updated - updated) * ?) >= 1
+                              THEN MIN(?, tokens + (excluded.updated - updated) * ?) - 1
+                              ELSE MIN(?, tokens + (excluded.updated - updated) * ?) END,
+                allowed = MIN(?, tokens + (excluded.updated - updated) * ?) >= 1,
+                updated = excluded.updated,
+                full_after = excluded.full_after
+            RETURNING allowed, tokens
+        ''', (key, burst - 1, now, burst / rate, burst, rate, burst, rate, burst, rate, burst, rate)).fetchone()
+        allowed, tokens = row
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / rate
+
+    def _prune(self, now):
+        """जो बकेट अब तक पूरे भर चुके होंगे उनकी पंक्तियां हटाएं (हर IP/यूजर की पंक्ति हमेशा न रहे)"""
+        try:
+            self._connection().execute('DELETE FROM rate_buckets WHERE updated + full_after <= ?', (now,))
+        except sqlite3.OperationalError as e:
+            # दूसरा वर्कर लिख रहा हो तो अगली बार
+            logger.warning(f"Rate bucket prune skipped: {e}")
+
+class RateLimiter:
+    """प्रति IP/यूजर और प्रति रूट टोकन बकेट रेट लिमिटिंग और इन-फ्लाइट लोड शेडिंग"""
+
+    def __init__(self):
+        self._store = None
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            if app.config['RATE_LIMIT_STORE'] == 'sqlite':
+                ensure_folders()
+                self._store = SQLiteBucketStore(app.config['RATE_LIMIT_DB'])
+            else:
+                self._store = MemoryBucketStore()
+        return self._store
+
+    @property
+    def inflight(self):
+        return self._inflight
+
+    def identities(self, user_id=None):
+        """इस अनुरोध की पहचान: पहले IP, फिर यूजर (हेडर, क्वेरी या JSON बॉडी से)"""
+        yield f"ip:{request.remote_addr}"
+        if user_id is None:
+            user_id = request.headers.get('X-User-Id') or request.args.get('user_id')
+        if user_id is None and request.is_json and (request.content_length or 0) <= app.config['RATE_LIMIT_BODY_MAX']:
+            # जेनरेटेड फ्रंटएंड X-User-Id भेजता है; बाकी क्लाइंट्स के लिए बॉडी यहीं पार्स (व्यू के लिए कैश रहती है)
+            body = request.get_json(silent=True)
+            if isinstance(body, dict):
+                user_id = body.get('user_id')
+        if user_id is not None and user_id != '':
+            yield f"user:{str(user_id)[:64]}"
+
+    def check(self, route, user_id=None):
+        """रोकना हो तो (error, status, retry_after) लौटाएं; IP बकेट बॉडी पढ़ने से पहले जांचा जाता है"""
+        max_inflight = app.config['SHED_MAX_INFLIGHT'] or max(1, app.config['SERVER_THREADS'] * 3 // 4)
+        if self._inflight >= max_inflight:
+            return 'सर्वर व्यस्त है, थोड़ी देर बाद प्रयास करें', 503, 1
+
+        now = time.time()
+        for identity in self.identities(user_id):
+            limits = app.config['RATE_LIMITS_IP'] if identity.startswith('ip:') else app.config['RATE_LIMITS']
+            rate, burst = limits[route]
+            allowed, retry_after = self.store.take(f"{route}:{identity}", rate, burst, now)
+            if not allowed:
+                return 'बहुत अधिक अनुरोध, थोड़ी देर बाद प्रयास करें', 429, retry_after
+        return None
+
+    def enter(self):
+        with self._inflight_lock:
+            self._inflight += 1
+
+    def leave(self):
+        with self._inflight_lock:
+            self._inflight -= 1
+
+rate_limiter = RateLimiter()
+
+def rate_limited(route):
+    """रूट पर रेट लिमिट और लोड शेडिंग लगाने वाला डेकोरेटर"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            rejected = rate_limiter.check(route)
+            if rejected:
+                error, status, retry_after = rejected
+                response = jsonify({'error': error})
+                response.status_code = status
+                response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                return response
+
+            rate_limiter.enter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                rate_limiter.leave()
+        return wrapper
+    return decorator
+
+def compress_body(data, encoding):
+    """दिए गए एन्कोडिंग से बाइट्स कंप्रेस करें"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, app.config['COMPRESS_GZIP_LEVEL'])
+
+@app.after_request
+def compress_response(response):
+    """Accept-Encoding के अनुसार डायनामिक रिस्पॉन्स को br/gzip में कंप्रेस करें"""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), available)
+    if encoding is None:
+        return response
+
+    response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def benchmark_json(user_id=1, limit=50, rounds=200):
+    """असली हिस्ट्री पेज पर JSON एन्कोडिंग समय और वायर साइज़ मापें"""
+    history = db.get_chat_history(user_id, limit)
+    page = {
+        'success': True,
+        'history': [
+            {'id': chat_id, 'query': query, 'response': response, 'timestamp': timestamp}
+            for chat_id, query, response, timestamp in history
+        ]
+    }
+
+    encoders = [
+        ('json ensure_ascii=True', lambda: json.dumps(page, ensure_ascii=True, separators=(',', ':')).encode('utf-8')),
+        ('json ensure_ascii=False', lambda: json.dumps(page, ensure_ascii=False, separators=(',', ':')).encode('utf-8')),
+    ]
+    if orjson is not None:
+        encoders.append(('orjson', lambda: orjson.dumps(page)))
+
+    results = []
+    for name, encode in encoders:
+        body = encode()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            encode()
+        elapsed_us = (time.perf_counter() - start) / rounds * 1e6
+        result = {
+            'encoder': name,
+            'encode_us': round(elapsed_us, 1),
+            'raw_bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body, app.config['COMPRESS_GZIP_LEVEL'])),
+        }
+        if brotli is not None:
+            result['br_bytes'] = len(brotli.compress(body, quality=app.config['COMPRESS_BROTLI_QUALITY']))
+        results.append(result)
+    return {'items': len(page['history']), 'results': results}
+
+@app.before_request
+def start_request_metrics():
+    """अनुरोध शुरू होने का समय और इन-फ्लाइट gauge"""
+    request.environ['aipin.start'] = time.perf_counter()
+    request.environ['aipin.request_id'] = (request.headers.get('X-Request-Id') or uuid.uuid4().hex)[:64]
+    metrics.gauge_add('aipin_inflight_requests', 1)
+    metrics.begin_trace()
+    profiler.maybe_start()
+
+@app.after_request
+def record_request_metrics(response):
+    """प्रति रूट काउंटर और लेटेंसी हिस्टोग्राम"""
+    start = request.environ.get('aipin.start')
+    if start is not None:
+        response.headers['X-Request-Id'] = request.environ['aipin.request_id']
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.inc('aipin_requests_total', (
+            ('method', request.method), ('route', route), ('status', str(response.status_code))
+        ))
+        elapsed = time.perf_counter() - start
+        metrics.observe('aipin_request_duration_seconds', elapsed, (('route', route),))
+        stats_store.record_request(elapsed, response.status_code)
+        stages = metrics.end_trace()
+        if elapsed * 1000 >= app.config['SLOW_REQUEST_MS'] and not request.environ.get('aipin.long_lived'):
+            log_slow_request(response, elapsed, stages)
+    traffic_capture.record(response)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if request.environ.pop('aipin.start', None) is not None:
+        metrics.gauge_add('aipin_inflight_requests', -1)
+        metrics.end_trace()
+
+@app.context_processor
+def inject_asset_url():
+    """टेम्पलेट में asset_url('style.css') -> /static/style.<hash>.css"""
+    return {'asset_url': asset_manifest.url}
+
 # रूट्स
 @app.route('/')
 def home():
@@ -257,10 +3705,68 @@ def home():
 
 @app.route('/static/<path:filename>')
 def static_files(filename):
-    """स्टेटिक फाइल्स"""
-    return send_from_directory('static', filename)
+    """स्टेटिक फाइल्स (हैश वाले नामों के लिए .br/.gz और immutable कैशिंग)"""
+    static_folder = app.config['STATIC_FOLDER']
+    if not asset_manifest.is_fingerprinted(filename):
+        return send_from_directory(static_folder, filename)
+
+    available = [
+        encoding for encoding, ext in (('br', '.br'), ('gzip', '.gz'))
+        if os.path.exists(os.path.join(static_folder, filename + ext))
+    ]
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), available)
+    mimetype = mimetypes.guess_type(filename)[0]
+
+    if encoding:
+        ext = '.br' if encoding == 'br' else '.gz'
+        response = send_from_directory(static_folder, filename + ext, mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+        # .gz/.br नाम ब्राउज़र को न दिखे
+        response.headers.pop('Content-Disposition', None)
+    else:
+        response = send_from_directory(static_folder, filename, mimetype=mimetype)
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f"public, max-age={app.config['ASSET_MAX_AGE']}, immutable"
+    return response
+
+def answer_chat(user_id, query, use_web_search=False, tenant=None, on_token=None):
+    """प्रश्न का उत्तर बनाएं और हिस्ट्री में सेव करें (HTTP और WebSocket दोनों के लिए)"""
+    stats_store.record_query(query)
+
+    # AI से उत्तर प्राप्त करें (पिछले टर्न संदर्भ के रूप में)
+    context = conversations.context(user_id)
+    response = ai_engine.generate_response(query, use_web_search, context=context, tenant=tenant, on_token=on_token)
+
+    # डेटाबेस में सेव करें
+    chat_id = db.save_chat(user_id, query, response, use_web_search)
+    conversations.append(user_id, query, response, chat_id)
+    return response, chat_id
+
+def stream_chunks(text, size):
+    """उत्तर को लगभग size अक्षरों के टुकड़ों में बांटें (शब्द के बीच से नहीं)"""
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            space = text.rfind(' ', start, end)
+            if space > start:
+                end = space + 1
+        yield text[start:end]
+        start = end
+
+def tenant_error(tenant):
+    """टेनेंट ठीक हो (या न दिया हो) तो None, वरना (error, status); नाम str और TENANT_NAME जैसा ही"""
+    if tenant is None or tenant == '':
+        return None
+    if not isinstance(tenant, str) or not AipinAI.TENANT_NAME.match(tenant):
+        return 'अमान्य टेनेंट', 400
+    if tenant not in ai_engine.tenants:
+        return 'अज्ञात टेनेंट', 404
+    return None
 
 @app.route('/api/chat', methods=['POST'])
+@rate_limited('chat')
 def chat():
     """AI चैट एंडपॉइंट"""
     try:
@@ -268,18 +3774,20 @@ def chat():
         query = data.get('query', '').strip()
         use_web_search = data.get('web_search', False)
         user_id = data.get('user_id', 1)  # डिफ़ॉल्ट user_id
+        tenant = request.headers.get('X-Tenant') or data.get('tenant')
         
         if not query:
             return jsonify({'error': 'क्वेरी आवश्यक है'}), 400
+        invalid = tenant_error(tenant)
+        if invalid:
+            error, status = invalid
+            return jsonify({'error': error}), status
         
-        # AI से उत्तर प्राप्त करें
-        response = ai_engine.generate_response(query, use_web_search)
-        
-        # डेटाबेस में सेव करें
-        db.save_chat(user_id, query, response)
+        response, chat_id = answer_chat(user_id, query, use_web_search, tenant)
         
         return jsonify({
             'success': True,
+            'id': chat_id,
             'response': response,
             'timestamp': datetime.now().isoformat()
         })
@@ -288,27 +3796,166 @@ def chat():
         logger.error(f"Chat error: {e}")
         return jsonify({'error': str(e)}), 500
 
+if Sock is not None:
+    sock = Sock(app)
+    ws_executor = ThreadPoolExecutor(max_workers=app.config['WS_THREADS'], thread_name_prefix='aipin-ws')
+    _ws_lock = threading.Lock()
+    _ws_open = 0
+
+    @sock.route('/ws/chat')
+    def chat_socket(ws):
+        """प्रति टैब एक कनेक्शन: id वाले JSON फ्रेम, उत्तर टुकड़ों में push, सीमित in-flight"""
+        global _ws_open
+        # यह कनेक्शन पूरे समय एक सर्वर थ्रेड रखता है; इसे धीमे अनुरोध के रूप में न गिनें
+        request.environ['aipin.long_lived'] = True
+        max_connections = app.config['WS_MAX_CONNECTIONS'] or max(1, app.config['SERVER_THREADS'] // 2)
+        with _ws_lock:
+            if _ws_open >= max_connections:
+                # सभी सर्वर थ्रेड WebSocket में न फंसें; क्लाइंट fetch पर लौट आता है
+                ws.send(json.dumps({'type': 'error', 'status': 503, 'error': 'सर्वर व्यस्त है'}, ensure_ascii=False))
+                return
+            _ws_open += 1
+
+        user_id = request.args.get('user_id', 1, type=int)
+        # ब्राउज़र WebSocket पर हेडर नहीं भेज सकता, इसलिए ?tenant= भी
+        tenant = request.headers.get('X-Tenant') or request.args.get('tenant')
+        send_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(app.config['WS_MAX_INFLIGHT'])
+        closed = threading.Event()
+
+        def send(frame):
+            if closed.is_set():
+                return False
+            try:
+                with send_lock:
+                    ws.send(json.dumps(frame, ensure_ascii=False))
+                return True
+            except ConnectionClosed:
+                closed.set()
+                return False
+
+        def handle(frame_id, query, use_web_search, frame_user_id, frame_tenant):
+            streamed = []
+
+            def on_token(token):
+                # मॉडल टोकन सीधे क्लाइंट को; कनेक्शन बंद हो तो False, अनुरोध रद्द
+                streamed.append(token)
+                return send({'id': frame_id, 'type': 'chunk', 'data': token})
+
+            try:
+                response, chat_id = answer_chat(frame_user_id, query, use_web_search, frame_tenant, on_token)
+                if not streamed:
+                    for chunk in stream_chunks(response, app.config['WS_CHUNK_CHARS']):
+                        if not send({'id': frame_id, 'type': 'chunk', 'data': chunk}):
+                            return
+                elif closed.is_set():
+                    return
+                send({'id': frame_id, 'type': 'done', 'chat_id': chat_id, 'timestamp': datetime.now().isoformat()})
+            except Exception as e:
+                logger.error(f"WebSocket chat error: {e}")
+                send({'id': frame_id, 'type': 'error', 'status': 500, 'error': str(e)})
+            finally:
+                rate_limiter.leave()
+                slots.release()
+
+        metrics.gauge_add('aipin_ws_connections', 1)
+        try:
+            send({'type': 'ready', 'max_inflight': app.config['WS_MAX_INFLIGHT']})
+            while not closed.is_set():
+                message = ws.receive()
+                try:
+                    frame = json.loads(message)
+                    frame_id = frame.get('id')
+                except (TypeError, ValueError, AttributeError):
+                    send({'type': 'error', 'status': 400, 'error': 'अमान्य फ्रेम'})
+                    continue
+
+                if frame.get('type') == 'ping':
+                    send({'id': frame_id, 'type': 'pong'})
+                    continue
+
+                query = str(frame.get('query', '')).strip()
+                if frame.get('type') != 'chat' or not query:
+                    send({'id': frame_id, 'type': 'error', 'status': 400, 'error': 'क्वेरी आवश्यक है'})
+                    continue
+                frame_tenant = frame.get('tenant') or tenant or ''
+                invalid = tenant_error(frame_tenant)
+                if invalid:
+                    error, status = invalid
+                    send({'id': frame_id, 'type': 'error', 'status': status, 'error': error})
+                    continue
+
+                rejected = rate_limiter.check('chat', frame.get('user_id', user_id))
+                if rejected:
+                    error, status, retry_after = rejected
+                    send({'id': frame_id, 'type': 'error', 'status': status, 'error': error,
+                          'retry_after': max(1, math.ceil(retry_after))})
+                    continue
+
+                # बैकप्रेशर: in-flight पूरे हों तो आगे के फ्रेम पढ़ना बंद, क्लाइंट का TCP बफर भरता है
+                slots.acquire()
+                rate_limiter.enter()
+                metrics.inc('aipin_ws_messages_total')
+                ws_executor.submit(handle, frame_id, query, bool(frame.get('web_search')),
+                                   frame.get('user_id', user_id), frame_tenant)
+        except ConnectionClosed:
+            pass
+        finally:
+            closed.set()
+            metrics.gauge_add('aipin_ws_connections', -1)
+            with _ws_lock:
+                _ws_open -= 1
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """फाइल अपलोड"""
     try:
+        # user_id query string से, ताकि बॉडी पढ़ने से पहले कोटा जांचा जा सके
+        user_id = request.args.get('user_id', 1, type=int)
+        quota = app.config['USER_QUOTA_BYTES']
+
+        content_length = request.content_length
+        if content_length is None:
+            return jsonify({'error': 'Content-Length आवश्यक है'}), 411
+
+        bytes_used, file_count = db.get_usage(user_id)
+        if bytes_used + content_length > quota:
+            return jsonify({
+                'error': 'स्टोरेज कोटा पार हो जाएगा',
+                'usage': {'bytes_used': bytes_used, 'quota': quota}
+            }), 413
+
         if 'file' not in request.files:
             return jsonify({'error': 'कोई फाइल नहीं'}), 400
-        
+
         file = request.files['file']
         if file.filename == '':
             return jsonify({'error': 'फाइल का नाम नहीं'}), 400
-        
+
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
+            # एक ही नाम की फाइलें एक-दूसरे को ओवरराइट न करें, वरना काउंटर गलत होंगे
+            stored_name = f"{uuid.uuid4().hex[:8]}_{filename}"
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], stored_name)
+            with metrics.stage('save_upload'):
+                file.save(filepath)
+
+            size = os.path.getsize(filepath)
+            filetype = filename.rsplit('.', 1)[1].lower()
+            file_id = db.add_file(user_id, filename, filepath, filetype, size, quota)
+            if file_id is None:
+                os.remove(filepath)
+                return jsonify({
+                    'error': 'स्टोरेज कोटा पार हो जाएगा',
+                    'usage': {'bytes_used': db.get_usage(user_id)[0], 'quota': quota}
+                }), 413
+
             # फाइल विश्लेषण
             analysis = analyze_file(filepath)
-            
+
             return jsonify({
                 'success': True,
+                'file_id': file_id,
                 'filename': filename,
                 'analysis': analysis,
                 'message': f'फाइल {filename} अपलोड हो गई'
@@ -320,7 +3967,53 @@ def upload_file():
         logger.error(f"Upload error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/files/<int:file_id>', methods=['DELETE'])
+def delete_file(file_id):
+    """अपलोड की गई फाइल हटाएं"""
+    try:
+        user_id = request.args.get('user_id', 1, type=int)
+
+        filepath = db.delete_file(user_id, file_id)
+        if filepath is None:
+            return jsonify({'error': 'फाइल नहीं मिली'}), 404
+
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+        bytes_used, file_count = db.get_usage(user_id)
+        return jsonify({
+            'success': True,
+            'usage': {'bytes_used': bytes_used, 'file_count': file_count}
+        })
+
+    except Exception as e:
+        logger.error(f"Delete error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/usage', methods=['GET'])
+def get_usage():
+    """यूजर का स्टोरेज उपयोग"""
+    try:
+        user_id = request.args.get('user_id', 1, type=int)
+        bytes_used, file_count = db.get_usage(user_id)
+        quota = app.config['USER_QUOTA_BYTES']
+
+        return jsonify({
+            'success': True,
+            'usage': {
+                'bytes_used': bytes_used,
+                'file_count': file_count,
+                'quota': quota,
+                'remaining': max(quota - bytes_used, 0)
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"Usage error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/search', methods=['POST'])
+@rate_limited('search')
 def search():
     """वेब सर्च"""
     try:
@@ -330,8 +4023,13 @@ def search():
         if not query:
             return jsonify({'error': 'खोज क्वेरी आवश्यक है'}), 400
         
-        # वेब खोज करें
-        result = ai_engine.web_search(query)
+        # वेब खोज करें (पूल भरा हो तो तुरंत 503, अनुरोध थ्रेड इंतज़ार में नहीं फंसता)
+        try:
+            result = ai_engine.web_search(query)
+        except BulkheadFull:
+            response = jsonify({'error': 'वेब खोज अभी व्यस्त है'})
+            response.headers['Retry-After'] = '2'
+            return response, 503
         
         return jsonify({
             'success': True,
@@ -349,22 +4047,41 @@ def get_history():
     """चैट हिस्ट्री प्राप्त करें"""
     try:
         user_id = request.args.get('user_id', 1, type=int)
-        limit = request.args.get('limit', 50, type=int)
-        
-        history = db.get_chat_history(user_id, limit)
-        
-        formatted_history = []
-        for query, response, timestamp in history:
-            formatted_history.append({
-                'query': query,
-                'response': response,
-                'timestamp': timestamp
-            })
+        limit = min(max(request.args.get('limit', 50, type=int), 1), app.config['HISTORY_MAX_LIMIT'])
+        before = request.args.get('before', type=int)
+        after = request.args.get('after', type=int)
+        if before is not None and after is not None:
+            return jsonify({'error': 'before और after में से एक ही दें'}), 400
         
-        return jsonify({
-            'success': True,
-            'history': formatted_history
-        })
+        def build():
+            history = db.get_chat_history(user_id, limit, before=before, after=after)
+
+            formatted_history = []
+            for chat_id, query, response, timestamp in history:
+                formatted_history.append({
+                    'id': chat_id,
+                    'query': query,
+                    'response': response,
+                    'timestamp': timestamp
+                })
+
+            # पूरा पेज आया तो उसी दिशा में अगला cursor (after के लिए सबसे नया, वरना सबसे पुराना id)
+            next_cursor = None
+            if len(history) == limit:
+                next_cursor = history[0][0] if after is not None else history[-1][0]
+
+            return {
+                'success': True,
+                'history': formatted_history,
+                'next_cursor': next_cursor
+            }
+
+        if before is not None:
+            # before से पुरानी चैट नहीं बदलतीं, पेज ब्राउज़र कैश में रह सकता है
+            return conditional_json(f"history-{user_id}-{limit}-b{before}", 'private, max-age=3600', build)
+        # नई चैट आने पर ही MAX(id) बदलता है
+        etag = f"history-{user_id}-{limit}-a{after}-{db.get_latest_chat_id(user_id)}"
+        return conditional_json(etag, 'private, no-cache', build)
     
     except Exception as e:
         logger.error(f"History error: {e}")
@@ -373,9 +4090,10 @@ def get_history():
 @app.route('/api/info', methods=['GET'])
 def get_info():
     """सिस्टम जानकारी"""
-    return jsonify({
+    etag = f"info-{app.config['APP_VERSION']}-{ai_engine.kb_version}"
+    return conditional_json(etag, 'public, max-age=60', lambda: {
         'name': 'Aipin AI',
-        'version': '1.0.0',
+        'version': app.config['APP_VERSION'],
         'description': 'DeepSeek जैसा AI असिस्टेंट',
         'features': [
             'AI चैट',
@@ -388,6 +4106,13 @@ def get_info():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus मेट्रिक्स (सभी वर्कर्स का जोड़)"""
+    return app.response_class(metrics.render(), mimetype='text/plain', headers={
+        'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'
+    })
+
 # HTML टेम्पलेट्स
 @app.route('/templates/<template_name>')
 def serve_template(template_name):
@@ -396,16 +4121,23 @@ def serve_template(template_name):
 
 # एडमिन रूट्स
 @app.route('/admin')
+@admin_required
 def admin_panel():
-    """एडमिन पैनल"""
+    """एडमिन पैनल (लाइव आंकड़े SSE से, न मिले तो polling)"""
     return """
     <!DOCTYPE html>
     <html>
     <head>
         <title>Aipin Admin</title>
+        <meta charset="UTF-8">
         <style>
             body { font-family: Arial; padding: 20px; }
-            .stats { background: #f0f0f0; padding: 20px; border-radius: 10px; }
+            .stats { background: #f0f0f0; padding: 20px; border-radius: 10px; margin-bottom: 15px; }
+            .grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(180px, 1fr)); gap: 10px; }
+            .value { font-size: 22px; font-weight: bold; color: #4a90e2; }
+            .ok { color: green; } .bad { color: #d33; } .muted { color: #888; }
+            table { border-collapse: collapse; width: 100%; }
+            td { padding: 4px 8px; border-bottom: 1px solid #ddd; }
             .btn { background: #4a90e2; color: white; padding: 10px 20px; border: none; border-radius: 5px; cursor: pointer; }
         </style>
     </head>
@@ -413,15 +4145,158 @@ def admin_panel():
         <h1>Aipin Admin Panel</h1>
         <div class="stats">
             <h3>सिस्टम स्टेटस</h3>
-            <p>AI Status: <span style="color: green;">✅ Active</span></p>
-            <p>Database: <span style="color: green;">✅ Connected</span></p>
-            <p>Search Engine: <span style="color: green;">✅ Enabled</span></p>
+            <p>AI Status: <span id="ai_status" class="muted">…</span></p>
+            <p>Database: <span id="db_status" class="muted">…</span> (<span id="db_size">…</span>)</p>
+            <p>Search Engine: <span id="web_status" class="muted">…</span></p>
+        </div>
+        <div class="stats grid">
+            <div><div class="value" id="rps">–</div>RPS (10s)</div>
+            <div><div class="value" id="p50">–</div>p50 ms</div>
+            <div><div class="value" id="p95">–</div>p95 ms</div>
+            <div><div class="value" id="p99">–</div>p99 ms</div>
+            <div><div class="value" id="errors">–</div>5xx (60s)</div>
+            <div><div class="value" id="inflight">–</div>इन-फ्लाइट</div>
+            <div><div class="value" id="db_write_queue">–</div>DB write queue</div>
+        </div>
+        <div class="stats">
+            <h3>पूल (bulkhead)</h3>
+            <table id="pools"><tr><td class="muted">कोई डेटा नहीं</td></tr></table>
+        </div>
+        <div class="stats">
+            <h3>कैश हिट रेट</h3>
+            <p id="cache_info" class="muted"></p>
+            <table id="caches"><tr><td class="muted">कोई कैश डेटा नहीं</td></tr></table>
+        </div>
+        <div class="stats">
+            <h3>टॉप प्रश्न</h3>
+            <table id="top_queries"></table>
         </div>
         <button class="btn" onclick="location.href='/'">वेबसाइट पर जाएं</button>
+        <script>
+            const token = new URLSearchParams(location.search).get('token') || '';
+            const state = {};
+            const setText = (id, text, cls) => {
+                const el = document.getElementById(id);
+                el.textContent = text;
+                if (cls !== undefined) el.className = cls;
+            };
+            const escape = (s) => String(s).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+
+            function render() {
+                const ok = (cond, yes, no) => cond ? ['✅ ' + yes, 'ok'] : ['❌ ' + no, 'bad'];
+                if ('ai_status' in state) setText('ai_status', ...ok(state.ai_status === 'active', 'Active', state.ai_status));
+                if ('db_status' in state) setText('db_status', ...ok(state.db_status === 'connected', 'Connected', state.db_status));
+                if ('db_size_bytes' in state) setText('db_size', (state.db_size_bytes / 1024).toFixed(1) + ' KB');
+                if (state.web_search) {
+                    const web = state.web_search;
+                    const label = state.search_enabled === false ? 'Disabled' : web.status;
+                    setText('web_status', label + ` (ok ${web.ok}, failed ${web.failed}, ~${web.latency_ewma_ms.toFixed(0)} ms)`,
+                            web.status === 'degraded' ? 'bad' : 'ok');
+                }
+                if ('rps' in state) setText('rps', state.rps);
+                if (state.latency_ms) ['p50', 'p95', 'p99'].forEach(p => setText(p, state.latency_ms[p] ?? '–'));
+                if ('errors_60s' in state) setText('errors', state.errors_60s);
+                if ('inflight_requests' in state) setText('inflight', state.inflight_requests);
+                if ('db_write_queue' in state) setText('db_write_queue', state.db_write_queue);
+                if (state.pools) {
+                    document.getElementById('pools').innerHTML =
+                        '<tr><td></td><td>active</td><td>queued</td><td>capacity</td><td>भराई</td><td>rejected</td><td>timeouts</td></tr>' +
+                        Object.entries(state.pools).map(([name, p]) => `<tr class="${p.saturation >= 0.9 ? 'bad' : ''}"><td>${escape(name)}</td>` +
+                            `<td>${p.active}</td><td>${p.queued}</td><td>${p.capacity}</td>` +
+                            `<td>${p.saturation === null ? '–' : (p.saturation * 100).toFixed(0) + '%'}</td>` +
+                            `<td>${p.rejected}</td><td>${p.timeouts}</td></tr>`).join('');
+                }
+                if (state.cache) {
+                    setText('cache_info', `${state.cache.backend}: ${state.cache.entries} entries, ` +
+                            `${(state.cache.bytes / 1024).toFixed(1)} / ${(state.cache.max_bytes / 1048576).toFixed(0)} MB`);
+                }
+                if (state.cache_hit_rate && Object.keys(state.cache_hit_rate).length) {
+                    document.getElementById('caches').innerHTML = Object.entries(state.cache_hit_rate)
+                        .map(([name, rate]) => `<tr><td>${escape(name)}</td><td>${rate === null ? '–' : (rate * 100).toFixed(1) + '%'}</td></tr>`).join('');
+                }
+                if (state.top_queries) {
+                    document.getElementById('top_queries').innerHTML = state.top_queries
+                        .map(([query, count]) => `<tr><td>${escape(query)}</td><td>${count}</td></tr>`).join('');
+                }
+            }
+
+            function apply(delta) {
+                Object.assign(state, delta);
+                render();
+            }
+
+            function poll() {
+                fetch('/admin/api/stats?token=' + encodeURIComponent(token))
+                    .then(r => r.json()).then(apply).catch(() => {})
+                    .finally(() => setTimeout(poll, 2000));
+            }
+
+            if (window.EventSource) {
+                const source = new EventSource('/admin/stream?token=' + encodeURIComponent(token));
+                source.onmessage = (e) => apply(JSON.parse(e.data));
+            } else {
+                poll();
+            }
+        </script>
     </body>
     </html>
     """
 
+@app.route('/admin/api/stats', methods=['GET'])
+@admin_required
+def admin_stats():
+    """डैशबोर्ड के सभी आंकड़े (polling के लिए)"""
+    return jsonify(collect_dashboard_stats())
+
+@app.route('/admin/stream', methods=['GET'])
+@admin_required
+def admin_stream():
+    """SSE: हर सेकंड केवल बदले हुए आंकड़े भेजें"""
+    def events():
+        last = {}
+        deadline = time.time() + app.config['ADMIN_STREAM_SECONDS']
+        # EventSource कनेक्शन टूटने पर अपने-आप दोबारा जुड़ता है
+        yield 'retry: 2000\n\n'
+        while time.time() < deadline:
+            current = collect_dashboard_stats()
+            delta = {key: value for key, value in current.items() if last.get(key) != value}
+            last = current
+            yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n"
+            time.sleep(1)
+
+    return app.response_class(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/admin/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    """N सेकंड के लिए सैंपलिंग प्रोफाइलर चालू करें (सभी वर्कर्स में)"""
+    seconds = min(request.args.get('seconds', 10, type=float), app.config['PROFILE_MAX_SECONDS'])
+    interval_ms = max(request.args.get('interval_ms', app.config['PROFILE_INTERVAL_MS'], type=float), 1)
+    # NaN भी यहीं रुकता है (हर तुलना False)
+    if not seconds > 0 or not interval_ms >= 1:
+        return jsonify({'error': 'seconds और interval_ms धनात्मक होने चाहिए'}), 400
+    filename = profiler.request(seconds, interval_ms)
+    if filename is None:
+        return jsonify({'error': 'प्रोफाइलर पहले से चल रहा है'}), 409
+    return jsonify({'success': True, 'profile': filename, 'seconds': seconds})
+
+@app.route('/admin/profile', methods=['GET'])
+@admin_required
+def list_profiles():
+    """बने हुए प्रोफाइल (collapsed stacks, flamegraph.pl/speedscope के लिए)"""
+    directory = app.config['PROFILE_DIR']
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.collapsed')) if os.path.isdir(directory) else []
+    return jsonify({'success': True, 'running': profiler.running, 'profiles': names})
+
+@app.route('/admin/profile/<name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """एक प्रोफाइल फाइल डाउनलोड करें"""
+    return send_from_directory(app.config['PROFILE_DIR'], secure_filename(name), mimetype='text/plain')
+
 # 404 हैण्डलर
 @app.errorhandler(404)
 def not_found(e):
@@ -449,41 +4324,13 @@ def create_sample_data():
         }
     }
     
-    # ज्ञान आधार फाइल में सेव करें
-    knowledge_file = 'data/knowledge_base.json'
+    # ज्ञान आधार फाइल में सेव करें (केवल बदलाव होने पर)
+    knowledge_file = app.config['KNOWLEDGE_FILE']
+    ai_engine.update_knowledge(sample_data)
     existing_data = ai_engine.knowledge_base
-    existing_data.update(sample_data)
-    
-    with open(knowledge_file, 'w', encoding='utf-8') as f:
-        json.dump(existing_data, f, ensure_ascii=False, indent=2)
-    
-    print("✅ सैंपल डेटा बनाया गया")
 
-if __name__ == '__main__':
-    print("🚀 Aipin AI सर्वर शुरू हो रहा है...")
-    print(f"📁 Static folder: {app.static_folder}")
-    print(f"📁 Templates folder: {app.template_folder}")
-    print(f"💾 Database: {app.config['DATABASE']}")
-    
-    # सैंपल डेटा बनाएं
-    create_sample_data()
-    
-    # स्टेटिक और टेम्पलेट फाइल्स बनाएं
-    create_static_files()
-    create_template_files()
-    
-    print("\n🌐 सर्वर चल रहा है: http://localhost:5000")
-    print("⚡ एडमिन पैनल: http://localhost:5000/admin")
-    print("\n📞 एंडपॉइंट्स:")
-    print("  - GET  /              → होमपेज")
-    print("  - POST /api/chat      → AI चैट")
-    print("  - POST /api/upload    → फाइल अपलोड")
-    print("  - POST /api/search    → वेब खोज")
-    print("  - GET  /api/history   → चैट हिस्ट्री")
-    print("  - GET  /api/info      → सिस्टम जानकारी")
-    print("\n🛑 सर्वर बंद करने के लिए Ctrl+C दबाएं")
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    if write_if_changed(knowledge_file, json.dumps(existing_data, ensure_ascii=False, indent=2)):
+        print("✅ सैंपल डेटा बनाया गया")
 
 def create_static_files():
     """स्टेटिक फाइल्स बनाएं"""
@@ -561,6 +4408,7 @@ def create_static_files():
     .chat-messages {
         height: 500px;
         overflow-y: auto;
+        overflow-anchor: none;
         padding: 20px;
         background: rgba(15, 23, 42, 0.6);
         border-radius: 15px;
@@ -575,6 +4423,18 @@ def create_static_files():
         animation: fadeIn 0.3s ease;
     }
 
+    .message-row {
+        padding-bottom: 15px;
+    }
+
+    .message-row .message {
+        margin-bottom: 0;
+    }
+
+    .message-row.seen .message {
+        animation: none;
+    }
+
     @keyframes fadeIn {
         from { opacity: 0; transform: translateY(10px); }
         to { opacity: 1; transform: translateY(0); }
@@ -866,7 +4726,32 @@ def create_static_files():
             this.loadHistoryBtn = document.getElementById('loadHistoryBtn');
             this.quickActions = document.querySelectorAll('.quick-btn');
             this.webSearchEnabled = false;
-            this.chatHistory = [];
+            
+            // वर्चुअल सूची: संदेश this.messages में (अधिकतम maxMessages), DOM में केवल दिखने वाले + overscan
+            this.messages = [];
+            this.nodes = new Map();
+            this.maxMessages = 300;
+            this.pageSize = 30;
+            this.overscan = 600;
+            this.estimatedHeight = 90;
+            this.frame = null;
+            this.stickToBottom = true;
+            this.anchor = null;
+            this.olderCursor = null;
+            this.newerCursor = null;
+            this.historyLoading = false;
+            this.topSpacer = document.createElement('div');
+            this.list = document.createElement('div');
+            this.bottomSpacer = document.createElement('div');
+            this.chatMessages.append(this.topSpacer, this.list, this.bottomSpacer);
+            
+            // WebSocket चैनल (न मिले तो /api/chat पर fetch)
+            this.socket = null;
+            this.socketReady = false;
+            this.socketFailures = 0;
+            this.maxInflight = 1;
+            this.pending = new Map();
+            this.nextId = 1;
             
             this.init();
         }
@@ -885,6 +4770,7 @@ def create_static_files():
             this.webSearchToggle.addEventListener('click', () => this.toggleWebSearch());
             this.clearChatBtn.addEventListener('click', () => this.clearChat());
             this.loadHistoryBtn.addEventListener('click', () => this.loadChatHistory());
+            this.chatMessages.addEventListener('scroll', () => this.onScroll(), { passive: true });
             
             // Quick Actions
             this.quickActions.forEach(btn => {
@@ -903,14 +4789,96 @@ def create_static_files():
             
             // Initial message
             this.addMessage('ai', 'नमस्ते! मैं Aipin AI हूं। आपकी कैसे मदद कर सकता हूं?');
+            
+            this.connectSocket();
+        }
+        
+        connectSocket() {
+            // ब्राउज़र या सर्वर WebSocket न दे तो कुछ प्रयासों के बाद केवल fetch
+            if (!window.WebSocket || this.socketFailures >= 3) return;
+            const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+            const socket = new WebSocket(`${protocol}://${window.location.host}/ws/chat?user_id=1`);
+            let ready = false;
+            
+            socket.onmessage = (event) => {
+                const frame = JSON.parse(event.data);
+                if (frame.type === 'ready') {
+                    ready = true;
+                    this.socketReady = true;
+                    this.socketFailures = 0;
+                    this.maxInflight = frame.max_inflight;
+                    return;
+                }
+                this.handleSocketFrame(frame);
+            };
+            
+            socket.onclose = () => {
+                this.socket = null;
+                this.socketReady = false;
+                this.pending.forEach(request => request.reject(new Error('कनेक्शन टूट गया')));
+                this.pending.clear();
+                if (!ready) this.socketFailures += 1;
+                setTimeout(() => this.connectSocket(), Math.min(30000, 1000 * 2 ** this.socketFailures));
+            };
+            
+            this.socket = socket;
+        }
+        
+        canUseSocket() {
+            return this.socketReady && this.socket && this.socket.readyState === WebSocket.OPEN
+                && this.pending.size < this.maxInflight;
+        }
+        
+        handleSocketFrame(frame) {
+            const request = this.pending.get(frame.id);
+            if (!request) return;
+            if (frame.type === 'chunk') {
+                request.onChunk(frame.data);
+            } else if (frame.type === 'done' || frame.type === 'error') {
+                this.pending.delete(frame.id);
+                request.resolve(frame);
+            }
+        }
+        
+        sendViaSocket(message, onChunk) {
+            return new Promise((resolve, reject) => {
+                const id = this.nextId++;
+                this.pending.set(id, { onChunk, resolve, reject });
+                this.socket.send(JSON.stringify({
+                    id,
+                    type: 'chat',
+                    query: message,
+                    web_search: this.webSearchEnabled,
+                    user_id: 1
+                }));
+            });
+        }
+        
+        async sendViaFetch(message) {
+            const response = await fetch(`${this.apiBase}/api/chat`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-User-Id': '1',
+                },
+                body: JSON.stringify({
+                    query: message,
+                    web_search: this.webSearchEnabled,
+                    user_id: 1
+                })
+            });
+            return response.json();
         }
         
         async sendMessage() {
             const message = this.messageInput.value.trim();
             if (!message) return;
             
+            // पुराना हिस्सा देखा जा रहा हो तो पहले सबसे नया पेज
+            if (this.newerCursor !== null) await this.showLatest().catch(() => this.resetMessages());
+            
             // Add user message
-            this.addMessage('user', message);
+            const userMessage = this.addMessage('user', message);
             this.messageInput.value = '';
             this.messageInput.style.height = 'auto';
             
@@ -918,32 +4886,34 @@ def create_static_files():
             this.showLoading();
             
             try {
-                // Send to API
-                const response = await fetch(`${this.apiBase}/api/chat`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        query: message,
-                        web_search: this.webSearchEnabled,
-                        user_id: 1
-                    })
-                });
-                
-                const data = await response.json();
+                let data;
+                if (this.canUseSocket()) {
+                    // उत्तर टुकड़ों में आता है, पहला टुकड़ा आते ही दिखाएं
+                    let text = '';
+                    let reply = null;
+                    const frame = await this.sendViaSocket(message, (chunk) => {
+                        if (!reply) {
+                            this.hideLoading();
+                            reply = this.addMessage('ai', '');
+                        }
+                        text += chunk;
+                        this.updateMessage(reply, text);
+                    });
+                    if (reply) reply.chatId = frame.chat_id ?? null;
+                    data = frame.type === 'done'
+                        ? { success: true, response: text, id: frame.chat_id, streamed: reply !== null }
+                        : { error: frame.error };
+                } else {
+                    data = await this.sendViaFetch(message);
+                }
                 
                 // Remove loading
                 this.hideLoading();
                 
                 if (data.success) {
-                    this.addMessage('ai', data.response);
-                    // Save to local history
-                    this.chatHistory.push({
-                        query: message,
-                        response: data.response,
-                        timestamp: new Date().toISOString()
-                    });
+                    // हिस्ट्री पेजिंग के लिए चैट id (प्रश्न और उत्तर दोनों पर)
+                    userMessage.chatId = data.id ?? null;
+                    if (!data.streamed) this.addMessage('ai', data.response, userMessage.chatId);
                 } else {
                     this.addMessage('ai', `त्रुटि: ${data.error}`);
                 }
@@ -957,36 +4927,201 @@ def create_static_files():
             this.scrollToBottom();
         }
         
-        addMessage(sender, content) {
-            const messageDiv = document.createElement('div');
-            messageDiv.className = `message ${sender}-message`;
-            
-            const header = document.createElement('div');
-            header.className = 'message-header';
+        addMessage(sender, content, chatId = null) {
+            // संदेश केवल मॉडल में; DOM अगले फ्रेम में render() बनाता है
+            const message = this.createMessage(sender, content, chatId);
+            this.messages.push(message);
+            this.trimOldest();
+            this.scrollToBottom();
+            return message;
+        }
+        
+        createMessage(sender, content, chatId = null) {
+            return { sender, content, chatId, html: null, height: 0, seen: false };
+        }
+        
+        updateMessage(message, content) {
+            message.content = content;
+            message.html = null;
+            this.scheduleRender();
+        }
+        
+        scheduleRender() {
+            // एक फ्रेम में कितने भी बदलाव हों, DOM एक ही बार छुआ जाता है
+            if (this.frame === null) this.frame = requestAnimationFrame(() => this.render());
+        }
+        
+        render() {
+            this.frame = null;
+            const box = this.chatMessages;
+            const messages = this.messages;
+            // पिछले फ्रेम के नोड्स की असली ऊंचाई (पहले सारी reads, फिर writes)
+            this.nodes.forEach((node, message) => { message.height = node.offsetHeight; });
             
-            if (sender === 'user') {
-                header.innerHTML = '<i class="fas fa-user"></i> आप';
-            } else {
-                header.innerHTML = '<i class="fas fa-robot"></i> Aipin AI';
+            const tops = [0];
+            for (const message of messages) tops.push(tops[tops.length - 1] + (message.height || this.estimatedHeight));
+            const total = tops[messages.length];
+            let scrollTop = box.scrollTop;
+            const anchorIndex = this.anchor ? messages.indexOf(this.anchor.message) : -1;
+            if (anchorIndex >= 0) {
+                scrollTop = tops[anchorIndex] - this.anchor.delta;
+            } else if (this.stickToBottom) {
+                scrollTop = Math.max(0, total - box.clientHeight);
             }
             
-            const contentDiv = document.createElement('div');
-            contentDiv.className = 'message-content';
+            // दिखने वाले संदेश + ऊपर/नीचे overscan; बाकी की जगह spacer
+            const low = scrollTop - this.overscan;
+            const high = scrollTop + box.clientHeight + this.overscan;
+            let start = 0;
+            while (start < messages.length && tops[start + 1] < low) start++;
+            let end = start;
+            while (end < messages.length && tops[end] < high) end++;
+            const visible = messages.slice(start, end);
+            const keep = new Set(visible);
+            this.nodes.forEach((node, message) => {
+                if (!keep.has(message)) this.dropNode(message);
+            });
+            this.list.replaceChildren(...visible.map(message => this.nodeFor(message)));
+            this.topSpacer.style.height = `${tops[start]}px`;
+            this.bottomSpacer.style.height = `${total - tops[end]}px`;
             
+            // नए नोड्स नापें; अनुमान से अलग हों तो अगले फ्रेम में सीमा दोबारा निकालें
+            let changed = false;
+            let anchorTop = tops[start];
+            for (const message of visible) {
+                const height = this.nodes.get(message).offsetHeight;
+                if (height !== message.height) {
+                    message.height = height;
+                    changed = true;
+                }
+                if (anchorIndex >= 0 && messages.indexOf(message) < anchorIndex) anchorTop += height;
+            }
+            if (anchorIndex >= 0) {
+                box.scrollTop = (anchorIndex >= start ? anchorTop : tops[anchorIndex]) - this.anchor.delta;
+            } else if (this.stickToBottom) {
+                box.scrollTop = box.scrollHeight;
+            }
+            this.anchor = null;
+            if (changed) this.scheduleRender();
+        }
+        
+        nodeFor(message) {
+            let node = this.nodes.get(message);
+            if (!node) {
+                node = document.createElement('div');
+                // एक बार दिख चुके संदेश दोबारा बनें तो animation नहीं
+                node.className = message.seen ? 'message-row seen' : 'message-row';
+                message.seen = true;
+                
+                const messageDiv = document.createElement('div');
+                messageDiv.className = `message ${message.sender}-message`;
+                
+                const header = document.createElement('div');
+                header.className = 'message-header';
+                
+                if (message.sender === 'user') {
+                    header.innerHTML = '<i class="fas fa-user"></i> आप';
+                } else {
+                    header.innerHTML = '<i class="fas fa-robot"></i> Aipin AI';
+                }
+                
+                const contentDiv = document.createElement('div');
+                contentDiv.className = 'message-content';
+                
+                messageDiv.appendChild(header);
+                messageDiv.appendChild(contentDiv);
+                node.appendChild(messageDiv);
+                this.nodes.set(message, node);
+            }
+            if (node.dataset.html !== 'ok' || message.html === null) {
+                // formatContent संदेश बदलने पर ही, नतीजा संदेश में रखा रहता है
+                if (message.html === null) message.html = this.formatContent(message.content);
+                node.querySelector('.message-content').innerHTML = message.html;
+                node.dataset.html = 'ok';
+            }
+            return node;
+        }
+        
+        dropNode(message) {
+            const node = this.nodes.get(message);
+            if (node) {
+                node.remove();
+                this.nodes.delete(message);
+            }
+        }
+        
+        resetMessages() {
+            this.nodes.forEach(node => node.remove());
+            this.nodes.clear();
+            this.messages = [];
+            this.olderCursor = null;
+            this.newerCursor = null;
+            this.anchor = null;
+            this.stickToBottom = true;
+            this.scheduleRender();
+        }
+        
+        captureAnchor() {
+            // ऊपर संदेश जुड़ें/हटें तब भी जो संदेश दिख रहा है वह अपनी जगह रहे
+            const scrollTop = this.chatMessages.scrollTop;
+            let top = 0;
+            for (const message of this.messages) {
+                const height = message.height || this.estimatedHeight;
+                if (top + height > scrollTop) {
+                    this.anchor = { message, delta: top - scrollTop };
+                    return;
+                }
+                top += height;
+            }
+        }
+        
+        trimOldest() {
+            // सीमा से ऊपर सबसे पुराने हटाएं; सर्वर वाले ऊपर स्क्रॉल करने पर दोबारा आ जाते हैं
+            let count = this.messages.length - this.maxMessages;
+            if (count <= 0) return;
+            // एक ही चैट (प्रश्न + उत्तर) आधी न कटे
+            while (count < this.messages.length && this.messages[count].chatId !== null
+                   && this.messages[count].chatId === this.messages[count - 1].chatId) count++;
+            if (!this.stickToBottom && !this.anchor) this.captureAnchor();
+            const removed = this.messages.splice(0, count);
+            removed.forEach(message => this.dropNode(message));
+            const ids = removed.filter(message => message.chatId !== null).map(message => message.chatId);
+            if (ids.length) {
+                const oldest = this.messages.find(message => message.chatId !== null);
+                this.olderCursor = oldest ? oldest.chatId : Math.max(...ids) + 1;
+            }
+        }
+        
+        trimNewest() {
+            // पुराने पेज जोड़ने पर सीमा से ऊपर सबसे नए हटाएं; नीचे स्क्रॉल करने पर दोबारा आते हैं
+            let keep = this.maxMessages;
+            if (this.messages.length <= keep) return;
+            while (keep > 0 && this.messages[keep].chatId !== null
+                   && this.messages[keep].chatId === this.messages[keep - 1].chatId) keep--;
+            const removed = this.messages.splice(keep);
+            removed.forEach(message => this.dropNode(message));
+            const ids = removed.filter(message => message.chatId !== null).map(message => message.chatId);
+            if (ids.length) {
+                const newest = this.messages.filter(message => message.chatId !== null).pop();
+                this.newerCursor = newest ? newest.chatId : Math.min(...ids) - 1;
+            }
+        }
+        
+        onScroll() {
+            const box = this.chatMessages;
+            this.stickToBottom = this.newerCursor === null
+                && box.scrollTop + box.clientHeight >= box.scrollHeight - 40;
+            if (box.scrollTop < this.overscan) this.loadOlder();
+            if (box.scrollTop + box.clientHeight >= box.scrollHeight - this.overscan) this.loadNewer();
+            this.scheduleRender();
+        }
+        
+        formatContent(content) {
             // Format code blocks
-            let formattedContent = content;
-            const codeBlockRegex = /```(\w+)?\n([\s\S]*?)```/g;
-            formattedContent = formattedContent.replace(codeBlockRegex, (match, lang, code) => {
+            const codeBlockRegex = /```(\w+)?\\n([\s\S]*?)```/g;
+            return content.replace(codeBlockRegex, (match, lang, code) => {
                 return `<div class="code-block"><pre><code>${code.trim()}</code></pre></div>`;
             });
-            
-            contentDiv.innerHTML = formattedContent;
-            
-            messageDiv.appendChild(header);
-            messageDiv.appendChild(contentDiv);
-            
-            this.chatMessages.appendChild(messageDiv);
-            this.scrollToBottom();
         }
         
         async handleFileUpload(event) {
@@ -1017,7 +5152,7 @@ def create_static_files():
             formData.append('file', file);
             
             try {
-                const response = await fetch(`${this.apiBase}/api/upload`, {
+                const response = await fetch(`${this.apiBase}/api/upload?user_id=1`, {
                     method: 'POST',
                     body: formData
                 });
@@ -1051,26 +5186,77 @@ def create_static_files():
         
         clearChat() {
             if (confirm('क्या आप चैट हिस्ट्री साफ करना चाहते हैं?')) {
-                this.chatMessages.innerHTML = '';
+                this.resetMessages();
                 this.addMessage('ai', 'चैट हिस्ट्री साफ की गई है। नमस्ते! मैं Aipin AI हूं।');
             }
         }
         
+        async fetchHistory(params) {
+            const query = new URLSearchParams({ user_id: 1, limit: this.pageSize, ...params });
+            const response = await fetch(`${this.apiBase}/api/history?${query}`);
+            return response.json();
+        }
+        
+        historyMessages(history) {
+            // सर्वर पेज सबसे नए पहले; सूची में पुराने ऊपर
+            const messages = [];
+            for (const chat of history.slice().reverse()) {
+                messages.push(this.createMessage('user', chat.query, chat.id), this.createMessage('ai', chat.response, chat.id));
+            }
+            return messages;
+        }
+        
+        async showLatest() {
+            const data = await this.fetchHistory({});
+            this.resetMessages();
+            if (data.success) {
+                this.messages.push(...this.historyMessages(data.history));
+                this.olderCursor = data.next_cursor;
+            }
+            return data;
+        }
+        
+        async loadOlder() {
+            if (this.historyLoading || this.olderCursor === null) return;
+            this.historyLoading = true;
+            try {
+                const data = await this.fetchHistory({ before: this.olderCursor });
+                if (!data.success) return;
+                this.captureAnchor();
+                this.messages.unshift(...this.historyMessages(data.history));
+                this.olderCursor = data.next_cursor;
+                this.trimNewest();
+                this.scheduleRender();
+            } catch (error) {
+                console.warn('हिस्ट्री पेज लोड त्रुटि', error);
+            } finally {
+                this.historyLoading = false;
+            }
+        }
+        
+        async loadNewer() {
+            if (this.historyLoading || this.newerCursor === null) return;
+            this.historyLoading = true;
+            try {
+                const data = await this.fetchHistory({ after: this.newerCursor });
+                if (!data.success) return;
+                this.captureAnchor();
+                this.messages.push(...this.historyMessages(data.history));
+                this.newerCursor = data.next_cursor;
+                this.trimOldest();
+                this.scheduleRender();
+            } catch (error) {
+                console.warn('हिस्ट्री पेज लोड त्रुटि', error);
+            } finally {
+                this.historyLoading = false;
+            }
+        }
+        
         async loadChatHistory() {
             try {
-                const response = await fetch(`${this.apiBase}/api/history?user_id=1&limit=10`);
-                const data = await response.json();
+                const data = await this.showLatest();
                 
                 if (data.success && data.history.length > 0) {
-                    // Clear current chat
-                    this.chatMessages.innerHTML = '';
-                    
-                    // Add history messages
-                    for (let chat of data.history.reverse()) {
-                        this.addMessage('user', chat.query);
-                        this.addMessage('ai', chat.response);
-                    }
-                    
                     this.addMessage('ai', 'चैट हिस्ट्री लोड की गई है। मैं Aipin AI हूं, आपकी कैसे मदद करूं?');
                 } else {
                     this.addMessage('ai', 'कोई चैट हिस्ट्री नहीं मिली।');
@@ -1098,7 +5284,9 @@ def create_static_files():
         }
         
         scrollToBottom() {
-            this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+            // layout पढ़ना/लिखना अगले फ्रेम में, एक बार
+            this.stickToBottom = this.newerCursor === null;
+            this.scheduleRender();
         }
         
         async searchWeb(query) {
@@ -1146,14 +5334,13 @@ def create_static_files():
     });
     """
     
-    # फाइल्स सेव करें
-    with open('static/style.css', 'w', encoding='utf-8') as f:
-        f.write(css_content)
-    
-    with open('static/script.js', 'w', encoding='utf-8') as f:
-        f.write(js_content)
-    
-    print("✅ स्टेटिक फाइल्स बनाई गईं")
+    # फाइल्स सेव करें (कंटेंट हैश बदला हो तभी)
+    static_folder = app.config['STATIC_FOLDER']
+    written = write_if_changed(os.path.join(static_folder, 'style.css'), css_content)
+    written = write_if_changed(os.path.join(static_folder, 'script.js'), js_content) or written
+
+    if written:
+        print("✅ स्टेटिक फाइल्स बनाई गईं")
 
 def create_template_files():
     """HTML टेम्पलेट फाइल्स बनाएं"""
@@ -1164,7 +5351,7 @@ def create_template_files():
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Aipin AI - DeepSeek जैसा AI असिस्टेंट</title>
-        <link rel="stylesheet" href="/static/style.css">
+        <link rel="stylesheet" href="{{ asset_url('style.css') }}">
         <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
         <link rel="icon" type="image/x-icon" href="https://img.icons8.com/color/96/000000/artificial-intelligence.png">
     </head>
@@ -1317,7 +5504,7 @@ def create_template_files():
             </div>
         </div>
 
-        <script src="/static/script.js"></script>
+        <script src="{{ asset_url('script.js') }}"></script>
         <script>
             // Chat counter
             let chatCount = 0;
@@ -1346,33 +5533,991 @@ def create_template_files():
     </html>
     """
     
-    # HTML फाइल सेव करें
-    with open('templates/index.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    
-    print("✅ HTML टेम्पलेट बनाई गई")
+    # HTML फाइल सेव करें (कंटेंट हैश बदला हो तभी)
+    if write_if_changed('templates/index.html', html_content):
+        print("✅ HTML टेम्पलेट बनाई गई")
+
+# प्रोडक्शन सर्वर
+def preload_app():
+    """फोर्क से पहले मास्टर में ज्ञान आधार और एसेट्स तैयार करें"""
+    startup_report.reset()
+    ensure_folders()
+    # पहले डिस्क से ताज़ा पढ़ें, ताकि रीलोड पर JSON में किए गए बदलाव ओवरराइट न हों
+    if ai_engine.initialized:
+        with startup_report.phase('knowledge_base'):
+            ai_engine.reload()
+    else:
+        ai_engine.get()
+    with startup_report.phase('sample_data'):
+        create_sample_data()
+    with startup_report.phase('static_files'):
+        create_static_files()
+    with startup_report.phase('asset_build'):
+        build_static_assets()
+    with startup_report.phase('templates'):
+        create_template_files()
+    db.get()
+    logger.info(startup_report.summary())
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """तय संख्या के थ्रेड पूल वाला WSGI सर्वर"""
+
+    SHED_RESPONSE = (
+        b'HTTP/1.1 503 Service Unavailable\r\n'
+        b'Content-Type: application/json\r\n'
+        b'Retry-After: 1\r\n'
+        b'Connection: close\r\n'
+        b'Content-Length: 24\r\n\r\n'
+        b'{"error":"server busy"}\n'
+    )
+
+    def __init__(self, *args, threads=8, max_queue=None, **kwargs):
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='aipin-http')
+        self.max_queue = max_queue
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        # कतार भरी हो तो अनुरोध पढ़े बिना ही 503 (कोई थ्रेड या पार्सिंग खर्च नहीं)
+        if self.max_queue and self._pool._work_queue.qsize() >= self.max_queue:
+            try:
+                request.sendall(self.SHED_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def close(self):
+        """चल रहे अनुरोध पूरे होने दें, फिर सॉकेट बंद करें"""
+        self._pool.shutdown(wait=True)
+        self.server_close()
+
+
+class PreforkServer:
+    """प्रीफोर्क मल्टी-वर्कर सर्वर: मास्टर सॉकेट बाइंड करता है, वर्कर्स उसी पर accept करते हैं"""
+
+    def __init__(self, wsgi_app, host, port, workers, threads, max_requests):
+        self.wsgi_app = wsgi_app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.threads = max(1, threads)
+        self.max_requests = max_requests
+        self.sock = None
+        self.children = {}  # pid -> generation
+        self.retiring = {}  # पुरानी पीढ़ी के pid -> SIGKILL की समय सीमा
+        self.generation = 0
+        self.next_reconcile = 0
+        self._stopping = False
+        self._reload_requested = False
+
+    def run(self):
+        """मास्टर लूप चलाएं"""
+        # मास्टर में स्वचालित GC बंद: फोर्क से पहले freeze ही तय करता है कि कौन से ऑब्जेक्ट साझा रहेंगे
+        gc.disable()
+        preload_app()
+        app.config['METRICS_DIR'] = app.config['METRICS_DIR'] or os.path.join('data', 'metrics')
+        metrics.reset_directory()
+        self.sock = socket.create_server((self.host, self.port), backlog=2048, reuse_port=False)
+        self.sock.set_inheritable(True)
+
+        signal.signal(signal.SIGHUP, self._on_sighup)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        # प्रीलोड किए गए ऑब्जेक्ट्स को GC से बाहर रखें ताकि copy-on-write पेज साझा रहें
+        gc.collect()
+        gc.freeze()
+
+        logger.info(f"Master {os.getpid()}: {self.workers} workers x {self.threads} threads on {self.host}:{self.port}")
+        for _ in range(self.workers):
+            self._spawn_worker()
+        # फ्रीज़ के बाद मास्टर के नए ऑब्जेक्ट्स के लिए GC फिर चालू
+        gc.enable()
+
+        try:
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._reload()
+                self._reap_children()
+                self._kill_overdue()
+                self._reconcile_usage()
+                time.sleep(0.2)
+        finally:
+            self._shutdown()
+
+    def _reconcile_usage(self):
+        """मास्टर लूप में ही काउंटर मिलान; अलग थ्रेड नहीं, ताकि फोर्क के समय कोई लॉक या SQLite कनेक्शन बीच में न हो"""
+        now = time.time()
+        if now >= self.next_reconcile:
+            self.next_reconcile = now + app.config['USAGE_RECONCILE_INTERVAL']
+            reconcile_usage_once()
+
+    def _on_sighup(self, signum, frame):
+        self._reload_requested = True
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker()
+            except Exception as e:
+                logger.error(f"Worker {os.getpid()} crashed: {e}")
+                code = 1
+            finally:
+                # os._exit atexit नहीं चलाता, इसलिए कतार में बचे लॉग और कैप्चर यहीं लिखें
+                traffic_capture.stop()
+                log_handler.stop()
+                os._exit(code)
+        self.children[pid] = self.generation
+        return pid
+
+    def _run_worker(self):
+        """वर्कर प्रोसेस: साझा सॉकेट पर थ्रेड पूल के साथ सर्व करें"""
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # फ्रीज़ किए ऑब्जेक्ट permanent generation में ही रहें (उनके GC हेडर न लिखे जाएं, पेज साझा रहें),
+        # नए ऑब्जेक्ट्स के लिए GC वर्कर में चालू
+        gc.enable()
+        metrics.reset_after_fork()
+        stats_store.reset_after_fork()
+
+        server = None
+        served = itertools.count(1)
+        # सभी वर्कर्स एक साथ रीसायकल न हों इसलिए थोड़ा jitter
+        limit = self.max_requests + random.randint(0, max(self.max_requests // 10, 1)) if self.max_requests else 0
+        stopping = threading.Event()
+
+        def stop():
+            if not stopping.is_set():
+                stopping.set()
+                threading.Thread(target=server.shutdown, daemon=True).start()
+
+        def counting_app(environ, start_response):
+            if limit and next(served) == limit:
+                stop()
+            return self.wsgi_app(environ, start_response)
+
+        server = _PooledWSGIServer(
+            self.host, self.port, counting_app,
+            fd=self.sock.fileno(), threads=self.threads,
+            max_queue=app.config['SHED_MAX_QUEUE']
+        )
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+        metrics.start_flusher()
+        cache_warmer.start()
+        server.serve_forever()
+        server.close()
+        metrics.flush()
+
+    def _reap_children(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.children.pop(pid, None)
+            self.retiring.pop(pid, None)
+            metrics.archive_process(pid)
+            # मौजूदा पीढ़ी का वर्कर (रीसायकल या क्रैश) खत्म हुआ तो नया शुरू करें
+            if not self._stopping and generation == self.generation:
+                self._spawn_worker()
+
+    def _reload(self):
+        """SIGHUP: ज्ञान आधार दोबारा लोड करें, नए वर्कर्स शुरू करें, पुराने धीरे से बंद करें"""
+        logger.info(f"Master {os.getpid()}: reloading")
+        gc.disable()
+        try:
+            preload_app()
+        except Exception as e:
+            logger.error(f"Reload failed, keeping old workers: {e}")
+            gc.enable()
+            return
+        old = list(self.children)
+        self.generation += 1
+        # पिछली पीढ़ी के प्रीलोड का कचरा permanent generation में न रह जाए
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+        for _ in range(self.workers):
+            self._spawn_worker()
+        gc.enable()
+        # लंबे WebSocket/अटकी बाहरी कॉल वाले पुराने वर्कर हर रीलोड पर जमा न हों
+        deadline = time.time() + app.config['SERVER_GRACEFUL_TIMEOUT']
+        for pid in old:
+            self.retiring[pid] = deadline
+            self._kill(pid, signal.SIGTERM)
+
+    def _kill_overdue(self):
+        """SERVER_GRACEFUL_TIMEOUT में बंद न हुए पुरानी पीढ़ी के वर्कर्स को SIGKILL"""
+        now = time.time()
+        for pid, deadline in list(self.retiring.items()):
+            if now >= deadline:
+                logger.warning(f"Master {os.getpid()}: worker {pid} did not exit after reload, killing")
+                self.retiring.pop(pid, None)
+                self._kill(pid, signal.SIGKILL)
+
+    def _kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            self.children.pop(pid, None)
+
+    def _shutdown(self):
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.time() + app.config['SERVER_GRACEFUL_TIMEOUT']
+        while self.children and time.time() < deadline:
+            self._reap_children()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGKILL)
+        self.sock.close()
+        logger.info(f"Master {os.getpid()}: stopped")
+
+
+# बेंचमार्क और लोड टेस्ट
+BENCH_QUERIES = [
+    'नमस्ते',
+    'python क्या है?',
+    'मुझे इतिहास के बारे में बताओ',
+    'javascript में function कैसे लिखें',
+    'तुम्हारा नाम क्या है',
+    'quantum entanglement समझाओ',
+    'भारत की राजधानी क्या है',
+    'गणित में कैलकुलस क्या होता है',
+]
+
+def latency_summary(samples, elapsed=None):
+    """लेटेंसी (सेकंड) की सूची से throughput और p50/p95/p99 (ms)"""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        if not ordered:
+            return None
+        # nearest-rank percentile
+        index = min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    total = elapsed if elapsed is not None else sum(ordered)
+    return {
+        'count': len(ordered),
+        'ops_per_sec': round(len(ordered) / total, 1) if total else None,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+def _time_calls(fn, rounds, warmup=None):
+    """fn(i) को rounds बार चलाकर हर कॉल का समय मापें (timeit की तरह GC बंद रखकर)"""
+    for i in range(rounds // 10 if warmup is None else warmup):
+        fn(i)
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(rounds):
+            start = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return latency_summary(samples)
+
+@contextmanager
+def bench_environment():
+    """बेंचमार्क के लिए अस्थायी DB, अपलोड, सिमेंटिक और स्नैपशॉट फोल्डर, ताकि असली डेटा न छुआ जाए"""
+    saved = {key: app.config[key] for key in ('DATABASE', 'UPLOAD_FOLDER', 'SEMANTIC_DIR', 'KB_SNAPSHOT_DIR')}
+    with tempfile.TemporaryDirectory(prefix='aipin-bench-') as directory:
+        app.config['DATABASE'] = os.path.join(directory, 'bench.db')
+        app.config['UPLOAD_FOLDER'] = os.path.join(directory, 'uploads')
+        app.config['SEMANTIC_DIR'] = os.path.join(directory, 'semantic')
+        app.config['KB_SNAPSHOT_DIR'] = os.path.join(directory, 'snapshots')
+        os.makedirs(app.config['UPLOAD_FOLDER'])
+        try:
+            yield Database()
+        finally:
+            app.config.update(saved)
+
+def _fill_chat_history(database, rows, users=10):
+    """chat_history में कुल rows पंक्तियां होने तक नकली चैट जोड़ें"""
+    conn = database.connect()
+    current = conn.execute('SELECT COUNT(*) FROM chat_history').fetchone()[0]
+    conn.executemany(
+        'INSERT INTO chat_history (user_id, query, response) VALUES (?, ?, ?)',
+        ((i % users + 1, f"प्रश्न {i}", f"उत्तर {i} " * 40) for i in range(current, rows))
+    )
+    conn.commit()
+    conn.close()
+
+def run_microbenchmarks(sizes=(100, 1000, 10000), file_sizes=(1000, 100000, 10000000), rounds=1000):
+    """मैचर, save_chat, get_chat_history और analyze_file अलग-अलग डेटा साइज़ पर"""
+    results = {}
+    with bench_environment() as database:
+        engine = AipinAI()
+        base_kb = engine.knowledge_base
+        for size in sizes:
+            # सबसे खराब स्थिति: आखिरी विषय पर मैच, और बिना मैच वाले प्रश्न
+            engine.knowledge_base = dict(base_kb, bench={f"topic-{i:06d}": f"उत्तर {i}" for i in range(size)})
+            queries = [' '.join(q.lower().split()) for q in BENCH_QUERIES + [f"topic-{size - 1:06d} क्या है"]]
+            results[f"matcher/topics={size}"] = _time_calls(
+                lambda i: engine.match_knowledge(queries[i % len(queries)]), rounds)
+            typo = f"tpoic-{size - 1:06d} क्या है"
+            results[f"fuzzy_lookup/topics={size}"] = _time_calls(
+                lambda i: engine.fuzzy_index().lookup(typo), rounds)
+            romanized = 'mujhe itihaas ke baare mein batao'
+            results[f"transliteration_lookup/topics={size}"] = _time_calls(
+                lambda i: engine.topic_indexes()[1].lookup(romanized), rounds)
+            semantic = engine.semantic_index()
+            if semantic is not None:
+                paraphrases = [' '.join(q.lower().split()) for q in BENCH_QUERIES]
+                results[f"semantic_search/topics={size}"] = _time_calls(
+                    lambda i: semantic.search(paraphrases[i % len(paraphrases)], 3), rounds)
+                # पूरे बैच (एक matmul) की लेटेंसी
+                batch = paraphrases * 8
+                timing = _time_calls(lambda i: semantic.search_batch(batch, 3), max(10, rounds // 50))
+                results[f"semantic_batch{len(batch)}/topics={size}"] = timing
+
+            # स्टार्टअप: JSON पार्स + वर्ज़न + मैचर इंडेक्स बनाना बनाम कंपाइल की गई स्नैपशॉट का mmap
+            source = os.path.join(os.path.dirname(app.config['DATABASE']), f"kb-{size}.json")
+            with open(source, 'w', encoding='utf-8') as f:
+                json.dump(engine.knowledge_base, f, ensure_ascii=False)
+            results[f"kb_load_json/topics={size}"] = _time_calls(
+                lambda i: load_knowledge_from_json(source), max(3, rounds // 100))
+            load_kb_snapshot(source)
+            results[f"kb_load_snapshot/topics={size}"] = _time_calls(
+                lambda i: load_kb_snapshot(source), max(3, rounds // 100))
+            snapshot_fuzzy = load_kb_snapshot(source).fuzzy
+            results[f"fuzzy_lookup_snapshot/topics={size}"] = _time_calls(
+                lambda i: snapshot_fuzzy.lookup(typo), rounds)
+
+        for size in sizes:
+            _fill_chat_history(database, size)
+            results[f"get_chat_history/rows={size}"] = _time_calls(
+                lambda i: database.get_chat_history(1, 50), rounds)
+            results[f"save_chat/rows={size}"] = _time_calls(
+                lambda i: database.save_chat(1, f"बेंचमार्क प्रश्न {i}", 'बेंचमार्क उत्तर'), rounds)
+
+        for size in file_sizes:
+            path = os.path.join(app.config['UPLOAD_FOLDER'], f"bench_{size}.txt")
+            with open(path, 'wb') as f:
+                f.write(('Aipin बेंचमार्क पंक्ति\n'.encode('utf-8') * (size // 30 + 1))[:size])
+            results[f"analyze_file/bytes={size}"] = _time_calls(lambda i: analyze_file(path), rounds)
+    return results
+
+class DuckDuckGoStandIn:
+    """लोड टेस्ट के लिए लोकल DuckDuckGo Instant Answer जैसा सर्वर (तय लेटेंसी, बाहरी नेटवर्क नहीं)"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=50):
+        latency = latency_ms / 1000
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+                time.sleep(latency)
+                body = json.dumps({
+                    'Abstract': f"{query} के बारे में सारांश (लोकल stand-in)।",
+                    'AbstractURL': f"https://example.org/wiki/{query}",
+                    'RelatedTopics': [{'Text': f"{query} से संबंधित विषय {i}"} for i in range(3)]
+                }, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='ddg-stand-in', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def _drive_load(base_url, duration, concurrency, mix, seed):
+    """concurrency क्लाइंट थ्रेड्स से duration सेकंड तक मिश्रित अनुरोध भेजें"""
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    samples = {kind: [] for kind in kinds}
+    errors = dict.fromkeys(kinds, 0)
+    lock = threading.Lock()
+    upload_body = ('Aipin लोड टेस्ट फाइल\n' * 200).encode('utf-8')
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        user_id = 1000 + index
+        local = {kind: [] for kind in kinds}
+        local_errors = dict.fromkeys(kinds, 0)
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            file_id = None
+            start = time.perf_counter()
+            try:
+                if kind == 'chat':
+                    # हर पांचवां चैट प्रश्न वेब खोज के साथ
+                    response = session.post(f"{base_url}/api/chat", json={
+                        'query': rng.choice(BENCH_QUERIES), 'user_id': user_id, 'web_search': rng.random() < 0.2
+                    }, timeout=30)
+                elif kind == 'search':
+                    response = session.post(f"{base_url}/api/search", json={'query': rng.choice(BENCH_QUERIES)}, timeout=30)
+                elif kind == 'history':
+                    response = session.get(f"{base_url}/api/history", params={'user_id': user_id, 'limit': 50}, timeout=30)
+                else:
+                    response = session.post(f"{base_url}/api/upload", params={'user_id': user_id},
+                                            files={'file': ('loadtest.txt', upload_body, 'text/plain')}, timeout=30)
+                    if response.ok:
+                        file_id = response.json().get('file_id')
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                local[kind].append(elapsed)
+            else:
+                local_errors[kind] += 1
+            if file_id is not None:
+                # कोटा न भरे इसलिए अपलोड की गई फाइल हटा दें (समय में नहीं गिना जाता)
+                try:
+                    session.delete(f"{base_url}/api/files/{file_id}", params={'user_id': user_id}, timeout=30)
+                except requests.RequestException:
+                    pass
+        with lock:
+            for kind in kinds:
+                samples[kind].extend(local[kind])
+                errors[kind] += local_errors[kind]
+
+    began = time.perf_counter()
+    deadline = began + duration
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+
+    results = {}
+    for kind in kinds + ['all']:
+        kind_samples = sum(samples.values(), []) if kind == 'all' else samples[kind]
+        kind_errors = sum(errors.values()) if kind == 'all' else errors[kind]
+        result = latency_summary(kind_samples, wall)
+        attempts = len(kind_samples) + kind_errors
+        result['errors'] = kind_errors
+        result['error_rate'] = round(kind_errors / attempts, 4) if attempts else 0.0
+        results[f"load/{kind}"] = result
+    return results
+
+@contextmanager
+def load_target(target=None, search_latency_ms=50, keep_rate_limits=False):
+    """लोड टेस्ट/replay का base URL; target न हो तो ऐप इसी प्रोसेस में अस्थायी DB के साथ चलाया जाता है"""
+    stand_in = DuckDuckGoStandIn(latency_ms=search_latency_ms).start()
+    if target is not None:
+        print(f"🦆 DuckDuckGo stand-in: {stand_in.url} (सर्वर को AIPIN_WEB_SEARCH_URL={stand_in.url} से चलाएं)")
+        try:
+            yield target.rstrip('/')
+        finally:
+            stand_in.stop()
+        return
+
+    saved = {key: app.config[key] for key in ('WEB_SEARCH_URL', 'RATE_LIMITS', 'RATE_LIMITS_IP', 'CAPTURE_SAMPLE_RATE')}
+    werkzeug_logger = logging.getLogger('werkzeug')
+    saved_level = werkzeug_logger.level
+    server = None
+    try:
+        with bench_environment():
+            app.config['WEB_SEARCH_URL'] = stand_in.url
+            # लोड टेस्ट/replay का अपना ट्रैफ़िक कैप्चर में न जाए
+            app.config['CAPTURE_SAMPLE_RATE'] = 0
+            if not keep_rate_limits:
+                # एक ही IP से सारा लोड आता है, इसलिए रेट लिमिट व्यावहारिक रूप से बंद
+                for key in ('RATE_LIMITS', 'RATE_LIMITS_IP'):
+                    app.config[key] = {route: (1e9, 1e9) for route in app.config[key]}
+            werkzeug_logger.setLevel(logging.WARNING)
+            preload_app()
+            server = _PooledWSGIServer('127.0.0.1', 0, app, threads=app.config['SERVER_THREADS'],
+                                       max_queue=app.config['SHED_MAX_QUEUE'])
+            threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+            yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.close()
+        stand_in.stop()
+        werkzeug_logger.setLevel(saved_level)
+        app.config.update(saved)
+
+def run_load_test(target=None, duration=10, concurrency=8, mix=None, seed=1, search_latency_ms=50,
+                  keep_rate_limits=False):
+    """मिश्रित लोड टेस्ट (load_target पर)"""
+    mix = mix or app.config['LOADTEST_MIX']
+    with load_target(target, search_latency_ms, keep_rate_limits) as base_url:
+        return _drive_load(base_url, duration, concurrency, mix, seed)
+
+def _replay_records(base_url, records, speed, concurrency):
+    """कैप्चर रिकॉर्ड मूल अंतराल पर (speed गुना तेज़) भेजें; speed 0 = बिना रुके, concurrency तक समानांतर"""
+    samples = {}
+    errors = {}
+    changed = {}
+    lock = threading.Lock()
+    local = threading.local()
+    upload_body = ('Aipin replay फाइल\n' * 4096).encode('utf-8')
+    # कैप्चर का file id -> [अपलोड पूरा होने का Event, replay में मिला id]
+    uploads = {record['file_id']: [threading.Event(), None] for record in records if 'file_id' in record}
+
+    def send(record, due):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        path = record['path']
+        if record['route'].endswith('<int:file_id>'):
+            prefix, file_id = path.rsplit('/', 1)
+            upload = uploads.get(int(file_id)) if file_id.isdigit() else None
+            if upload is not None and upload[0].wait(30) and upload[1] is not None:
+                path = f"{prefix}/{upload[1]}"
+        kwargs = {'params': record.get('args') or None, 'timeout': 30}
+        if record.get('tenant'):
+            kwargs['headers'] = {'X-Tenant': record['tenant']}
+        if 'json' in record:
+            kwargs['json'] = record['json']
+        elif record.get('upload_bytes'):
+            size = record['upload_bytes']
+            body = (upload_body * (size // len(upload_body) + 1))[:size]
+            kwargs['files'] = {'file': ('replay.txt', body, 'text/plain')}
+        # तय समय से मापें, ताकि क्लाइंट के पीछे छूटने पर कतार का इंतज़ार भी लेटेंसी में दिखे
+        start = due if due is not None else time.perf_counter()
+        upload = uploads.get(record.get('file_id'))
+        try:
+            response = session.request(record['method'], base_url + path, **kwargs)
+            status = response.status_code
+            if upload is not None and response.ok:
+                upload[1] = response.json().get('file_id')
+        except (requests.RequestException, ValueError):
+            status = None
+        finally:
+            if upload is not None:
+                upload[0].set()
+        elapsed = time.perf_counter() - start
+        route = record['route']
+        with lock:
+            if status is not None and status < 400:
+                samples.setdefault(route, []).append(elapsed)
+            else:
+                errors[route] = errors.get(route, 0) + 1
+            if status != record.get('status'):
+                changed[route] = changed.get(route, 0) + 1
+
+    began = time.perf_counter()
+    first = records[0]['ts'] if records else 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='replay') as pool:
+        for record in records:
+            due = None
+            if speed:
+                due = began + (record['ts'] - first) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(send, record, due)
+    wall = time.perf_counter() - began
+
+    results = {}
+    routes = sorted(set(samples) | set(errors))
+    for route in routes + ['all']:
+        if route == 'all':
+            route_samples = sum(samples.values(), [])
+            route_errors = sum(errors.values())
+            route_changed = sum(changed.values())
+        else:
+            route_samples = samples.get(route, [])
+            route_errors = errors.get(route, 0)
+            route_changed = changed.get(route, 0)
+        result = latency_summary(route_samples, wall)
+        attempts = len(route_samples) + route_errors
+        result['errors'] = route_errors
+        result['error_rate'] = round(route_errors / attempts, 4) if attempts else 0.0
+        # कैप्चर के समय से अलग स्टेटस: replay की विश्वसनीयता (जैसे पुराने file id पर 404)
+        result['status_changed'] = route_changed
+        results[f"replay/{route.lstrip('/')}" if route != 'all' else 'replay/all'] = result
+    return results
+
+def run_replay(records, target=None, speed=1.0, concurrency=32, search_latency_ms=50, keep_rate_limits=False):
+    """कैप्चर किया ट्रैफ़िक दोबारा चलाएं; वही फाइलें, वही क्रम और अंतराल, इसलिए दो बिल्ड तुलना योग्य"""
+    with load_target(target, search_latency_ms, keep_rate_limits) as base_url:
+        return _replay_records(base_url, records, speed, concurrency)
+
+def run_inference_benchmark(requests_count=256, concurrency=32, max_batch=None, max_wait_ms=None):
+    """stand-in मॉडल पर बिना बैचिंग (batch=1) बनाम माइक्रो-बैचिंग: पूरा उत्तर और पहले टोकन की लेटेंसी"""
+    max_batch = max_batch or app.config['INFERENCE_MAX_BATCH']
+    max_wait_ms = app.config['INFERENCE_MAX_WAIT_MS'] if max_wait_ms is None else max_wait_ms
+    prompts = [f"उपयोगकर्ता: {BENCH_QUERIES[i % len(BENCH_QUERIES)]} #{i}\nAipin:" for i in range(requests_count)]
+    results = {}
+    for batch_size in sorted({1, max_batch}):
+        scheduler = MicroBatchScheduler(StandInModel(), batch_size, max_wait_ms / 1000, app.config['INFERENCE_MAX_TOKENS'])
+        latencies = []
+        first_tokens = []
+        tokens = [0]
+        lock = threading.Lock()
+
+        def one(prompt):
+            start = time.perf_counter()
+            first = None
+            count = 0
+            for _ in scheduler.submit(prompt, timeout=300).stream():
+                if first is None:
+                    first = time.perf_counter() - start
+                count += 1
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                first_tokens.append(first or 0)
+                tokens[0] += count
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, prompts))
+        elapsed = time.perf_counter() - started
+        scheduler.stop()
+        results[f"inference/batch={batch_size}"] = dict(latency_summary(latencies, elapsed),
+                                                        tokens_per_sec=round(tokens[0] / elapsed, 1))
+        # पहले टोकन के लिए throughput का अर्थ नहीं, केवल लेटेंसी
+        first_token = latency_summary(first_tokens)
+        first_token.pop('ops_per_sec')
+        results[f"first_token/batch={batch_size}"] = first_token
+    return results
+
+def bench_report(kind, results, params):
+    """परिणाम + दोहराने लायक मेटाडेटा"""
+    return {
+        'kind': kind,
+        'created': datetime.now().isoformat(),
+        'meta': dict(params, **{
+            'app_version': app.config['APP_VERSION'],
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'cpus': os.cpu_count(),
+            'orjson': orjson is not None,
+        }),
+        'results': results,
+    }
+
+def save_bench_report(report, path=None):
+    """रिपोर्ट JSON में सेव करें (डिफ़ॉल्ट: BENCH_DIR/<kind>-<समय>.json)"""
+    if path is None:
+        path = os.path.join(app.config['BENCH_DIR'], f"{report['kind']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+def compare_bench_reports(baseline, current, threshold=None):
+    """बेसलाइन से तुलना: p95 बढ़े, throughput घटे या त्रुटियां बढ़ें तो regression"""
+    threshold = app.config['BENCH_REGRESSION_THRESHOLD'] if threshold is None else threshold
+    rows = []
+    regressions = []
+    for key, now in current['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        row = {'key': key}
+        regressed = False
+        for field in ('p95_ms', 'ops_per_sec'):
+            if before.get(field) and now.get(field) is not None:
+                change = now[field] / before[field] - 1
+                row[field] = round(change, 3)
+                if (field == 'p95_ms' and change > threshold) or (field == 'ops_per_sec' and change < -threshold):
+                    regressed = True
+        if now.get('error_rate', 0) > before.get('error_rate', 0) + 0.01:
+            regressed = True
+        row['regressed'] = regressed
+        rows.append(row)
+        if regressed:
+            regressions.append(key)
+    return {'threshold': threshold, 'rows': rows, 'regressions': regressions}
+
+def run_bench_command(args):
+    """bench / loadtest / replay / bench-inference सबकमांड: चलाएं, सेव करें, बेसलाइन से तुलना करें; regression पर exit code 1"""
+    if args.command == 'bench':
+        kind = 'micro'
+        params = {'sizes': list(args.sizes), 'file_sizes': list(args.file_sizes), 'rounds': args.rounds}
+        results = run_microbenchmarks(args.sizes, args.file_sizes, args.rounds)
+    elif args.command == 'replay':
+        kind = 'replay'
+        records, files = load_capture(args.paths or [app.config['CAPTURE_DIR']])
+        if args.limit:
+            records = records[:args.limit]
+        if not records:
+            print(f"❌ कोई कैप्चर रिकॉर्ड नहीं मिला ({', '.join(args.paths or [app.config['CAPTURE_DIR']])})")
+            return
+        params = {'target': args.target or 'in-process', 'captures': [os.path.basename(path) for path in files],
+                  'records': len(records), 'span_s': round(records[-1]['ts'] - records[0]['ts'], 3),
+                  'speed': args.speed, 'concurrency': args.concurrency, 'search_latency_ms': args.search_latency_ms}
+        results = run_replay(records, args.target, args.speed, args.concurrency,
+                             args.search_latency_ms, args.keep_rate_limits)
+    elif args.command == 'bench-inference':
+        kind = 'inference'
+        params = {'requests': args.requests, 'concurrency': args.concurrency,
+                  'max_batch': args.max_batch or app.config['INFERENCE_MAX_BATCH'],
+                  'max_wait_ms': app.config['INFERENCE_MAX_WAIT_MS'] if args.max_wait_ms is None else args.max_wait_ms,
+                  'step_ms': app.config['STANDIN_STEP_MS'], 'sequence_ms': app.config['STANDIN_SEQUENCE_MS']}
+        results = run_inference_benchmark(args.requests, args.concurrency, params['max_batch'], params['max_wait_ms'])
+    else:
+        kind = 'load'
+        params = {'target': args.target or 'in-process', 'duration': args.duration, 'concurrency': args.concurrency,
+                  'seed': args.seed, 'search_latency_ms': args.search_latency_ms, 'mix': app.config['LOADTEST_MIX']}
+        results = run_load_test(args.target, args.duration, args.concurrency, seed=args.seed,
+                                search_latency_ms=args.search_latency_ms, keep_rate_limits=args.keep_rate_limits)
+
+    report = bench_report(kind, results, params)
+    print(f"📊 {kind} बेंचमार्क")
+    for key, result in results.items():
+        print(f"   {key}: " + ", ".join(f"{field}={value}" for field, value in result.items()))
+    print(f"💾 परिणाम: {save_bench_report(report, args.output)}")
+
+    baseline_path = args.baseline or os.path.join(app.config['BENCH_DIR'], f"baseline-{kind}.json")
+    if args.save_baseline:
+        save_bench_report(report, baseline_path)
+        print(f"📌 बेसलाइन सेव: {baseline_path}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"ℹ️ बेसलाइन नहीं मिली ({baseline_path}), --save-baseline से बनाएं")
+        return
+
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        comparison = compare_bench_reports(json.load(f), report, args.threshold)
+    print(f"🔍 बेसलाइन से तुलना ({baseline_path}, threshold {comparison['threshold']:.0%})")
+    for row in comparison['rows']:
+        changes = ", ".join(f"{field} {row[field]:+.1%}" for field in ('p95_ms', 'ops_per_sec') if field in row)
+        print(f"   {'❌' if row['regressed'] else '✅'} {row['key']}: {changes}")
+    if comparison['regressions']:
+        print(f"⚠️ {len(comparison['regressions'])} regression(s)")
+        sys.exit(1)
+
+def print_banner(host, port):
+    """सर्वर की जानकारी प्रिंट करें"""
+    print("🚀 Aipin AI सर्वर शुरू हो रहा है...")
+    print(f"📁 Static folder: {app.config['STATIC_FOLDER']}")
+    print(f"📁 Templates folder: {app.template_folder}")
+    print(f"💾 Database: {app.config['DATABASE']}")
+    print(f"\n🌐 सर्वर चल रहा है: http://localhost:{port}")
+    print(f"⚡ एडमिन पैनल: http://localhost:{port}/admin")
+    print("\n📞 एंडपॉइंट्स:")
+    print("  - GET  /              → होमपेज")
+    print("  - POST /api/chat      → AI चैट")
+    print("  - POST /api/upload    → फाइल अपलोड")
+    print("  - GET  /api/usage     → स्टोरेज उपयोग")
+    print("  - POST /api/search    → वेब खोज")
+    print("  - GET  /api/history   → चैट हिस्ट्री")
+    print("  - GET  /api/info      → सिस्टम जानकारी")
+    print("\n🛑 सर्वर बंद करने के लिए Ctrl+C दबाएं")
+
+
+def serve(host=None, port=None, workers=None, threads=None, max_requests=None, dev=False):
+    """सर्वर चलाएं (प्रोडक्शन में प्रीफोर्क, --dev में Flask डेवलपमेंट सर्वर)"""
+    host = host or app.config['SERVER_HOST']
+    port = port or app.config['SERVER_PORT']
+    workers = workers or app.config['SERVER_WORKERS']
+    threads = threads or app.config['SERVER_THREADS']
+    if max_requests is None:
+        max_requests = app.config['SERVER_MAX_REQUESTS']
+    # WebSocket कनेक्शन सीमा (WS_MAX_CONNECTIONS) असली थ्रेड पूल के आकार से निकलती है
+    app.config['SERVER_THREADS'] = threads
+    app.config['SERVER_WORKERS'] = workers
+
+    print_banner(host, port)
+
+    if dev:
+        preload_app()
+        start_usage_reconciler()
+        cache_warmer.start()
+        app.run(debug=True, host=host, port=port)
+        return
+
+    if app.config['CACHE_BACKEND'] == 'auto':
+        # हर वर्कर की अपनी ठंडी कैश के बजाय सभी एक ही साझा कैश पढ़ें/लिखें
+        app.config['CACHE_BACKEND'] = 'shared' if workers > 1 and hasattr(os, 'fork') else 'local'
+    if app.config['CONVERSATION_CHECK_LATEST'] is None:
+        # हर वर्कर की अपनी कॉपी है; यूजर का अगला टर्न दूसरे वर्कर पर जा सकता है
+        app.config['CONVERSATION_CHECK_LATEST'] = workers > 1 and hasattr(os, 'fork')
+
+    if not hasattr(os, 'fork'):
+        # Windows: फोर्क उपलब्ध नहीं, एक प्रोसेस में थ्रेड पूल
+        preload_app()
+        start_usage_reconciler()
+        server = _PooledWSGIServer(host, port, app, threads=threads, max_queue=app.config['SHED_MAX_QUEUE'])
+        cache_warmer.start()
+        try:
+            server.serve_forever()
+        finally:
+            server.close()
+        return
+
+    PreforkServer(app, host, port, workers, threads, max_requests).run()
+
+
+def main(argv=None):
+    """कमांड लाइन एंट्री पॉइंट"""
+    parser = argparse.ArgumentParser(description='Aipin AI सर्वर')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='सर्वर चलाएं (डिफ़ॉल्ट)')
+    serve_parser.add_argument('--host', default=None)
+    serve_parser.add_argument('--port', type=int, default=None)
+    serve_parser.add_argument('--workers', type=int, default=None, help='वर्कर प्रोसेस (डिफ़ॉल्ट: CPU कोर)')
+    serve_parser.add_argument('--threads', type=int, default=None, help='प्रति वर्कर थ्रेड')
+    serve_parser.add_argument('--max-requests', type=int, default=None, help='इतने अनुरोधों के बाद वर्कर रीसायकल करें (0 = कभी नहीं)')
+    serve_parser.add_argument('--dev', action='store_true', help='Flask डेवलपमेंट सर्वर (debug=True)')
+
+    subparsers.add_parser('setup', help='सैंपल डेटा, स्टेटिक और टेम्पलेट फाइल्स बनाएं')
+    subparsers.add_parser('assets', help='हैश वाले/कंप्रेस्ड एसेट्स बनाएं और प्रति पेज बाइट्स मापें')
+    subparsers.add_parser('compile-kb', help='ज्ञान आधार JSON से बाइनरी स्नैपशॉट बनाएं और लोड समय मापें')
+
+    bench_json_parser = subparsers.add_parser('bench-json', help='हिस्ट्री पेज पर JSON एन्कोडर और कंप्रेशन बेंचमार्क')
+    bench_json_parser.add_argument('--user-id', type=int, default=1)
+    bench_json_parser.add_argument('--limit', type=int, default=50)
+    bench_json_parser.add_argument('--rounds', type=int, default=200)
+
+    def int_list(value):
+        return tuple(int(item) for item in value.split(','))
+
+    bench_parser = subparsers.add_parser('bench', help='माइक्रोबेंचमार्क: मैचर, save_chat, get_chat_history, analyze_file')
+    bench_parser.add_argument('--sizes', type=int_list, default=(100, 1000, 10000), help='KB विषय / DB पंक्तियां (कॉमा से)')
+    bench_parser.add_argument('--file-sizes', type=int_list, default=(1000, 100000, 10000000), help='फाइल साइज़ bytes (कॉमा से)')
+    bench_parser.add_argument('--rounds', type=int, default=1000)
+
+    load_parser = subparsers.add_parser('loadtest', help='चैट/सर्च/हिस्ट्री/अपलोड मिश्रित लोड टेस्ट')
+    load_parser.add_argument('--target', default=None, help='चल रहे सर्वर का URL (डिफ़ॉल्ट: इसी प्रोसेस में अस्थायी ऐप)')
+    load_parser.add_argument('--duration', type=float, default=10)
+    load_parser.add_argument('--concurrency', type=int, default=8)
+    load_parser.add_argument('--seed', type=int, default=1)
+    load_parser.add_argument('--search-latency-ms', type=float, default=50, help='DuckDuckGo stand-in की लेटेंसी')
+    load_parser.add_argument('--keep-rate-limits', action='store_true')
+
+    replay_parser = subparsers.add_parser('replay', help='कैप्चर किया /api ट्रैफ़िक मूल या तेज़ गति से दोबारा चलाएं')
+    replay_parser.add_argument('paths', nargs='*', help='कैप्चर फाइलें या फोल्डर (डिफ़ॉल्ट: data/capture)')
+    replay_parser.add_argument('--target', default=None, help='चल रहे सर्वर का URL (डिफ़ॉल्ट: इसी प्रोसेस में अस्थायी ऐप)')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='1 = मूल अंतराल, 10 = दस गुना तेज़, 0 = बिना रुके')
+    replay_parser.add_argument('--concurrency', type=int, default=32, help='एक साथ अधिकतम अनुरोध')
+    replay_parser.add_argument('--limit', type=int, default=None, help='पहले इतने रिकॉर्ड ही')
+    replay_parser.add_argument('--search-latency-ms', type=float, default=50, help='DuckDuckGo stand-in की लेटेंसी')
+    replay_parser.add_argument('--keep-rate-limits', action='store_true')
+
+    inference_parser = subparsers.add_parser('bench-inference', help='stand-in मॉडल पर माइक्रो-बैचिंग बनाम batch=1')
+    inference_parser.add_argument('--requests', type=int, default=256)
+    inference_parser.add_argument('--concurrency', type=int, default=32)
+    inference_parser.add_argument('--max-batch', type=int, default=None)
+    inference_parser.add_argument('--max-wait-ms', type=float, default=None)
+
+    for bench_command in (bench_parser, load_parser, replay_parser, inference_parser):
+        bench_command.add_argument('--output', default=None, help='परिणाम JSON (डिफ़ॉल्ट: data/bench/<kind>-<समय>.json)')
+        bench_command.add_argument('--baseline', default=None, help='तुलना के लिए बेसलाइन (डिफ़ॉल्ट: data/bench/baseline-<kind>.json)')
+        bench_command.add_argument('--save-baseline', action='store_true', help='इस रन को बेसलाइन बनाएं')
+        bench_command.add_argument('--threshold', type=float, default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command in ('bench', 'loadtest', 'replay', 'bench-inference'):
+        run_bench_command(args)
+        return
+
+    if args.command == 'bench-json':
+        report = benchmark_json(args.user_id, args.limit, args.rounds)
+        print(f"📊 हिस्ट्री पेज: {report['items']} आइटम")
+        for result in report['results']:
+            print("   " + ", ".join(f"{key}={value}" for key, value in result.items()))
+        return
+
+    if args.command == 'assets':
+        preload_app()
+        plain = {name: os.path.getsize(os.path.join(app.config['STATIC_FOLDER'], name))
+                 for name in app.config['FINGERPRINTED_ASSETS']}
+        after = measure_page_bytes()
+        print("📦 प्रति पेज लोड बाइट्स")
+        print(f"   पहले (बिना कंप्रेशन, हर विज़िट पर {len(plain)} रीवैलिडेशन): "
+              f"{after['html'] + sum(plain.values()):,} bytes")
+        print(f"   अब पहली विज़िट: {after['first_visit_total']:,} bytes")
+        for url, size in after['assets'].items():
+            print(f"     {url}: {size:,} bytes")
+        print(f"   अब दोबारा विज़िट पर एसेट अनुरोध: {after['repeat_visit_requests']}")
+        return
+
+    if args.command == 'compile-kb':
+        source = app.config['KNOWLEDGE_FILE']
+        if not os.path.exists(source):
+            print(f"❌ {source} नहीं मिली (पहले: setup)")
+            return
+        start = time.perf_counter()
+        snapshot = load_kb_snapshot(source)
+        if snapshot is None:
+            print("❌ स्नैपशॉट नहीं बन सकी (लॉग देखें, या KB_SNAPSHOT बंद है)")
+            return
+        compile_ms = (time.perf_counter() - start) * 1000
+        topics = sum(len(values) for values in snapshot.knowledge_base.values())
+        print(f"📦 {snapshot.path}: {os.path.getsize(snapshot.path):,} bytes, {topics:,} विषय, "
+              f"version {snapshot.version} ({compile_ms:.1f}ms)")
+        for label, load in (('JSON', load_knowledge_from_json), ('स्नैपशॉट', load_kb_snapshot)):
+            timing = _time_calls(lambda i: load(source), 5, warmup=1)
+            print(f"   {label} लोड: p50 {timing['p50_ms']}ms")
+        return
+
+    if args.command == 'setup':
+        create_sample_data()
+        create_static_files()
+        build_static_assets()
+        create_template_files()
+
+        print("\n" + "="*50)
+        print("🎯 Aipin AI वेबसाइट तैयार है!")
+        print("="*50)
+        print("\n🚀 सर्वर शुरू करने के लिए:")
+        print("1. इस फाइल को सेव करें: aipin_complete.py")
+        print("2. टर्मिनल में चलाएं: python aipin_complete.py serve")
+        print("3. ब्राउज़र में खोलें: http://localhost:5000")
+        print("\n📦 आवश्यक पैकेजेस:")
+        print("   pip install flask flask-cors requests")
+        print("\n⚡ फीचर्स:")
+        print("   - AI चैट (हिंदी/English)")
+        print("   - वेब खोज")
+        print("   - फाइल अपलोड")
+        print("   - चैट हिस्ट्री")
+        print("   - डेटाबेस स्टोरेज")
+        print("\n🔥 त्वरित शुरुआत:")
+        print("   python aipin_complete.py serve --workers 4 --threads 8")
+        return
+
+    if args.command is None:
+        args = serve_parser.parse_args([])
+
+    serve(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads=args.threads,
+        max_requests=args.max_requests,
+        dev=args.dev
+    )
 
 # रन करने के लिए
 if __name__ == '__main__':
-    # अगर सीधे रन कर रहे हैं
-    create_sample_data()
-    create_static_files()
-    create_template_files()
-    
-    print("\n" + "="*50)
-    print("🎯 Aipin AI वेबसाइट तैयार है!")
-    print("="*50)
-    print("\n🚀 सर्वर शुरू करने के लिए:")
-    print("1. इस फाइल को सेव करें: aipin_complete.py")
-    print("2. टर्मिनल में चलाएं: python aipin_complete.py")
-    print("3. ब्राउज़र में खोलें: http://localhost:5000")
-    print("\n📦 आवश्यक पैकेजेस:")
-    print("   pip install flask flask-cors requests")
-    print("\n⚡ फीचर्स:")
-    print("   - AI चैट (हिंदी/English)")
-    print("   - वेब खोज")
-    print("   - फाइल अपलोड")
-    print("   - चैट हिस्ट्री")
-    print("   - डेटाबेस स्टोरेज")
-    print("\n🔥 त्वरित शुरुआत:")
-    print("   python aipin_complete.py")
\ No newline at end of file
+    main()
@@ -0,0 +1,50 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    """बिल्ट-इन ज्ञान आधार वाला इंजन (डेटा फाइलें अस्थायी डायरेक्टरी में)"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('aipin'))
+    try:
+        module = importlib.import_module('deepseek_python_20260120_70e235')
+        yield module.AipinAI()
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.mark.parametrize('query', ['hello', 'world', 'console', 'function', 'print', 'hai',
+                                   'weather today', 'stock price', 'हैलो दुनिया'])
+def test_unrelated_queries_do_not_match(engine, query):
+    assert engine.match_knowledge(query) is None
+
+
+@pytest.mark.parametrize('query, topic', [
+    ('मानव अतीत का अध्ययन', 'इतिहास'),
+    ('संख्याओं का अध्ययन', 'गणित'),
+    ('प्रकृति का अध्ययन', 'विज्ञान'),
+])
+def test_semantic_paraphrase_matches(engine, query, topic):
+    pytest.importorskip('numpy')
+    assert engine.match_knowledge(query) == engine.knowledge_base['education'][topic]
+
+
+@pytest.mark.parametrize('query, topic', [
+    ('html5 kya hai', 'html'),
+    ('python3 सीखना है', 'python'),
+    ('mujhe javascript batao', 'javascript'),
+])
+def test_roman_topic_with_suffix_matches(engine, query, topic):
+    assert engine.match_knowledge(query) == engine.knowledge_base['programming'][topic]
+
+
+def test_roman_topic_inside_word_does_not_match():
+    from deepseek_python_20260120_70e235 import contains_topic
+    assert not contains_topic('kya hai', 'ai')
+    assert contains_topic('ai kya hai', 'ai')